@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+#
+# Copyright (c)  2025  Xiaomi Corporation
+
+"""
+自适应端点检测。
+
+OnlineRecognizer 的静态规则（rule2_min_trailing_silence=1.2 等）要求说话人停顿足够久才结束句子。
+这里根据当前音频流中说话人在句子内部的停顿分布，以及临时结果是否已经稳定，
+在停顿明显超过该说话人习惯的句内停顿、且识别结果不再变化时提前结束句子；
+其他情况下仍由静态规则决定。
+
+无论是否启用提前结束，都会统计每个句子的端点延迟（最后一次检测到语音到句子结束的音频时长），
+用于根据实测数据调整参数。
+"""
+
+import json
+from collections import deque
+
+import numpy as np
+
+from audio_mixer import sample_rate
+
+
+class EndpointStats:
+    """端点延迟的分布"""
+    def __init__(self, max_records=10000):
+        self.latencies = {"adaptive": deque(maxlen=max_records), "static": deque(maxlen=max_records)}
+
+    def record(self, kind, latency):
+        self.latencies[kind].append(latency)
+
+    def summary(self):
+        result = {}
+        for kind, values in self.latencies.items():
+            values = np.array(values)
+            if len(values) == 0:
+                result[kind] = {"count": 0}
+                continue
+            result[kind] = {
+                "count": int(len(values)),
+                "p10": float(np.percentile(values, 10)),
+                "p50": float(np.percentile(values, 50)),
+                "p90": float(np.percentile(values, 90)),
+                "max": float(np.max(values)),
+            }
+        return result
+
+    def format_summary(self):
+        parts = []
+        for kind, s in self.summary().items():
+            if s["count"]:
+                parts.append(f"{kind}: {s['count']}句 p50={s['p50']:.2f}s p90={s['p90']:.2f}s max={s['max']:.2f}s")
+            else:
+                parts.append(f"{kind}: 0句")
+        return "端点延迟 " + "，".join(parts)
+
+    def save(self, path):
+        data = {"summary": self.summary(),
+                "latencies": {kind: list(values) for kind, values in self.latencies.items()}}
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+class NoiseFloor:
+    """
+    跟踪噪声底噪的能量语音判断：底噪下降快、上升慢，能量高于底噪3倍的帧视为语音
+
+    AdaptiveEndpointer 和 speculative_final.SpeculativeFinal 共用
+    """
+    def __init__(self, ratio=3, min_rms=1e-3, rise=0.002):
+        self.ratio = ratio
+        self.min_rms = min_rms
+        self.rise = rise
+        self.value = None
+
+    def is_speech(self, rms):
+        """rms: 一帧的均方根能量"""
+        if self.value is None:
+            self.value = rms
+        if rms < self.value:
+            self.value = rms
+        else:
+            self.value += (rms - self.value) * self.rise
+        return rms > max(self.value * self.ratio, self.min_rms)
+
+
+class AdaptiveEndpointer:
+    """
+    跟踪当前句子的尾部静音、句内停顿分布和临时结果的稳定性
+
+    所有时间都以音频时长计算（按送入的采样数），与处理速度无关。
+    """
+    def __init__(self, enabled=True, frame_seconds=0.01, min_pause=0.3, max_pause=1.2,
+                 pause_percentile=90, pause_margin=1.2, stable_seconds=0.3, min_pauses=10,
+                 default_pause=0.8, max_pauses=200):
+        """
+        Args:
+            enabled: 是否允许提前结束句子；为False时只统计端点延迟
+            frame_seconds: 能量检测的帧长
+            min_pause: 自适应静音阈值的下限
+            max_pause: 自适应静音阈值的上限，不超过静态规则的 rule2_min_trailing_silence
+            pause_percentile: 取句内停顿分布的哪个百分位作为基准
+            pause_margin: 静音阈值 = 句内停顿百分位 × pause_margin
+            stable_seconds: 临时结果至少保持这么久不变才允许提前结束
+            min_pauses: 统计到的句内停顿少于该数量时使用 default_pause
+            default_pause: 停顿样本不足时使用的静音阈值
+            max_pauses: 最多保留最近多少个句内停顿
+        """
+        self.enabled = enabled
+        self.frame_size = int(sample_rate * frame_seconds)
+        self.frame_seconds = frame_seconds
+        self.min_pause = min_pause
+        self.max_pause = max_pause
+        self.pause_percentile = pause_percentile
+        self.pause_margin = pause_margin
+        self.stable_seconds = stable_seconds
+        self.min_pauses = min_pauses
+        self.default_pause = default_pause
+        self.pauses = deque(maxlen=max_pauses)
+        self.stats = EndpointStats()
+
+        self.noise_floor = NoiseFloor()
+        self.remainder = np.zeros(0, dtype=np.float32)
+        self.reset()
+
+    def reset(self):
+        """开始新的句子"""
+        self.audio_time = 0.0
+        self.trailing_silence = 0.0
+        self.heard_speech = False
+        self.speech_start = 0.0  # 句中第一个语音帧的开始时间（相对于句子开始）
+        self.last_text = ""
+        self.last_text_change = 0.0
+
+    def is_speech(self, frame):
+        return self.noise_floor.is_speech(float(np.sqrt(np.mean(frame * frame))) + 1e-10)
+
+    def threshold(self):
+        """当前的自适应静音阈值（秒）"""
+        if len(self.pauses) < self.min_pauses:
+            value = self.default_pause
+        else:
+            value = float(np.percentile(self.pauses, self.pause_percentile)) * self.pause_margin
+        return min(max(value, self.min_pause), self.max_pause)
+
+    def update(self, samples, text):
+        """
+        送入一段新的音频和当前的临时结果
+
+        Returns:
+            bool: 是否应该提前结束当前句子
+        """
+        samples = np.concatenate([self.remainder, samples])
+        num_frames = len(samples) // self.frame_size
+        self.remainder = samples[num_frames * self.frame_size:]
+
+        for frame in samples[:num_frames * self.frame_size].reshape(num_frames, self.frame_size):
+            self.audio_time += self.frame_seconds
+            if self.is_speech(frame):
+                # 语音恢复：前面的静音是一次句内停顿
+                if self.heard_speech and self.trailing_silence >= 2 * self.frame_seconds:
+                    self.pauses.append(self.trailing_silence)
+                if not self.heard_speech:
+                    self.speech_start = self.audio_time - self.frame_seconds
+                self.heard_speech = True
+                self.trailing_silence = 0.0
+            else:
+                self.trailing_silence += self.frame_seconds
+
+        if text != self.last_text:
+            self.last_text = text
+            self.last_text_change = self.audio_time
+
+        if not self.enabled or not text or not self.heard_speech:
+            return False
+
+        stable = self.audio_time - self.last_text_change >= self.stable_seconds
+        return stable and self.trailing_silence >= self.threshold()
+
+    def on_endpoint(self, early):
+        """句子结束（提前结束或静态规则触发）时调用，记录端点延迟"""
+        # 句末的这段静音不是句内停顿，不计入停顿分布
+        if self.heard_speech and self.last_text:
+            self.stats.record("adaptive" if early else "static", self.trailing_silence)
+        self.reset()
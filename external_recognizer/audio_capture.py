@@ -0,0 +1,545 @@
+#!/usr/bin/env python3
+#
+# Copyright (c)  2025  Xiaomi Corporation
+
+"""
+录音子进程使用的音频采集模块。
+
+本模块是 multiprocessing 录音子进程的入口，导入图中只包含音频后端（PyAudioWPatch）、
+numpy 和标准库，不导入 sherpa_onnx、scipy、tkinter，使子进程启动后能立即开始采集。
+不要在这里导入识别相关的依赖。
+"""
+
+import sys
+import threading
+import time
+import queue
+import wave
+
+import pyaudiowpatch as pyaudio
+import numpy as np
+
+from audio_mixer import (
+    sample_rate, samples_time, SAMPLE_FORMATS, FORMAT_INT16,
+    round_timestamp, decode_packet, resample_to_target, put_drop_oldest, TimestampMixer
+)
+from capture_trace import TraceWriter
+from runtime_tuning import GcMonitor, set_cpu_affinity, tune_gc
+from utterance_trace import CaptureTracer
+
+# PortAudio 回调 status 中的输入溢出标志（paInputOverflow）：回调没有及时执行，设备缓冲区中的数据被覆盖
+PA_INPUT_OVERFLOW = 0x2
+
+# 运行中出现新的溢出或丢弃时，最多每隔这么多秒报告一次
+OVERFLOW_REPORT_INTERVAL = 10
+
+
+def start_recording(device_indices, output_queue, stop_event, mix_mode="average", debug_save_audio="", record_trace="",
+                    sample_format="float32", control_queue=None, capture_cpus=None, gc_tuning=False,
+                    trace_queue=None, direct_single_device=True, start_event=None):
+    """
+    支持多设备录音，使用设备原生采样率，然后重采样到目标采样率并混音
+    使用基于时间戳的队列同步机制
+    在独立进程中运行，通过output_queue发送音频数据，通过stop_event接收停止信号
+
+    Args:
+        device_indices: 设备索引列表
+        output_queue: 输出队列，每项为 (采集时间戳, 16kHz音频块)
+        stop_event: 停止事件
+        mix_mode: 混音模式，"average"=平均混音，"add"=加法混音
+        debug_save_audio: 调试模式，保存混音后的音频到指定的WAV文件路径
+        record_trace: 调试模式，把每个设备的原始数据包和采集时间戳录制到指定的轨迹文件
+        sample_format: 采集和传输的采样格式，"float32" 或 "int16"（每个采样2字节，传输量减半）
+        control_queue: 可选，运行中接收 ("add", device_idx) / ("remove", device_idx) 命令，
+            增加或移除采集设备，不影响识别进程
+        capture_cpus: 可选，录音子进程（采集回调和混音线程）绑定的CPU核心列表
+        gc_tuning: 设备打开后冻结GC并使用热循环的GC阈值
+        trace_queue: 可选，记录每个数据包的采集、排队、混音和发送事件，成批放入该队列，
+            由识别进程的 utterance_trace.UtteranceTracer 写入时间线
+        direct_single_device: 只有一个采集设备时，采集回调重采样后直接放入输出队列，
+            不经过混音器的队列和处理延迟（保存调试音频时不启用）
+        start_event: 可选，预热启动：完成导入和PortAudio初始化后等待该事件再打开设备，
+            识别进程可以在加载模型之前启动子进程；等待期间 stop_event 置位则直接退出
+    """
+    if not device_indices:
+        print("没有选择任何设备！", file=sys.stderr)
+        return
+
+    # 在创建PortAudio之前绑定，之后创建的回调线程继承绑定
+    if capture_cpus and set_cpu_affinity(capture_cpus):
+        print(f"录音进程绑定到CPU核心 {capture_cpus}", file=sys.stderr)
+    gc_monitor = GcMonitor()
+
+    p = pyaudio.PyAudio()
+
+    format_code = SAMPLE_FORMATS[sample_format]
+    pyaudio_format = pyaudio.paInt16 if format_code == FORMAT_INT16 else pyaudio.paFloat32
+
+    # 调试模式：创建WAV文件用于保存混音结果
+    debug_wav_file = None
+    if debug_save_audio:
+        try:
+            debug_wav_file = wave.open(debug_save_audio, 'wb')
+            debug_wav_file.setnchannels(1)  # 单声道
+            debug_wav_file.setsampwidth(2)  # 16位
+            debug_wav_file.setframerate(sample_rate)
+            print(f"调试模式：混音音频将保存到 {debug_save_audio}", file=sys.stderr)
+        except Exception as e:
+            print(f"无法创建调试音频文件 {debug_save_audio}: {e}", file=sys.stderr)
+            debug_wav_file = None
+
+    # 调试模式：录制采集轨迹，供 replay-capture-trace.py 离线回放
+    trace_writer = None
+    if record_trace:
+        try:
+            trace_writer = TraceWriter(record_trace)
+            print(f"调试模式：采集轨迹将保存到 {record_trace}", file=sys.stderr)
+        except Exception as e:
+            print(f"无法创建采集轨迹文件 {record_trace}: {e}", file=sys.stderr)
+            trace_writer = None
+
+    tracer = CaptureTracer(trace_queue) if trace_queue is not None else None
+
+    # 为每个设备创建队列和流
+    device_queues = {}  # 存储每个设备的数据队列
+    device_streams = {}
+    device_info_map = {}
+    # 每个设备的输入溢出次数（回调执行不及时）和设备队列满时丢弃的数据包数，
+    # 每个计数只由该设备的回调线程修改
+    overflow_counts = {}
+    queue_drop_counts = {}
+
+    # 单设备直通：device 为直通的设备序号，None 表示经过混音器。
+    # 采集回调在锁内判断并输出，混音线程在锁内切换，切换前后的时间槽不会重复或乱序
+    direct_lock = threading.Lock()
+    direct_state = {"device": None, "last_timestamp": -1, "bytes": 0, "dropped": 0}
+
+    def forward_direct(device_idx, timestamp, samples):
+        """直通模式下把数据包直接放入输出队列，返回是否已处理"""
+        with direct_lock:
+            if direct_state["device"] != device_idx:
+                return False
+            # 与混音器一致：同一时间槽的第二个数据包（回调抖动）被丢弃
+            if timestamp <= direct_state["last_timestamp"]:
+                direct_state["dropped"] += 1
+                return True
+            put_start = time.perf_counter() if tracer else 0
+            output_queue.put((timestamp, samples))
+            direct_state["last_timestamp"] = timestamp
+            direct_state["bytes"] += samples.nbytes
+            if tracer:
+                tracer.sent(timestamp, put_start)
+        return True
+
+    def make_capture_callback(device_idx, native_rate, channels, device_queue):
+        """
+        每个设备的采集回调 - 带时间戳放入队列
+
+        使用回调方式而不是阻塞的 stream.read()：没有声音播放时loopback设备不会送来数据，
+        阻塞读取无法被中断，停止时只能等待超时后强制终止进程。
+        """
+        def callback(in_data, frame_count, time_info, status):
+            if stop_event.is_set():
+                return None, pyaudio.paComplete
+            callback_start = time.perf_counter() if tracer else 0
+
+            if status & PA_INPUT_OVERFLOW:
+                overflow_counts[device_idx] = overflow_counts.get(device_idx, 0) + 1
+
+            try:
+                # 获取当前时间戳
+                capture_time = time.time()
+                if trace_writer:
+                    trace_writer.write_packet(device_idx, capture_time, in_data)
+
+                # 四舍五入到最近的samples_time
+                timestamp = round_timestamp(capture_time)
+
+                # 在各设备的回调线程中转换为单声道并重采样到16kHz，多个设备的重采样并行进行，
+                # 混音线程只需要按时间槽相加
+                samples = resample_to_target(decode_packet(in_data, format_code, channels), native_rate,
+                                             format_code)
+
+                if tracer:
+                    tracer.packet_captured(device_idx, timestamp, callback_start)
+
+                # 放入队列，带时间戳；队列满了则丢弃最旧的数据
+                if (not forward_direct(device_idx, timestamp, samples)
+                        and put_drop_oldest(device_queue, (timestamp, samples, sample_rate))):
+                    queue_drop_counts[device_idx] = queue_drop_counts.get(device_idx, 0) + 1
+            except Exception as e:
+                print(f"设备 {device_idx} 采集出错: {e}", file=sys.stderr)
+
+            return None, pyaudio.paContinue
+
+        return callback
+
+    def fetch_packet(device_idx):
+        try:
+            packet = device_queues[device_idx].get_nowait()
+        except queue.Empty:
+            return None  # 该设备暂时没有新数据
+        if tracer:
+            tracer.packet_fetched(device_idx, packet[0])
+        return packet
+
+    def format_overflows(mixer):
+        parts = [f"设备 {idx}: 输入溢出 {overflow_counts.get(idx, 0)} 次，队列丢弃 {queue_drop_counts.get(idx, 0)} 个数据包"
+                 for idx in sorted(set(overflow_counts) | set(queue_drop_counts))]
+        if mixer and mixer.stats.dropped_packets:
+            parts.append(f"混音器丢弃过旧数据包 {mixer.stats.dropped_packets} 个")
+        if direct_state["dropped"]:
+            parts.append(f"直通丢弃重复时间槽数据包 {direct_state['dropped']} 个")
+        return "；".join(parts)
+
+    def overflow_total(mixer):
+        return (sum(overflow_counts.values()) + sum(queue_drop_counts.values())
+                + (mixer.stats.dropped_packets if mixer else 0) + direct_state["dropped"])
+
+    # 统计通过队列传输的数据量
+    transport_bytes = 0
+    transport_start = time.time()
+
+    def open_device(device_idx):
+        """打开设备的音频流，返回 (stream, device_queue)"""
+        device_info = p.get_device_info_by_index(device_idx)
+        device_info_map[device_idx] = device_info
+
+        native_rate = int(device_info['defaultSampleRate'])
+        channels = device_info['maxInputChannels']
+        if channels == 0:  # loopback设备
+            channels = device_info['maxOutputChannels']
+
+        samples_per_read = int(samples_time * native_rate)
+
+        # 创建队列，最多保存10个数据包
+        device_queue = queue.Queue(maxsize=10)
+
+        if trace_writer:
+            trace_writer.write_device(device_idx, native_rate, channels, format_code, device_info['name'])
+        if tracer:
+            tracer.device_opened(device_idx, device_info['name'])
+
+        # 创建音频流，回调在PortAudio的线程中执行
+        stream = p.open(
+            format=pyaudio_format,
+            channels=channels,
+            rate=native_rate,
+            input=True,
+            input_device_index=device_idx,
+            frames_per_buffer=samples_per_read,
+            stream_callback=make_capture_callback(device_idx, native_rate, channels, device_queue)
+        )
+
+        print(f"设备 {device_idx} ({device_info['name']}) 已启动，采样率: {native_rate} Hz", file=sys.stderr)
+        return stream, device_queue
+
+    # 运行中的设备变更：控制线程在后台打开新设备，混音循环在两次 step() 之间（时间槽边界）应用
+    device_changes = queue.Queue()
+    opening_devices = set()
+
+    def open_device_background(device_idx):
+        try:
+            stream, device_queue = open_device(device_idx)
+            device_changes.put(("add", device_idx, stream, device_queue))
+        except Exception as e:
+            print(f"无法打开设备 {device_idx}: {e}", file=sys.stderr)
+            device_changes.put(("failed", device_idx, None, None))
+
+    def control_thread():
+        while not stop_event.is_set():
+            try:
+                command, device_idx = control_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                break
+
+            if command == "add":
+                if device_idx in device_streams or device_idx in opening_devices:
+                    print(f"设备 {device_idx} 已在采集中", file=sys.stderr)
+                    continue
+                opening_devices.add(device_idx)
+                threading.Thread(target=open_device_background, args=(device_idx,), daemon=True).start()
+            elif command == "remove":
+                device_changes.put(("remove", device_idx, None, None))
+            else:
+                print(f"未知的控制命令: {command}", file=sys.stderr)
+
+    def send_mixed(mixed, timestamp, step_start):
+        """输出混音器的一个时间槽"""
+        nonlocal transport_bytes
+        # 调试模式：保存混音结果到WAV文件
+        if debug_wav_file:
+            try:
+                if mixed.dtype == np.int16:
+                    audio_int16 = mixed
+                else:
+                    # 将float32转换为int16
+                    audio_int16 = np.int16(mixed * 32767)
+                debug_wav_file.writeframes(audio_int16.tobytes())
+            except Exception as e:
+                print(f"写入调试音频文件出错: {e}", file=sys.stderr)
+
+        if tracer:
+            tracer.mixed(timestamp, step_start, len(device_queues))
+            put_start = time.perf_counter()
+
+        # 附带时间槽的采集时间戳，识别进程据此换算句子的开始/结束时间
+        output_queue.put((timestamp, mixed))
+        if tracer:
+            tracer.sent(timestamp, put_start)
+        transport_bytes += mixed.nbytes
+
+    def enter_direct_mode(mixer):
+        """只剩一个设备时切换到直通，先输出混音器中尚未输出的数据，保证时间槽的顺序"""
+        if not direct_single_device or debug_wav_file or len(device_streams) != 1:
+            return
+        device_idx = next(iter(device_streams))
+        with direct_lock:
+            while True:
+                step_start = time.perf_counter()
+                mixed, _ = mixer.step(float("inf"), fetch_packet)
+                if mixed is not None:
+                    send_mixed(mixed, mixer.last_processed_timestamp, step_start)
+                elif not mixer.has_pending():
+                    break
+            direct_state["device"] = device_idx
+            direct_state["last_timestamp"] = mixer.last_processed_timestamp
+        print(f"单设备直通：设备 {device_idx} 的音频不经过混音器", file=sys.stderr)
+
+    def leave_direct_mode(mixer):
+        """设备不止一个时回到混音器，已直通输出的时间槽不再由混音器输出"""
+        with direct_lock:
+            if direct_state["device"] is None:
+                return
+            direct_state["device"] = None
+            mixer.last_processed_timestamp = max(mixer.last_processed_timestamp, direct_state["last_timestamp"])
+
+    def apply_device_changes(mixer):
+        while not device_changes.empty():
+            command, device_idx, stream, device_queue = device_changes.get_nowait()
+            if command == "add":
+                leave_direct_mode(mixer)
+                opening_devices.discard(device_idx)
+                device_streams[device_idx] = stream
+                device_queues[device_idx] = device_queue
+                mixer.add_device(device_idx)
+            elif command == "failed":
+                opening_devices.discard(device_idx)
+            elif command == "remove":
+                if device_idx not in device_streams:
+                    print(f"设备 {device_idx} 不在采集中", file=sys.stderr)
+                    continue
+                leave_direct_mode(mixer)
+                mixer.remove_device(device_idx)
+                device_streams.pop(device_idx).close()
+                device_queues.pop(device_idx)
+                print(f"设备 {device_idx} 已移除", file=sys.stderr)
+                if not device_streams:
+                    print("当前没有任何采集设备", file=sys.stderr)
+                enter_direct_mode(mixer)
+            print(f"当前采集设备: {list(device_streams.keys())}", file=sys.stderr)
+
+    # 为每个设备创建流
+    mixer = None
+    try:
+        while start_event is not None and not start_event.wait(0.01):
+            if stop_event.is_set():
+                return
+
+        for device_idx in device_indices:
+            device_streams[device_idx], device_queues[device_idx] = open_device(device_idx)
+
+        # 混音线程：基于时间戳同步处理
+        mixer = TimestampMixer(device_indices, mix_mode, max_latencies=1000, sample_format=format_code)
+        transport_start = time.time()
+
+        if control_queue is not None:
+            threading.Thread(target=control_thread, daemon=True).start()
+
+        enter_direct_mode(mixer)
+
+        if gc_tuning:
+            tune_gc()
+        reported_total = 0
+        next_report = time.time() + OVERFLOW_REPORT_INTERVAL
+
+        while not stop_event.is_set():
+            if not device_changes.empty():
+                apply_device_changes(mixer)
+
+            if time.time() >= next_report:
+                next_report = time.time() + OVERFLOW_REPORT_INTERVAL
+                total = overflow_total(mixer)
+                if total != reported_total:
+                    reported_total = total
+                    print(f"采集溢出: {format_overflows(mixer)}", file=sys.stderr)
+
+            if tracer:
+                tracer.maybe_flush()
+
+            if direct_state["device"] is not None:
+                # 采集回调直接输出，这里只处理设备变更、溢出报告和追踪事件
+                stop_event.wait(samples_time)
+                continue
+
+            step_start = time.perf_counter()
+            mixed, sleep_time = mixer.step(time.time(), fetch_packet)
+
+            if mixed is None:
+                if sleep_time > 0:
+                    # 用 stop_event.wait 代替 time.sleep，停止信号可以立即打断等待
+                    stop_event.wait(sleep_time)
+                continue
+
+            send_mixed(mixed, mixer.last_processed_timestamp, step_start)
+
+    finally:
+        # 清理资源：直接关闭流，PortAudio会丢弃尚未送出的缓冲区，不等待正在进行的采集
+        # 已在后台打开、尚未加入混音器的设备也要关闭
+        streams = list(device_streams.values())
+        while not device_changes.empty():
+            command, _, stream, _ = device_changes.get_nowait()
+            if command == "add":
+                streams.append(stream)
+        for stream in streams:
+            if stream:
+                try:
+                    stream.close()
+                except Exception as e:
+                    print(f"关闭音频流出错: {e}", file=sys.stderr)
+
+        if p:
+            p.terminate()
+
+        # 清空设备队列中尚未混音的数据；停止后输出队列中剩余的数据也不再需要，
+        # 进程退出时不等待它们写入管道，避免识别进程不再读取时退出被阻塞
+        for device_queue in device_queues.values():
+            while not device_queue.empty():
+                device_queue.get_nowait()
+        output_queue.cancel_join_thread()
+
+        # 关闭调试音频文件
+        if debug_wav_file:
+            try:
+                debug_wav_file.close()
+                print(f"调试音频已保存到 {debug_save_audio}", file=sys.stderr)
+            except Exception as e:
+                print(f"关闭调试音频文件出错: {e}", file=sys.stderr)
+
+        if trace_writer:
+            trace_writer.close()
+            print(f"采集轨迹已保存到 {record_trace}", file=sys.stderr)
+
+        if tracer:
+            tracer.flush()
+
+        transport_bytes += direct_state["bytes"]
+        elapsed = time.time() - transport_start
+        if transport_bytes and elapsed > 0:
+            print(f"传输数据量 ({sample_format}): {transport_bytes / elapsed:.0f} 字节/秒", file=sys.stderr)
+
+        print(f"采集溢出: {format_overflows(mixer) or '无'}", file=sys.stderr)
+        print(f"录音进程 {gc_monitor.format_summary()}", file=sys.stderr)
+        gc_monitor.close()
+
+
+def get_audio_devices(p_audio):
+    """
+    获取所有音频设备信息（仅MME主机API）
+
+    Returns:
+        list: 设备信息列表，每个元素为 (index, device_info) 元组
+    """
+    device_count = p_audio.get_device_count()
+
+    if device_count == 0:
+        return []
+
+    # 设备太多，仅显示一部分
+    host_api = 0
+    for i in range(p_audio.get_host_api_count()):
+        host_api_info = p_audio.get_host_api_info_by_index(i)
+        if "MME" in host_api_info['name']:
+            host_api = i
+
+    # 获取所有设备信息
+    devices = []
+    for i in range(device_count):
+        device_info = p_audio.get_device_info_by_index(i)
+        if device_info['hostApi'] == host_api:
+            devices.append((i, device_info))
+
+    return devices
+
+
+def cleanup_recording_process(stop_event, recording_process, samples_queue=None, timeout=1.0):
+    """
+    清理录音进程的辅助函数
+
+    Args:
+        stop_event: multiprocessing.Event 停止事件
+        recording_process: multiprocessing.Process 录音进程
+        samples_queue: 录音进程的输出队列，等待期间持续清空，避免子进程因管道写满而无法退出
+        timeout: 等待子进程自行退出的最长时间（秒），超时后强制终止
+    """
+    # 通知录音子进程停止
+    if stop_event:
+        stop_event.set()
+    # 等待录音子进程结束
+    if recording_process and recording_process.is_alive():
+        deadline = time.monotonic() + timeout
+        while recording_process.is_alive() and time.monotonic() < deadline:
+            drain_queue(samples_queue)
+            recording_process.join(timeout=0.01)
+        if recording_process.is_alive():
+            recording_process.terminate()
+            recording_process.join()
+    drain_queue(samples_queue)
+
+
+def start_control_reader(control_queue, input_stream=None):
+    """
+    在后台线程中从标准输入读取控制命令（每行一条），转发给录音进程：
+
+        add <设备序号>      增加采集设备
+        remove <设备序号>   移除采集设备
+
+    录音进程在时间槽边界应用变更，识别器和识别流不受影响，无需重新加载模型。
+
+    控制命令只用于命令行运行：TMSpeech 的命令行识别器（CommandRecognizer）不重定向标准输入，
+    GUI 父进程下标准输入可能不存在（sys.stdin 为 None）或不可读，此时不启动读取线程，返回 None。
+    """
+    input_stream = input_stream or sys.stdin
+    try:
+        if input_stream is None or input_stream.closed or not input_stream.readable():
+            return None
+    except (OSError, ValueError):
+        return None
+
+    def reader():
+        for line in input_stream:
+            parts = line.split()
+            if not parts:
+                continue
+            if len(parts) == 2 and parts[0] in ("add", "remove") and parts[1].isdigit():
+                control_queue.put((parts[0], int(parts[1])))
+            else:
+                print(f"无法识别的控制命令: {line.strip()}（可用命令: add <设备序号>, remove <设备序号>）",
+                      file=sys.stderr)
+
+    thread = threading.Thread(target=reader, daemon=True)
+    thread.start()
+    return thread
+
+
+def drain_queue(q):
+    """丢弃队列中所有剩余的数据"""
+    if q is None:
+        return
+    try:
+        while True:
+            q.get_nowait()
+    except (queue.Empty, OSError, ValueError):
+        pass
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+#
+# Copyright (c)  2025  Xiaomi Corporation
+
+"""
+基于时间戳的多设备混音逻辑。
+start_recording 使用实时时钟驱动混音器，replay-capture-trace.py 使用虚拟时钟驱动，
+两者共用同一份混音代码，便于离线复现和比较混音器的改动。
+
+本模块会在录音子进程中导入，只允许依赖numpy和标准库。
+"""
+
+import heapq
+import sys
+import queue
+from collections import deque
+
+import numpy as np
+
+DEBUG = False
+
+sample_rate = 16000  # Please don't change it
+samples_time = 0.05  # 0.05s
+
+# 采集数据的采样格式（与 capture_trace 中记录的格式编号一致）
+# float32 的取值范围为 [-1, 1]，int16 保持原始的 [-32768, 32767]，
+# 两种格式都在整条链路上保持不变，只在送入识别器时转换一次（见 to_float32_samples）
+FORMAT_FLOAT32 = 1
+FORMAT_INT16 = 2
+
+SAMPLE_FORMATS = {"float32": FORMAT_FLOAT32, "int16": FORMAT_INT16}
+
+
+def round_timestamp(ts):
+    """将时间戳四舍五入到最近的samples_time"""
+    return round(ts / samples_time) * samples_time
+
+
+def to_format(samples, sample_format):
+    """把计算结果转换回链路上的采样格式，避免numpy隐式提升为float64"""
+    if sample_format == FORMAT_INT16:
+        if samples.dtype == np.int16:
+            return samples
+        return np.clip(np.rint(samples), -32768, 32767).astype(np.int16)
+    return samples.astype(np.float32, copy=False)
+
+
+def to_float32_samples(samples):
+    """音频进入识别器时唯一的一次格式转换：统一为 [-1, 1] 的float32"""
+    if samples.dtype == np.int16:
+        return samples.astype(np.float32) / 32768
+    return samples.astype(np.float32, copy=False)
+
+
+def decode_packet(data, sample_format, channels):
+    """将设备读到的原始字节转换为单声道numpy数组，保持原采样格式"""
+    if sample_format == FORMAT_INT16:
+        samples = np.frombuffer(data, dtype=np.int16)
+    else:
+        samples = np.frombuffer(data, dtype=np.float32)
+
+    # 如果是多声道，转换为单声道
+    if channels > 1:
+        samples = samples.reshape(-1, channels)
+        return to_format(np.mean(samples, axis=1, dtype=np.float32), sample_format)
+
+    return np.copy(samples)
+
+
+def resample_fft(samples, num):
+    """
+    基于FFT的重采样，与 scipy.signal.resample 对一维实信号的结果一致，
+    这样录音子进程无需导入scipy
+    """
+    nx = len(samples)
+    spectrum = np.fft.rfft(samples)
+    resampled = np.zeros(num // 2 + 1, dtype=spectrum.dtype)
+
+    # 复制低频部分（包括可能存在的Nyquist分量），截断或补零高频部分
+    n = min(num, nx)
+    nyq = n // 2 + 1
+    resampled[:nyq] = spectrum[:nyq]
+
+    # 拆分或合并Nyquist分量
+    if n % 2 == 0:
+        if num < nx:  # 降采样
+            resampled[n // 2] *= 2.0
+        elif num > nx:  # 升采样
+            resampled[n // 2] *= 0.5
+
+    return np.fft.irfft(resampled, num) * (num / nx)
+
+
+def resample_to_target(samples, native_rate, sample_format):
+    """重采样到目标采样率，结果保持原采样格式"""
+    if native_rate == sample_rate:
+        return samples
+    num_samples = int(len(samples) * sample_rate / native_rate)
+    resampled = resample_fft(samples.astype(np.float32, copy=False), num_samples)
+    return to_format(resampled, sample_format)
+
+
+def put_drop_oldest(q, item):
+    """
+    放入有界队列，队列满时丢弃最旧的数据
+
+    Returns:
+        bool: 是否丢弃了数据
+    """
+    try:
+        q.put(item, block=False)
+        return False
+    except queue.Full:
+        try:
+            q.get_nowait()
+            q.put(item, block=False)
+        except:
+            pass
+        return True
+
+
+class MixerStats:
+    """混音器的统计信息，采样数均以目标采样率计"""
+    def __init__(self, max_latencies=None):
+        self.output_slots = 0
+        self.output_samples = 0
+        self.dropped_packets = 0  # 因时间戳过旧被丢弃的数据包
+        self.dropped_samples = 0  # 过旧丢弃以及长度不匹配时被裁掉的采样
+        self.filled_samples = 0  # 部分设备未就绪时，缺失设备由其余设备的混音顶替的采样
+        self.partial_slots = 0  # 出现"设备就绪"不全的时间槽
+        self.length_mismatches = 0
+        self.latencies = deque(maxlen=max_latencies)  # 每个输出槽：输出时刻 - 槽时间戳
+
+
+class TimestampMixer:
+    """
+    基于时间戳的队列同步混音器
+
+    每次调用 step() 执行一次混音迭代：从各设备取数据到pending槽位，
+    等待最早的时间槽达到处理延迟后，重采样并混音该时间槽的所有设备数据。
+
+    每个设备最多有一个pending数据包，所有pending数据包按 (时间戳, 设备顺序) 放在一个最小堆中，
+    每个数据包的入堆、出堆都是 O(log 设备数)；每次迭代只轮询没有pending数据的设备，
+    等待期间的迭代不再遍历所有设备。
+    """
+    def __init__(self, device_indices, mix_mode="average", processing_delay=3 * samples_time, max_latencies=None,
+                 sample_format=FORMAT_FLOAT32):
+        """
+        Args:
+            device_indices: 设备索引列表
+            mix_mode: 混音模式，"average"=平均混音，"add"=加法混音
+            processing_delay: 处理延迟，时间槽至少要这么旧才会被处理
+            max_latencies: 最多保留多少个输出槽的延迟记录，None表示全部保留（用于离线回放）
+            sample_format: 数据包的采样格式，混音结果保持同一格式
+        """
+        self.device_indices = list(device_indices)
+        self.mix_mode = mix_mode
+        self.sample_format = sample_format
+        self.processing_delay = processing_delay
+        self.last_processed_timestamp = -1  # 已处理的最新时间戳
+        self.device_pending_data = {}  # 每个设备已获取但未处理的数据槽位
+        self.pending_heap = []  # (timestamp, 设备顺序, device_idx)，与 device_pending_data 一一对应
+        self.device_order = {idx: order for order, idx in enumerate(self.device_indices)}
+        self.next_order = len(self.device_indices)
+        self.idle_devices = list(enumerate(self.device_indices))  # 没有pending数据的 (设备顺序, device_idx)
+        self.stats = MixerStats(max_latencies)
+
+    def has_pending(self):
+        return bool(self.pending_heap)
+
+    def add_device(self, device_idx):
+        """
+        运行中加入设备
+
+        step() 每次只处理完整的时间槽，在两次 step() 之间调用即在时间槽边界加入：
+        新设备从它的第一个数据包所在的时间槽开始参与混音，已输出的时间槽不受影响。
+        """
+        if device_idx in self.device_order:
+            return
+        order = self.next_order
+        self.next_order += 1
+        self.device_order[device_idx] = order
+        self.device_indices.append(device_idx)
+        self.idle_devices.append((order, device_idx))
+
+    def remove_device(self, device_idx):
+        """运行中移除设备，丢弃它尚未混音的数据包"""
+        if device_idx not in self.device_order:
+            return
+        del self.device_order[device_idx]
+        self.device_indices.remove(device_idx)
+        self.idle_devices = [(order, idx) for order, idx in self.idle_devices if idx != device_idx]
+        if self.device_pending_data.pop(device_idx, None) is not None:
+            self.pending_heap = [entry for entry in self.pending_heap if entry[2] != device_idx]
+            heapq.heapify(self.pending_heap)
+
+    def _pop_slot(self, target_timestamp):
+        """取出堆顶所有时间戳为 target_timestamp 的数据包，按设备顺序返回 [(device_idx, packet)]"""
+        popped = []
+        heap = self.pending_heap
+        while heap and heap[0][0] == target_timestamp:
+            _, order, device_idx = heapq.heappop(heap)
+            popped.append((device_idx, self.device_pending_data.pop(device_idx)))
+            self.idle_devices.append((order, device_idx))
+        return popped
+
+    def step(self, now, fetch_packet):
+        """
+        执行一次混音迭代
+
+        Args:
+            now: 当前时间（实时时钟或虚拟时钟）
+            fetch_packet: fetch_packet(device_idx) 返回 (timestamp, samples, native_rate)，没有数据时返回 None
+
+        Returns:
+            (mixed, sleep_time): mixed 为混音结果，本次没有输出时为 None；
+            sleep_time 为调用方在下一次迭代前应休眠的时间
+        """
+        device_pending_data = self.device_pending_data
+        heap = self.pending_heap
+
+        # Phase 1: 只为没有pending数据的设备从队列中获取数据
+        if self.idle_devices:
+            still_idle = []
+            for order, device_idx in self.idle_devices:
+                packet = fetch_packet(device_idx)
+                if packet is None:
+                    still_idle.append((order, device_idx))
+                else:
+                    device_pending_data[device_idx] = packet
+                    heapq.heappush(heap, (packet[0], order, device_idx))
+            self.idle_devices = still_idle
+
+        if not heap:
+            # 没有任何pending数据，短暂休眠后继续
+            return None, 0.01
+
+        # Phase 2: 堆顶即所有设备中最早的时间戳
+        target_timestamp = heap[0][0]
+
+        # 检查是否应该丢弃（时间戳过旧）
+        if target_timestamp <= self.last_processed_timestamp:
+            # 丢弃所有该时间戳的数据
+            for device_idx, (timestamp, samples, native_rate) in self._pop_slot(target_timestamp):
+                self.stats.dropped_packets += 1
+                self.stats.dropped_samples += int(len(samples) * sample_rate / native_rate)
+                if DEBUG:
+                    print(f"丢弃过旧数据包: 设备 {device_idx}, 时间戳 {timestamp:.3f}", file=sys.stderr)
+            return None, 0
+
+        # 检查是否已经足够旧（达到处理延迟）
+        age = now - target_timestamp
+        if age < self.processing_delay:
+            # 还不够旧，等待
+            wait_time = self.processing_delay - age
+            return None, min(wait_time, 0.01)  # 最多等待10ms
+
+        # Phase 3: 取出该时间戳的所有设备数据（按设备顺序）
+        device_data_ready = self._pop_slot(target_timestamp)
+
+        # 检查是否所有设备都有该时间戳的数据
+        missing_devices = len(self.device_indices) - len(device_data_ready)
+        if missing_devices > 0:
+            self.stats.partial_slots += 1
+            if DEBUG:
+                print(f"时间戳 {target_timestamp:.3f}: {len(device_data_ready)}/{len(self.device_indices)} 设备就绪", file=sys.stderr)
+
+        # Phase 4: 重采样和混音；start_recording 的数据包已在采集回调中重采样到16kHz，这里不再有重采样开销
+        resampled_samples = [
+            resample_to_target(samples, native_rate, self.sample_format)
+            for _, (_, samples, native_rate) in device_data_ready
+        ]
+
+        # 混音：根据mix_mode选择混音算法
+        if len(resampled_samples) == 1:
+            mixed = resampled_samples[0]
+        else:
+            # 找到最短的长度，避免长度不匹配
+            max_length = max(len(s) for s in resampled_samples)
+            min_length = min(len(s) for s in resampled_samples)
+            if max_length != min_length:
+                self.stats.length_mismatches += 1
+                self.stats.dropped_samples += sum(len(s) - min_length for s in resampled_samples)
+                print(f"长度不匹配：{min_length} - {max_length}", file=sys.stderr)
+            trimmed_samples = [s[:min_length] for s in resampled_samples]
+
+            # 根据混音模式选择算法，在float32中累加，避免int16溢出和float64提升
+            if self.mix_mode == "add":
+                mixed = np.sum(trimmed_samples, axis=0, dtype=np.float32)
+            else:  # average
+                mixed = np.mean(trimmed_samples, axis=0, dtype=np.float32)
+            mixed = to_format(mixed, self.sample_format)
+
+        self.stats.filled_samples += missing_devices * len(mixed)
+        self.stats.output_slots += 1
+        self.stats.output_samples += len(mixed)
+        self.stats.latencies.append(now - target_timestamp)
+
+        # 更新已处理的时间戳
+        self.last_processed_timestamp = target_timestamp
+
+        return mixed, 0
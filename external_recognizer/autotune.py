@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+#
+# Copyright (c)  2025  Xiaomi Corporation
+
+"""
+推理线程数 / provider 的自动调优。
+
+校准模式下对所选模型用不同的线程数和provider执行有代表性的解码并计时，
+把最快的配置缓存到磁盘，以模型文件的哈希和CPU特征作为键。
+之后启动时如果命令行没有显式指定，就直接使用缓存的配置。
+"""
+
+import copy
+import hashlib
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+from synthetic_audio import synthetic_audio
+
+script_dir = os.path.dirname(os.path.realpath(__file__))
+default_cache_path = os.path.join(script_dir, "autotune_cache.json")
+
+# 线程数只多出不到这个比例的收益时，优先选择更少的线程，给采集和VAD留出CPU
+THREADS_TOLERANCE = 0.05
+
+# sherpa_onnx 在请求的provider不可用时不报错，只在stderr输出这条日志并改用CPU
+PROVIDER_FALLBACK_MESSAGE = "fallback to cpu"
+
+
+def calibration_audio(sample_rate, seconds=5):
+    """
+    校准用的固定音频：synthetic_audio 的合成“说话”音频，中间只有很短的停顿。
+    随机噪声会让模型几乎不输出token，解码耗时低于真实语音；固定随机种子，保证每次校准的输入相同
+    """
+    samples = synthetic_audio(seconds, seed=0, sample_rate=sample_rate,
+                              speech_seconds=(0.8, 2.0), pause_seconds=(0.1, 0.3))
+    return samples[:int(sample_rate * seconds)]
+
+
+def create_with_provider_check(create_recognizer, num_threads, provider):
+    """
+    创建识别器，并确认实际使用的provider
+
+    sherpa_onnx 的C++代码直接写进程的stderr，这里临时把文件描述符2重定向到临时文件，
+    创建完成后原样输出，并检查其中是否有回退到CPU的日志
+
+    Returns:
+        (识别器, 实际使用的provider)
+    """
+    sys.stderr.flush()
+    try:
+        saved_fd = os.dup(2)
+    except OSError:
+        return create_recognizer(num_threads, provider), provider
+    with tempfile.TemporaryFile() as log:
+        os.dup2(log.fileno(), 2)
+        try:
+            recognizer = create_recognizer(num_threads, provider)
+        finally:
+            sys.stderr.flush()
+            os.dup2(saved_fd, 2)
+            os.close(saved_fd)
+            log.seek(0)
+            output = log.read().decode("utf-8", "replace")
+            if output:
+                print(output, end="", file=sys.stderr)
+    if provider != "cpu" and PROVIDER_FALLBACK_MESSAGE in output.lower():
+        return recognizer, "cpu"
+    return recognizer, provider
+
+
+def cpu_signature():
+    """描述当前机器CPU的字符串，CPU不同的机器不共享调优结果"""
+    return "|".join([
+        sys.platform,
+        platform.machine(),
+        platform.processor() or "unknown",
+        str(os.cpu_count()),
+    ])
+
+
+def candidate_thread_counts(max_threads=None):
+    """1, 2, 4, 8 ... 直到CPU核数（包含核数本身）"""
+    max_threads = max_threads or os.cpu_count() or 1
+    counts = []
+    n = 1
+    while n < max_threads:
+        counts.append(n)
+        n *= 2
+    counts.append(max_threads)
+    return counts
+
+
+class AutotuneCache:
+    """磁盘上的调优结果缓存（JSON），同时缓存模型文件的哈希，避免每次启动都重新计算"""
+    def __init__(self, path=default_cache_path):
+        self.path = path
+        self.data = {"file_hashes": {}, "configs": {}}
+        self.dirty = False
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self.data.update(json.load(f))
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"无法读取自动调优缓存 {path}: {e}", file=sys.stderr)
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+    def file_hash(self, path):
+        """模型文件的sha256，文件大小和修改时间不变时直接使用缓存的值"""
+        path = os.path.realpath(path)
+        stat = os.stat(path)
+        cached = self.data["file_hashes"].get(path)
+        if cached and cached["size"] == stat.st_size and cached["mtime"] == stat.st_mtime:
+            return cached["sha256"]
+
+        sha256 = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                sha256.update(chunk)
+        digest = sha256.hexdigest()
+        self.data["file_hashes"][path] = {"size": stat.st_size, "mtime": stat.st_mtime, "sha256": digest}
+        self.dirty = True
+        return digest
+
+    def key(self, model_files):
+        hashes = ",".join(self.file_hash(p) for p in model_files)
+        return f"{hashes}|{cpu_signature()}"
+
+    def lookup(self, model_files):
+        config = self.data["configs"].get(self.key(model_files))
+        if self.dirty:
+            # 保存新计算的文件哈希，下次启动无需重新计算
+            try:
+                self.save()
+            except Exception as e:
+                print(f"无法保存自动调优缓存 {self.path}: {e}", file=sys.stderr)
+        return config
+
+    def store(self, model_files, config):
+        self.data["configs"][self.key(model_files)] = config
+        self.save()
+
+
+def calibrate(create_recognizer, decode_once, thread_counts, providers, repeats=3):
+    """
+    对每个 provider × 线程数 组合计时
+
+    Args:
+        create_recognizer: create_recognizer(num_threads, provider) 返回识别器
+        decode_once: decode_once(recognizer) 执行一次有代表性的解码
+        thread_counts: 候选线程数列表
+        providers: 候选provider列表，创建失败或被 sherpa_onnx 回退到CPU的provider会被跳过
+        repeats: 每个组合计时的次数，取中位数
+
+    Returns:
+        (best, results): best 为最快的配置，results 为所有组合的结果
+    """
+    results = []
+    for provider in providers:
+        for num_threads in thread_counts:
+            try:
+                recognizer, effective_provider = create_with_provider_check(create_recognizer, num_threads, provider)
+                decode_once(recognizer)  # 预热
+            except Exception as e:
+                print(f"provider {provider} 不可用，跳过: {e}", file=sys.stderr)
+                break
+            if effective_provider != provider:
+                # 实际在CPU上运行，计时结果不能记为该provider的，否则缓存的provider每次启动都会回退
+                print(f"provider {provider} 不可用（sherpa_onnx 回退到了 {effective_provider}），跳过",
+                      file=sys.stderr)
+                del recognizer
+                break
+
+            times = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                decode_once(recognizer)
+                times.append(time.perf_counter() - start)
+            seconds = statistics.median(times)
+            results.append({"provider": provider, "num_threads": num_threads, "seconds": seconds})
+            print(f"  provider={provider} num_threads={num_threads}: {seconds * 1000:.1f} ms", file=sys.stderr)
+            del recognizer
+
+    if not results:
+        raise RuntimeError("没有任何可用的推理配置")
+
+    fastest = min(r["seconds"] for r in results)
+    best = min(
+        (r for r in results if r["seconds"] <= fastest * (1 + THREADS_TOLERANCE)),
+        key=lambda r: (r["num_threads"], r["seconds"]),
+    )
+    return best, results
+
+
+def resolve_inference_config(args, model_files, create_recognizer, decode_once,
+                             default_num_threads, default_provider="cpu", max_threads=None):
+    """
+    确定 args.num_threads 和 args.provider
+
+    命令行显式指定的值优先；--calibrate 时重新校准并写入缓存；
+    否则使用缓存的结果；都没有时使用默认值。
+
+    Args:
+        args: 命令行参数，需要包含 num_threads、provider、calibrate、calibrate_providers、autotune_cache
+        model_files: 用于计算缓存键的模型文件列表
+        create_recognizer: create_recognizer(args) 按args创建识别器
+        decode_once: decode_once(recognizer) 执行一次有代表性的解码
+        max_threads: 可选，推理线程数的上限（线程预算中分给推理的部分），
+            校准只尝试不超过上限的线程数，缓存或命令行的值超过上限时被截断
+    """
+    cache = AutotuneCache(args.autotune_cache)
+
+    if args.calibrate:
+        providers = [args.provider] if args.provider else args.calibrate_providers.split(",")
+        thread_counts = [args.num_threads] if args.num_threads else candidate_thread_counts(max_threads)
+        print(f"正在校准推理配置，线程数: {thread_counts}，provider: {providers}", file=sys.stderr)
+
+        def create(num_threads, provider):
+            trial_args = copy.copy(args)
+            trial_args.num_threads = num_threads
+            trial_args.provider = provider
+            return create_recognizer(trial_args)
+
+        best, results = calibrate(create, decode_once, thread_counts, providers)
+        cache.store(model_files, {"num_threads": best["num_threads"], "provider": best["provider"],
+                                  "seconds": best["seconds"], "results": results})
+        print(f"校准完成，最佳配置: provider={best['provider']} num_threads={best['num_threads']}，"
+              f"已保存到 {cache.path}", file=sys.stderr)
+        cached = best
+    elif args.num_threads is None or args.provider is None:
+        cached = cache.lookup(model_files)
+        if cached:
+            print(f"使用自动调优缓存: provider={cached['provider']} num_threads={cached['num_threads']}",
+                  file=sys.stderr)
+        else:
+            cached = {}
+    else:
+        cached = {}
+
+    if args.num_threads is None:
+        args.num_threads = cached.get("num_threads", default_num_threads)
+    if max_threads and args.num_threads > max_threads:
+        print(f"推理线程数 {args.num_threads} 超过线程预算，使用 {max_threads}", file=sys.stderr)
+        args.num_threads = max_threads
+    if args.provider is None:
+        args.provider = cached.get("provider", default_provider)
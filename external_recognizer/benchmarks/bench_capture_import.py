@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+#
+# Copyright (c)  2025  Xiaomi Corporation
+
+"""
+测量录音子进程的启动耗时。
+
+以spawn方式启动子进程（与Windows上的默认行为一致），在子进程中导入录音入口模块，
+报告从 Process.start() 到模块导入完成（即可以开始打开音频流）的耗时、其中的导入耗时，
+以及子进程中是否加载了 sherpa_onnx、scipy、tkinter 等重量级模块。
+
+Usage:
+
+python benchmarks/bench_capture_import.py
+python benchmarks/bench_capture_import.py --repeat 10
+"""
+import argparse
+import importlib
+import multiprocessing
+import os
+import queue
+import statistics
+import sys
+import time
+
+script_dir = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, script_dir)
+
+HEAVY_MODULES = ["sherpa_onnx", "scipy", "tkinter"]
+
+
+def child(module_name, spawn_time, result_queue):
+    import_start = time.time()
+    try:
+        importlib.import_module(module_name)
+        error = ""
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    now = time.time()
+    loaded = [m for m in HEAVY_MODULES if m in sys.modules]
+    result_queue.put((now - spawn_time, now - import_start, loaded, error))
+
+
+def measure(ctx, module_name, repeat):
+    ready_times = []
+    import_times = []
+    loaded = []
+    for _ in range(repeat):
+        result_queue = ctx.Queue()
+        process = ctx.Process(target=child, args=(module_name, time.time(), result_queue))
+        process.start()
+        result = None
+        while result is None:
+            try:
+                result = result_queue.get(timeout=0.5)
+            except queue.Empty:
+                if not process.is_alive():
+                    result = (0, 0, [], f"子进程异常退出，退出码 {process.exitcode}")
+        process.join()
+        ready, imported, loaded, error = result
+        if error:
+            # 导入失败时不计算统计量（第一次就失败时没有任何测量值）
+            return None, None, loaded, error
+        ready_times.append(ready * 1000)
+        import_times.append(imported * 1000)
+    return statistics.median(ready_times), statistics.median(import_times), loaded, ""
+
+
+def main():
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="每个模块测量的次数，取中位数")
+    args = parser.parse_args()
+    if args.repeat < 1:
+        parser.error("--repeat 至少为 1")
+
+    ctx = multiprocessing.get_context("spawn")
+    print(f"{'模块':<22}{'就绪(ms)':>10}{'导入(ms)':>10}  重量级模块")
+    for module_name in ["audio_capture", "common_audio_utils"]:
+        ready, imported, loaded, error = measure(ctx, module_name, args.repeat)
+        if error:
+            print(f"{module_name:<22}导入失败: {error}")
+            continue
+        print(f"{module_name:<22}{ready:>10.1f}{imported:>10.1f}  {', '.join(loaded) or '无'}")
+
+
+if __name__ == "__main__":
+    main()
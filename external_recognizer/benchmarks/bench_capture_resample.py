@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+#
+# Copyright (c)  2025  Xiaomi Corporation
+
+"""
+比较重采样放在混音线程和放在各设备采集线程中的差别。
+
+模拟 N 个 48 kHz 双声道设备，每个设备一个线程按真实时间每 50 ms 产生一个数据包（float32，
+随机内容），混音线程按 start_recording 的方式运行 TimestampMixer：
+  - mixer：采集线程只转换为单声道，混音线程在 step() 中逐个设备重采样（以前的做法）
+  - capture：采集线程转换为单声道并重采样到16kHz，混音线程只负责相加（现在的做法）
+
+报告每个输出时间槽的 step() 耗时（混音线程每个时间槽被占用的时间）、
+输出延迟（时间槽时间戳到混音完成），以及采集线程中每个数据包的处理耗时。
+
+Usage:
+
+python benchmarks/bench_capture_resample.py
+python benchmarks/bench_capture_resample.py --devices 1 4 8 16 --seconds 20
+"""
+import argparse
+import os
+import queue
+import sys
+import threading
+import time
+
+script_dir = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, script_dir)
+
+import numpy as np
+
+from audio_mixer import (
+    sample_rate, samples_time, FORMAT_FLOAT32,
+    round_timestamp, decode_packet, resample_to_target, put_drop_oldest, TimestampMixer
+)
+
+
+def get_args():
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--devices", type=int, nargs="+", default=[1, 4, 8], help="设备数")
+    parser.add_argument("--seconds", type=float, default=10, help="每种配置运行的时长")
+    parser.add_argument("--native-rate", type=int, default=48000, help="模拟设备的采样率")
+    parser.add_argument("--channels", type=int, default=2, help="模拟设备的声道数")
+    return parser.parse_args()
+
+
+def capture_thread(device_idx, device_queue, stop_event, native_rate, channels, resample_in_capture, capture_times):
+    rng = np.random.default_rng(device_idx)
+    frames = int(samples_time * native_rate)
+    data = (rng.standard_normal(frames * channels) * 0.1).astype(np.float32).tobytes()
+    next_time = time.time() + rng.uniform(0, samples_time)
+    while not stop_event.wait(max(next_time - time.time(), 0)):
+        capture_time = time.time()
+        start = time.perf_counter()
+        samples = decode_packet(data, FORMAT_FLOAT32, channels)
+        if resample_in_capture:
+            samples = resample_to_target(samples, native_rate, FORMAT_FLOAT32)
+            packet = (round_timestamp(capture_time), samples, sample_rate)
+        else:
+            packet = (round_timestamp(capture_time), samples, native_rate)
+        put_drop_oldest(device_queue, packet)
+        capture_times.append(time.perf_counter() - start)
+        next_time += samples_time
+
+
+def run(num_devices, seconds, native_rate, channels, resample_in_capture):
+    stop_event = threading.Event()
+    device_queues = {idx: queue.Queue(maxsize=10) for idx in range(num_devices)}
+    capture_times = []
+    threads = [threading.Thread(target=capture_thread,
+                                args=(idx, device_queues[idx], stop_event, native_rate, channels,
+                                      resample_in_capture, capture_times), daemon=True)
+               for idx in range(num_devices)]
+    for thread in threads:
+        thread.start()
+
+    def fetch_packet(device_idx):
+        try:
+            return device_queues[device_idx].get_nowait()
+        except queue.Empty:
+            return None
+
+    mixer = TimestampMixer(list(range(num_devices)), sample_format=FORMAT_FLOAT32)
+    tick_times = []
+    latencies = []
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        start = time.perf_counter()
+        mixed, sleep_time = mixer.step(time.time(), fetch_packet)
+        elapsed = time.perf_counter() - start
+        if mixed is None:
+            if sleep_time > 0:
+                time.sleep(sleep_time)
+            continue
+        tick_times.append(elapsed)
+        latencies.append(time.time() - mixer.last_processed_timestamp)
+
+    stop_event.set()
+    for thread in threads:
+        thread.join()
+    # 前1秒是启动阶段，不计入
+    skip = int(1 / samples_time)
+    return np.array(tick_times[skip:]) * 1000, np.array(latencies[skip:]) * 1000, np.array(capture_times) * 1000
+
+
+def main():
+    args = get_args()
+    print(f"{args.native_rate} Hz {args.channels} 声道，每种配置 {args.seconds:g} s")
+    print(f"{'设备数':<8}{'重采样位置':<10}{'每个时间槽p50(ms)':>18}{'p99(ms)':>10}"
+          f"{'输出延迟p50(ms)':>16}{'p99(ms)':>10}{'采集每包p50(ms)':>16}")
+    for num_devices in args.devices:
+        for name, resample_in_capture in [("mixer", False), ("capture", True)]:
+            ticks, latencies, captures = run(num_devices, args.seconds, args.native_rate, args.channels,
+                                             resample_in_capture)
+            print(f"{num_devices:<8}{name:<10}{np.percentile(ticks, 50):>18.3f}{np.percentile(ticks, 99):>10.3f}"
+                  f"{np.percentile(latencies, 50):>16.1f}{np.percentile(latencies, 99):>10.1f}"
+                  f"{np.percentile(captures, 50):>16.3f}")
+
+
+if __name__ == "__main__":
+    main()
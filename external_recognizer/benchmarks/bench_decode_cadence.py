@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+#
+# Copyright (c)  2025  Xiaomi Corporation
+
+"""
+测量流式识别循环在不同解码节奏下的 CPU 占用和临时结果延迟。
+
+按 50 ms 一块把音频送入 OnlineRecognizer（不等待真实时间），对每种节奏报告：
+  - CPU：每秒音频消耗的进程CPU时间
+  - 临时结果延迟：音频块到达到包含它的解码完成之间的时间
+    （= 等待凑够N块的时间 + 解码耗时），取平均值和p90
+
+Usage:
+
+python benchmarks/bench_decode_cadence.py --wav test.wav
+python benchmarks/bench_decode_cadence.py --cadences 1,2,4,8,adaptive
+"""
+import argparse
+import os
+import sys
+import time
+import wave
+
+script_dir = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, script_dir)
+
+import numpy as np
+import sherpa_onnx
+
+from audio_mixer import sample_rate, samples_time, resample_fft
+from decode_cadence import DecodeCadence
+
+model_path = os.path.join(os.path.dirname(script_dir), "models")
+
+
+def get_args():
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--tokens", type=str, default=os.path.join(model_path, "tokens.txt"))
+    parser.add_argument("--encoder", type=str, default=os.path.join(model_path, "encoder.onnx"))
+    parser.add_argument("--decoder", type=str, default=os.path.join(model_path, "decoder.onnx"))
+    parser.add_argument("--joiner", type=str, default=os.path.join(model_path, "joiner.onnx"))
+    parser.add_argument("--num-threads", type=int, default=1)
+    parser.add_argument("--wav", type=str, default="", help="测试音频（16位WAV），不指定时使用30秒合成噪声")
+    parser.add_argument("--cadences", type=str, default="1,2,4,8,adaptive",
+                        help="要测量的解码节奏，数字表示每N块解码一次，adaptive表示自适应模式")
+    return parser.parse_args()
+
+
+def load_audio(path):
+    if not path:
+        rng = np.random.default_rng(0)
+        return (rng.standard_normal(sample_rate * 30) * 0.05).astype(np.float32)
+    with wave.open(path, "rb") as f:
+        data = np.frombuffer(f.readframes(f.getnframes()), dtype=np.int16)
+        data = data.reshape(-1, f.getnchannels()).mean(axis=1) / 32768
+        rate = f.getframerate()
+    if rate != sample_rate:
+        data = resample_fft(data, int(len(data) * sample_rate / rate))
+    return data.astype(np.float32)
+
+
+def run(recognizer, audio, cadence):
+    chunk = int(sample_rate * samples_time)
+    stream = recognizer.create_stream()
+    latencies = []
+    waiting = []  # 尚未被解码的音频块的到达时间（虚拟时间）
+    pending_audio_seconds = 0.0
+
+    cpu_start = time.process_time()
+    for k, start in enumerate(range(0, len(audio) - chunk + 1, chunk)):
+        arrival = k * samples_time
+        stream.accept_waveform(sample_rate, audio[start:start + chunk])
+        waiting.append(arrival)
+        pending_audio_seconds += samples_time
+
+        if not cadence.add_chunk():
+            continue
+
+        decode_start = time.perf_counter()
+        decoded = False
+        while recognizer.is_ready(stream):
+            recognizer.decode_stream(stream)
+            decoded = True
+        if decoded:
+            if recognizer.is_endpoint(stream):
+                recognizer.reset(stream)
+            recognizer.get_result(stream)
+        decode_seconds = time.perf_counter() - decode_start
+
+        latencies.extend(arrival - t + decode_seconds for t in waiting)
+        waiting = []
+        cadence.on_decoded(decode_seconds, pending_audio_seconds)
+        pending_audio_seconds = 0.0
+
+    cpu_seconds = time.process_time() - cpu_start
+    return cpu_seconds / (len(audio) / sample_rate), np.array(latencies) * 1000
+
+
+def main():
+    args = get_args()
+    recognizer = sherpa_onnx.OnlineRecognizer.from_transducer(
+        tokens=args.tokens,
+        encoder=args.encoder,
+        decoder=args.decoder,
+        joiner=args.joiner,
+        num_threads=args.num_threads,
+        sample_rate=sample_rate,
+        feature_dim=80,
+        enable_endpoint_detection=True,
+        rule1_min_trailing_silence=2.4,
+        rule2_min_trailing_silence=1.2,
+        rule3_min_utterance_length=300,
+    )
+    audio = load_audio(args.wav)
+
+    print(f"{'节奏':<10}{'CPU(秒/音频秒)':>16}{'平均延迟(ms)':>14}{'p90延迟(ms)':>14}")
+    for name in args.cadences.split(","):
+        if name == "adaptive":
+            cadence = DecodeCadence(1, adaptive=True)
+        else:
+            cadence = DecodeCadence(int(name))
+        cpu, latencies = run(recognizer, audio, cadence)
+        print(f"{name:<10}{cpu:>16.4f}{np.mean(latencies):>14.1f}{np.percentile(latencies, 90):>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
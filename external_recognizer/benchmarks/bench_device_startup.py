@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+#
+# Copyright (c)  2025  Xiaomi Corporation
+
+"""
+测量从启动到采集到第一个音频块的耗时，比较三种确定设备的方式：
+
+  - picker：以前每次启动的流程，枚举所有设备、导入 tkinter、为选择框两次遍历loopback设备
+    （不含等待用户点击的时间，实际启动还要再加上这段时间）
+  - profile：按保存的设备配置解析，配置中记录的序号仍然有效
+  - profile-moved：设备序号已变化，按名称遍历一次所有设备
+
+每种方式在新的Python进程中运行（tkinter 等模块的导入耗时是真实的），使用模拟的音频后端，
+确定设备后以 spawn 方式启动录音子进程并等待第一个音频块。同时报告设备信息查询的次数。
+
+Usage:
+
+python benchmarks/bench_device_startup.py
+python benchmarks/bench_device_startup.py --devices-per-api 12 --repeats 10
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+script_dir = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, script_dir)
+
+from fake_pyaudio import install_fake_backend, FakePyAudio
+
+paths = ["picker", "profile", "profile-moved"]
+
+
+def get_args():
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--devices-per-api", type=int, default=8, help="每个主机API下的麦克风数和扬声器数")
+    parser.add_argument("--repeats", type=int, default=5, help="每种方式重复的次数")
+    parser.add_argument("--path", type=str, default="", choices=[""] + paths, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def recording_child(device_indices, devices_per_api, output_queue, stop_event):
+    install_fake_backend(num_inputs=devices_per_api, num_outputs=devices_per_api)
+    from audio_capture import start_recording
+    start_recording(device_indices, output_queue, stop_event, sample_format="int16")
+
+
+def choose_with_picker(p):
+    """以前的流程：列出所有MME设备，并执行选择框中除界面以外的所有查询"""
+    from audio_capture import get_audio_devices
+    devices = get_audio_devices(p)
+    for idx, device in devices:
+        print(f"  {idx}: {device['name']} (输入通道: {device['maxInputChannels']}, 输出通道: {device['maxOutputChannels']})",
+              file=sys.stderr)
+
+    import tkinter  # noqa: F401
+    input_devices = [(i, d) for i, d in devices if d['maxInputChannels'] > 0 and not d.get('isLoopbackDevice', False)]
+    loopback_devices = [(d['index'], d) for d in p.get_loopback_device_info_generator()]
+    p.get_default_input_device_info()
+    wasapi_info = p.get_host_api_info_by_type(FakePyAudio.paWASAPI)
+    default_speakers = p.get_device_info_by_index(wasapi_info["defaultOutputDevice"])
+    for loopback in p.get_loopback_device_info_generator():
+        if default_speakers["name"] in loopback["name"]:
+            break
+    # 选择第一个麦克风和第一个loopback设备
+    return [input_devices[0][0], loopback_devices[0][0]]
+
+
+def profile_descriptors(p, moved):
+    from device_profiles import describe_device
+    loopback = next(p.get_loopback_device_info_generator())
+    descriptors = [describe_device(p, 0), describe_device(p, loopback["index"])]
+    if moved:
+        for descriptor in descriptors:
+            descriptor["index"] = (descriptor["index"] + 1) % p.get_device_count()
+    return descriptors
+
+
+def run_path(path, devices_per_api):
+    """在当前进程中执行一种方式，返回 (确定设备的耗时, 到第一个音频块的耗时, 设备信息查询次数)"""
+    install_fake_backend(num_inputs=devices_per_api, num_outputs=devices_per_api)
+    import pyaudiowpatch as pyaudio
+
+    # 配置文件的内容在计时之外准备，计时只包含启动时的解析
+    p = pyaudio.PyAudio()
+    descriptors = profile_descriptors(p, path == "profile-moved") if path != "picker" else None
+    FakePyAudio.info_calls = 0
+
+    start = time.perf_counter()
+    p = pyaudio.PyAudio()
+    if path == "picker":
+        device_indices = choose_with_picker(p)
+    else:
+        from device_profiles import resolve_devices
+        device_indices = resolve_devices(p, descriptors)
+    info_calls = FakePyAudio.info_calls
+    chosen = time.perf_counter() - start
+    p.terminate()
+
+    ctx = multiprocessing.get_context("spawn")
+    output_queue = ctx.Queue()
+    stop_event = ctx.Event()
+    process = ctx.Process(target=recording_child, args=(device_indices, devices_per_api, output_queue, stop_event))
+    process.start()
+    output_queue.get()
+    elapsed = time.perf_counter() - start
+
+    from audio_capture import cleanup_recording_process
+    cleanup_recording_process(stop_event, process, output_queue)
+    return chosen, elapsed, info_calls
+
+
+def main():
+    args = get_args()
+    if args.path:
+        # 子进程：执行一次并把结果写到标准输出
+        sys.stderr = open(os.devnull, "w")
+        chosen, elapsed, info_calls = run_path(args.path, args.devices_per_api)
+        print(json.dumps({"chosen": chosen, "elapsed": elapsed, "info_calls": info_calls}))
+        return
+
+    num_devices = len(FakePyAudio.host_apis) * 2 * args.devices_per_api + args.devices_per_api
+    print(f"模拟设备数: {num_devices}")
+    print(f"{'方式':<16}{'确定设备(ms)':>14}{'到第一个音频块(ms)':>20}{'设备信息查询':>14}")
+    for path in paths:
+        chosen = []
+        times = []
+        info_calls = 0
+        for _ in range(args.repeats):
+            result = subprocess.run([sys.executable, os.path.realpath(__file__), "--path", path,
+                                     "--devices-per-api", str(args.devices_per_api)],
+                                    capture_output=True, text=True, check=True)
+            data = json.loads(result.stdout.strip().splitlines()[-1])
+            chosen.append(data["chosen"])
+            times.append(data["elapsed"])
+            info_calls = data["info_calls"]
+        print(f"{path:<16}{statistics.median(chosen) * 1000:>14.2f}{statistics.median(times) * 1000:>20.1f}"
+              f"{info_calls:>14}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+#
+# Copyright (c)  2025  Xiaomi Corporation
+
+"""
+比较单设备直通和经过混音器时，录音子进程输出的端到端延迟。
+
+用模拟的音频后端代替 pyaudiowpatch（每 50 ms 一个数据包），以 spawn 方式启动 start_recording 子进程，
+识别进程一侧记录每个音频块的到达时间，延迟 = 到达时间 - 数据包在采集回调中的原始采集时间：
+  - direct：单设备直通（direct_single_device=True，默认）
+  - mixer：单设备也经过混音器（队列 + 150 ms 处理延迟 + 轮询）
+  - switch：运行中增加第二个设备再移除（直通 -> 混音器 -> 直通），检查输出的时间槽没有重复或乱序
+
+输出的音频块只带四舍五入到 50 ms 时间槽的时间戳，原始采集时间（未取整的 time.time()）
+通过 start_recording 的 record_trace 录制到临时的采集轨迹文件，结束后按时间槽对应回每个音频块；
+一个时间槽有多个设备的数据包时（switch 模式的混音阶段）取最早的采集时间。
+写轨迹的开销在采集回调中，三种模式相同。
+
+Usage:
+
+python benchmarks/bench_direct_capture.py
+python benchmarks/bench_direct_capture.py --seconds 30
+"""
+import argparse
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+script_dir = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, script_dir)
+
+from audio_mixer import round_timestamp
+from capture_trace import read_trace
+from fake_pyaudio import install_fake_backend
+
+
+def get_args():
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=10, help="每种模式的运行时长")
+    return parser.parse_args()
+
+
+def recording_child(output_queue, stop_event, control_queue, direct, trace_path):
+    """子进程入口：安装模拟后端后运行 start_recording"""
+    install_fake_backend()
+    from audio_capture import start_recording
+    start_recording([0], output_queue, stop_event, sample_format="int16", control_queue=control_queue,
+                    record_trace=trace_path, direct_single_device=direct)
+
+
+def capture_times(trace_path):
+    """采集轨迹中每个时间槽最早的原始采集时间"""
+    _, packets = read_trace(trace_path)
+    times = {}
+    for _, capture_time, _ in packets:
+        slot = round_timestamp(capture_time)
+        times[slot] = min(capture_time, times.get(slot, capture_time))
+    return times
+
+
+def run(ctx, seconds, direct, switch=False):
+    """返回 (每个音频块的延迟, 时间槽重复或乱序的次数, 输出的时长)"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        trace_path = os.path.join(tmp_dir, "capture.trace")
+        arrivals, disorder, samples = receive(ctx, seconds, direct, switch, trace_path)
+        times = capture_times(trace_path)
+    # 混音器为缺失的设备补的静音时间槽没有对应的数据包，不计延迟
+    latencies = [now - times[timestamp] for timestamp, now in arrivals if timestamp in times]
+    return latencies, disorder, samples / 16000
+
+
+def receive(ctx, seconds, direct, switch, trace_path):
+    """运行录音子进程，返回 (每个音频块的 (时间槽, 到达时间), 时间槽重复或乱序的次数, 输出的采样数)"""
+    from audio_capture import cleanup_recording_process
+    output_queue, stop_event, control_queue = ctx.Queue(), ctx.Event(), ctx.Queue()
+    process = ctx.Process(target=recording_child,
+                          args=(output_queue, stop_event, control_queue, direct, trace_path))
+    process.start()
+
+    arrivals = []
+    disorder = 0
+    samples = 0
+    last_timestamp = None
+    deadline = None
+    commands = [(seconds / 3, ("add", 1)), (seconds * 2 / 3, ("remove", 1))] if switch else []
+    while deadline is None or time.perf_counter() < deadline:
+        try:
+            timestamp, chunk = output_queue.get(timeout=0.5)
+        except Exception:
+            if not process.is_alive():
+                raise RuntimeError("录音子进程意外退出")
+            continue
+        now = time.time()
+        if deadline is None:
+            start = time.perf_counter()
+            deadline = start + seconds
+        if commands and time.perf_counter() - start >= commands[0][0]:
+            control_queue.put(commands.pop(0)[1])
+        arrivals.append((timestamp, now))
+        samples += len(chunk)
+        if last_timestamp is not None and timestamp <= last_timestamp + 1e-6:
+            disorder += 1
+        last_timestamp = timestamp
+
+    # 子进程退出时才写完轨迹文件，多给一些时间
+    cleanup_recording_process(stop_event, process, output_queue, timeout=5.0)
+    return arrivals, disorder, samples
+
+
+def main():
+    args = get_args()
+    install_fake_backend()
+    ctx = multiprocessing.get_context("spawn")
+
+    results = []
+    for name, direct, switch in [("direct", True, False), ("mixer", False, False), ("switch", True, True)]:
+        results.append((name,) + run(ctx, args.seconds, direct, switch))
+
+    print(f"{'模式':<8}{'音频块':>8}{'p50(ms)':>10}{'p95(ms)':>10}{'max(ms)':>10}{'输出(s)':>10}{'重复/乱序':>10}")
+    for name, latencies, disorder, audio_seconds in results:
+        ordered = sorted(latencies)
+        print(f"{name:<8}{len(latencies):>8}{statistics.median(latencies) * 1000:>10.1f}"
+              f"{ordered[int(len(ordered) * 0.95)] * 1000:>10.1f}{ordered[-1] * 1000:>10.1f}"
+              f"{audio_seconds:>10.2f}{disorder:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+#
+# Copyright (c)  2025  Xiaomi Corporation
+
+"""
+测量GC调优（runtime_tuning.tune_gc）对实时链路的影响。
+
+模拟识别进程：先创建 --heap-objects 个长期存活的容器对象（相当于加载模型、导入numpy/tkinter等
+之后留在堆上的对象），然后主线程运行按VAD窗口切分、拼接numpy数组的热循环，
+每次迭代保留少量长期对象（识别结果、统计记录），使第2代回收会周期性地发生。
+另一个线程模拟采集回调：每 --period 秒被唤醒一次，需要获得GIL才能执行，
+晚于 --slack 秒（设备缓冲区能容纳的延迟）计为一次溢出。
+
+每种配置在独立的进程中运行：
+  - default：Python默认的GC阈值，不冻结
+  - tuned：tune_gc()，冻结已有对象并使用热循环的GC阈值
+
+Usage:
+
+python benchmarks/bench_gc_tuning.py
+python benchmarks/bench_gc_tuning.py --heap-objects 3000000 --seconds 20
+"""
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+script_dir = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, script_dir)
+
+import numpy as np
+
+from runtime_tuning import GcMonitor, tune_gc
+
+
+def get_args():
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=10, help="每种配置运行的时长")
+    parser.add_argument("--heap-objects", type=int, default=1500000, help="长期存活的容器对象数")
+    parser.add_argument("--period", type=float, default=0.01, help="模拟采集回调的周期（秒）")
+    parser.add_argument("--slack", type=float, default=0.02, help="回调晚于这么多秒计为一次溢出")
+    parser.add_argument("--run", type=str, default="", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def capture_thread(stop_event, period, lateness):
+    next_time = time.perf_counter() + period
+    while not stop_event.is_set():
+        time.sleep(max(next_time - time.perf_counter(), 0))
+        lateness.append(time.perf_counter() - next_time)
+        next_time += period
+
+
+def hot_loop(seconds, survivors):
+    """VAD窗口处理的简化版本：拼接、切分、少量容器对象，每次迭代保留一条记录"""
+    window_size = 512
+    rng = np.random.default_rng(0)
+    chunk = rng.standard_normal(800).astype(np.float32)
+    buffer = np.zeros(0, dtype=np.float32)
+    iterations = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        buffer = np.concatenate([buffer, chunk])
+        windows = [buffer[i:i + window_size] for i in range(0, len(buffer) - window_size, window_size)]
+        energy = {"max": max(float(np.abs(w).max()) for w in windows) if windows else 0.0, "n": len(windows)}
+        if len(buffer) > 16000:
+            buffer = buffer[-window_size:]
+        survivors.append((iterations, energy["n"], [energy["max"]]))
+        iterations += 1
+    return iterations
+
+
+def run(mode, args):
+    # 模型加载后留在堆上的对象，运行期间保持引用，使每次完整回收都要遍历它们
+    heap = [{"id": i, "token": (i, str(i))} for i in range(args.heap_objects // 3)]
+    monitor = GcMonitor()
+    if mode == "tuned":
+        tune_gc()
+    else:
+        gc.collect()
+
+    stop_event = threading.Event()
+    lateness = []
+    thread = threading.Thread(target=capture_thread, args=(stop_event, args.period, lateness), daemon=True)
+    thread.start()
+    survivors = []
+    iterations = hot_loop(args.seconds, survivors)
+    stop_event.set()
+    thread.join()
+    monitor.close()
+    del heap
+
+    lateness = np.array(lateness[int(1 / args.period):])  # 前1秒是启动阶段，不计入
+    return {
+        "iterations": iterations,
+        "collections": monitor.collections,
+        "max_pause": monitor.max_pause,
+        "total_pause": monitor.total_pause,
+        "late_p99": float(np.percentile(lateness, 99)),
+        "late_max": float(lateness.max()),
+        "overflows": int((lateness > args.slack).sum()),
+    }
+
+
+def main():
+    args = get_args()
+    if args.run:
+        print(json.dumps(run(args.run, args)))
+        return
+
+    print(f"{args.heap_objects} 个长期对象，每种配置 {args.seconds:g} s，回调周期 {args.period * 1000:.0f} ms，"
+          f"允许延迟 {args.slack * 1000:.0f} ms，GC阈值默认 {gc.get_threshold()}")
+    print(f"{'配置':<9}{'迭代/s':>9}{'GC次数(0/1/2)':>18}{'最长停顿(ms)':>14}{'总停顿(ms)':>12}"
+          f"{'回调延迟p99(ms)':>16}{'最大(ms)':>10}{'溢出':>6}")
+    for mode in ["default", "tuned"]:
+        output = subprocess.run([sys.executable, os.path.realpath(__file__), "--run", mode,
+                                 "--seconds", str(args.seconds), "--heap-objects", str(args.heap_objects),
+                                 "--period", str(args.period), "--slack", str(args.slack)],
+                                check=True, capture_output=True, text=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        collections = "/".join(str(c) for c in result["collections"])
+        print(f"{mode:<9}{result['iterations'] / args.seconds:>9.0f}{collections:>18}"
+              f"{result['max_pause'] * 1000:>14.2f}{result['total_pause'] * 1000:>12.1f}"
+              f"{result['late_p99'] * 1000:>16.2f}{result['late_max'] * 1000:>10.2f}{result['overflows']:>6}")
+
+
+if __name__ == "__main__":
+    main()
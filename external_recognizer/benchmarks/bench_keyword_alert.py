@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+#
+# Copyright (c)  2025  Xiaomi Corporation
+
+"""
+测量关键词提醒在临时结果更新时的耗时。
+
+模拟的临时结果：每次更新在末尾追加 1~3 个字，并以一定概率改写末尾的几个字；
+一句话最长 --sentence-chars 个字。比较三种做法每次更新的耗时：
+
+  - contains：对每个关键词检查 `keyword in text`（界面中敏感词检测的做法）
+  - rescan：自动机每次从头扫描整个临时结果
+  - incremental：KeywordAlerter，只扫描与上一次结果不同的部分
+
+同时报告自动机的编译时间，并检查三种做法的命中结果一致。
+
+Usage:
+
+python benchmarks/bench_keyword_alert.py
+python benchmarks/bench_keyword_alert.py --keywords 1000 10000 50000 --sentences 200
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+script_dir = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, script_dir)
+
+from keyword_alert import AhoCorasick, KeywordAlerter
+
+
+def get_args():
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--keywords", type=int, nargs="+", default=[100, 1000, 10000], help="关键词数量")
+    parser.add_argument("--sentences", type=int, default=100, help="模拟的句子数")
+    parser.add_argument("--sentence-chars", type=int, default=60, help="每句的最大字数")
+    parser.add_argument("--revise-rate", type=float, default=0.3, help="每次更新改写末尾几个字的概率")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+# 常用汉字，关键词和临时结果都从中随机选取
+alphabet = "的一是不了在人有我他这个们中来上大为和国地到以说时要就出也得里后自之去会着天那能对而子于下年过生发多"
+
+
+def make_keywords(rng, count):
+    return list({"".join(rng.choice(alphabet) for _ in range(rng.randint(2, 4))) for _ in range(count)})
+
+
+def make_partials(rng, sentences, sentence_chars, revise_rate):
+    """生成模拟的临时结果序列，每句以 None 结束"""
+    partials = []
+    for _ in range(sentences):
+        text = ""
+        target = rng.randint(sentence_chars // 3, sentence_chars)
+        while len(text) < target:
+            if text and rng.random() < revise_rate:
+                text = text[:-rng.randint(1, min(3, len(text)))]
+            text += "".join(rng.choice(alphabet) for _ in range(rng.randint(1, 3)))
+            partials.append(text)
+        partials.append(None)
+    return partials
+
+
+def run_contains(keywords, partials):
+    hits = []
+    reported = set()
+    for text in partials:
+        if text is None:
+            reported = set()
+            continue
+        for keyword in keywords:
+            if keyword not in reported and keyword in text:
+                reported.add(keyword)
+                hits.append(keyword)
+    return hits
+
+
+def run_rescan(automaton, partials):
+    hits = []
+    reported = set()
+    for text in partials:
+        if text is None:
+            reported = set()
+            continue
+        state = 0
+        for ch in text:
+            state = automaton.step(state, ch)
+            for term_id in automaton.outputs[state]:
+                if term_id not in reported:
+                    reported.add(term_id)
+                    hits.append(automaton.terms[term_id])
+    return hits
+
+
+def run_incremental(alerter, partials):
+    hits = []
+    for text in partials:
+        if text is None:
+            alerter.reset()
+            continue
+        hits.extend(alerter.feed(text))
+    return hits
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    args = get_args()
+    rng = random.Random(args.seed)
+    partials = make_partials(rng, args.sentences, args.sentence_chars, args.revise_rate)
+    updates = sum(1 for text in partials if text is not None)
+    print(f"{args.sentences} 句，{updates} 次临时结果更新")
+    print(f"{'关键词数':>8}{'编译(ms)':>10}{'contains(us)':>14}{'rescan(us)':>12}{'incremental(us)':>17}{'提醒次数':>10}")
+
+    for count in args.keywords:
+        keywords = make_keywords(rng, count)
+        build_seconds, automaton = timed(AhoCorasick, keywords)
+        alerter = KeywordAlerter(keywords)
+
+        contains_seconds, contains_hits = timed(run_contains, keywords, partials)
+        rescan_seconds, rescan_hits = timed(run_rescan, automaton, partials)
+        incremental_seconds, incremental_hits = timed(run_incremental, alerter, partials)
+
+        # 命中的顺序可能不同（contains 按关键词顺序），比较每句的集合即可
+        assert sorted(contains_hits) == sorted(rescan_hits) == sorted(incremental_hits)
+
+        print(f"{len(keywords):>8}{build_seconds * 1000:>10.1f}{contains_seconds / updates * 1e6:>14.1f}"
+              f"{rescan_seconds / updates * 1e6:>12.1f}{incremental_seconds / updates * 1e6:>17.1f}"
+              f"{len(incremental_hits):>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+#
+# Copyright (c)  2025  Xiaomi Corporation
+
+"""
+测量混音器的CPU开销随设备数的变化。
+
+模拟 1~16 个 16 kHz 单声道设备（不需要重采样），每个设备每 50 ms 产生一个数据包，
+到达时间带有各自固定的偏移和随机抖动。在虚拟时间下按 step() 返回的休眠时间驱动
+TimestampMixer（与 replay-capture-trace.py 相同），只统计 step() 本身的耗时：
+  - 每次调度：没有输出的 step()（等待、轮询）的平均耗时
+  - 每个数据包：所有 step() 的总耗时 / 数据包数，包含混音本身
+  - 每秒音频：混音器每处理1秒音频消耗的CPU时间
+
+Usage:
+
+python benchmarks/bench_mixer_devices.py
+python benchmarks/bench_mixer_devices.py --devices 1,2,4,8,16 --seconds 60
+"""
+import argparse
+import os
+import sys
+import time
+from collections import deque
+
+script_dir = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, script_dir)
+
+import numpy as np
+
+from audio_mixer import sample_rate, samples_time, round_timestamp, TimestampMixer
+
+
+def get_args():
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--devices", type=str, default="1,2,4,8,16", help="逗号分隔的设备数")
+    parser.add_argument("--seconds", type=float, default=30, help="模拟的音频时长")
+    parser.add_argument("--jitter", type=float, default=0.02, help="数据包到达时间的最大随机抖动（秒）")
+    return parser.parse_args()
+
+
+def make_arrivals(num_devices, seconds, jitter, rng):
+    """按到达时间排序的 (arrival_time, device_idx, timestamp, samples)"""
+    chunk = np.zeros(int(sample_rate * samples_time), dtype=np.float32)
+    arrivals = []
+    for device_idx in range(num_devices):
+        offset = rng.uniform(0, samples_time)
+        for k in range(int(seconds / samples_time)):
+            capture_time = k * samples_time + offset
+            arrival = capture_time + samples_time + rng.uniform(0, jitter)
+            arrivals.append((arrival, device_idx, round_timestamp(capture_time), chunk))
+    arrivals.sort(key=lambda a: a[0])
+    return arrivals
+
+
+def run(num_devices, seconds, jitter):
+    rng = np.random.default_rng(num_devices)
+    arrivals = make_arrivals(num_devices, seconds, jitter, rng)
+    device_queues = {idx: deque() for idx in range(num_devices)}
+    mixer = TimestampMixer(list(range(num_devices)))
+
+    def fetch_packet(device_idx):
+        q = device_queues[device_idx]
+        return q.popleft() if q else None
+
+    idle_steps = 0
+    idle_time = 0.0
+    total_time = 0.0
+    next_arrival = 0
+    now = arrivals[0][0]
+    while True:
+        while next_arrival < len(arrivals) and arrivals[next_arrival][0] <= now:
+            _, device_idx, timestamp, samples = arrivals[next_arrival]
+            device_queues[device_idx].append((timestamp, samples, sample_rate))
+            next_arrival += 1
+
+        start = time.perf_counter()
+        mixed, sleep_time = mixer.step(now, fetch_packet)
+        elapsed = time.perf_counter() - start
+        total_time += elapsed
+        if mixed is not None:
+            continue
+        idle_steps += 1
+        idle_time += elapsed
+
+        if next_arrival >= len(arrivals) and not mixer.has_pending() and not any(device_queues.values()):
+            break
+        now = max(now + sleep_time, np.nextafter(now, np.inf))
+
+    return {
+        "idle_step_us": idle_time / idle_steps * 1e6,
+        "packet_us": total_time / len(arrivals) * 1e6,
+        "ms_per_audio_second": total_time / seconds * 1000,
+        "partial_slots": mixer.stats.partial_slots,
+        "output_slots": mixer.stats.output_slots,
+    }
+
+
+def main():
+    args = get_args()
+    print(f"{'设备数':<8}{'每次调度(us)':>14}{'每个数据包(us)':>16}{'每秒音频(ms)':>14}{'输出槽':>8}{'未全部就绪':>10}")
+    for num_devices in [int(n) for n in args.devices.split(",")]:
+        r = run(num_devices, args.seconds, args.jitter)
+        print(f"{num_devices:<8}{r['idle_step_us']:>14.2f}{r['packet_us']:>16.2f}{r['ms_per_audio_second']:>14.2f}"
+              f"{r['output_slots']:>8}{r['partial_slots']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+#
+# Copyright (c)  2025  Xiaomi Corporation
+
+"""
+测量模型下载和缓存（model_manager.ModelStore）。
+
+生成一个模拟的模型压缩包（.tar.bz2，包含随机内容的 model.onnx 和 tokens.txt），
+用本地HTTP服务代替镜像，每个连接限速 --connection-rate MB/s（模拟CDN对单个连接的限速）：
+
+  - 1 连接 / N 连接：分块下载、流式解压和校验的总耗时
+  - 中断续传：服务在传输一半数据后断开所有连接，再次下载时只下载剩余的分块
+  - 中断后文件更改：ETag 与 .part.json 中记录的不同，丢弃已下载的分块，从头下载
+  - 不支持 Range：单连接下载，直接从HTTP响应流式解压，压缩包不落盘
+  - 校验失败：目录中固定了错误的sha256，下载的模型不会进入缓存
+  - 已缓存：再次启动时 ensure() 的耗时（不联网、不计算哈希）
+
+Usage:
+
+python benchmarks/bench_model_fetch.py
+python benchmarks/bench_model_fetch.py --size-mb 64 --connections 8 --connection-rate 4
+"""
+import argparse
+import hashlib
+import io
+import os
+import re
+import sys
+import tarfile
+import tempfile
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+script_dir = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, script_dir)
+
+import numpy as np
+
+from model_manager import ModelSpec, ModelStore, ModelDownloadError
+
+
+def get_args():
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--size-mb", type=float, default=16, help="模拟模型文件的大小（MB）")
+    parser.add_argument("--connections", type=int, default=4, help="并行下载的连接数")
+    parser.add_argument("--chunk-mb", type=float, default=1, help="分块大小（MB）")
+    parser.add_argument("--connection-rate", type=float, default=8, help="每个连接的限速（MB/s）")
+    return parser.parse_args()
+
+
+class MirrorState:
+    def __init__(self, files, connection_rate):
+        self.files = files
+        self.connection_rate = connection_rate
+        self.ranges = True
+        self.version = 1  # ETag 中的版本号，增加表示文件已更改
+        self.fail_after = None  # 传输这么多字节之后断开所有连接
+        self.served = 0
+        self.lock = threading.Lock()
+
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            data = state.files.get(self.path.lstrip("/"))
+            if data is None:
+                self.send_error(404)
+                return
+            start, end = 0, len(data) - 1
+            etag = f'"v{state.version}"'
+            match = re.fullmatch(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+            if_range = self.headers.get("If-Range")
+            if state.ranges and match and (if_range is None or if_range == etag):
+                start = int(match.group(1))
+                end = min(int(match.group(2)), end) if match.group(2) else end
+                self.send_response(206)
+                self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+            else:
+                self.send_response(200)
+            self.send_header("Content-Length", str(end - start + 1))
+            self.send_header("ETag", etag)
+            self.end_headers()
+
+            block = 64 * 1024
+            begin = time.perf_counter()
+            sent = 0
+            for offset in range(start, end + 1, block):
+                piece = data[offset:min(offset + block, end + 1)]
+                with state.lock:
+                    if state.fail_after is not None and state.served >= state.fail_after:
+                        self.close_connection = True
+                        return
+                    state.served += len(piece)
+                try:
+                    self.wfile.write(piece)
+                except (BrokenPipeError, ConnectionResetError):
+                    return
+                sent += len(piece)
+                # 按每个连接的限速等待
+                delay = sent / (state.connection_rate * 1024 * 1024) - (time.perf_counter() - begin)
+                if delay > 0:
+                    time.sleep(delay)
+
+    return Handler
+
+
+def make_archive(size_mb):
+    rng = np.random.default_rng(0)
+    files = {
+        "bench-model/model.onnx": rng.integers(0, 256, int(size_mb * 1024 * 1024), dtype=np.uint8).tobytes(),
+        "bench-model/tokens.txt": "\n".join(f"tok{i} {i}" for i in range(5000)).encode(),
+    }
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:bz2") as tar:
+        for name, data in files.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    return buffer.getvalue(), files
+
+
+def timed_fetch(store, spec):
+    start = time.perf_counter()
+    try:
+        paths = store.ensure(spec)
+        error = ""
+    except ModelDownloadError as e:
+        paths, error = None, str(e)
+    return time.perf_counter() - start, paths, error
+
+
+def main():
+    args = get_args()
+    print("生成模拟的模型压缩包...", file=sys.stderr)
+    archive, contents = make_archive(args.size_mb)
+    sha256 = hashlib.sha256(archive).hexdigest()
+    files = {"bench-model.tar.bz2": archive}
+    state = MirrorState(files, args.connection_rate)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    mirror = f"http://127.0.0.1:{server.server_address[1]}"
+
+    spec = ModelSpec("bench-model", "bench-model.tar.bz2",
+                     {"model": "bench-model/model.onnx", "tokens": "bench-model/tokens.txt"})
+    chunk_size = int(args.chunk_mb * 1024 * 1024)
+    print(f"压缩包 {len(archive) / 1024 / 1024:.1f} MB，分块 {args.chunk_mb:g} MB，"
+          f"每个连接限速 {args.connection_rate:g} MB/s")
+    print(f"{'场景':<22}{'耗时(s)':>10}{'传输(MB)':>10}  结果")
+
+    def report(name, seconds, paths, error):
+        if paths:
+            with open(paths["model"], "rb") as f:
+                ok = f.read() == contents["bench-model/model.onnx"]
+            result = "内容一致" if ok else "内容不一致"
+        else:
+            result = error
+        print(f"{name:<22}{seconds:>10.3f}{state.served / 1024 / 1024:>10.1f}  {result}")
+        state.served = 0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for connections in sorted({1, args.connections}):
+            store = ModelStore(os.path.join(tmp, f"store-{connections}"), mirror, connections=connections,
+                               chunk_size=chunk_size)
+            report(f"{connections} 连接", *timed_fetch(store, spec))
+
+        # 中断续传
+        store = ModelStore(os.path.join(tmp, "store-resume"), mirror, connections=args.connections,
+                           chunk_size=chunk_size, retries=0)
+        state.fail_after = len(archive) // 2
+        report("中断（第一次）", *timed_fetch(store, spec))
+        state.fail_after = None
+        report("续传（第二次）", *timed_fetch(store, spec))
+
+        # 中断后服务器上的文件更改
+        store = ModelStore(os.path.join(tmp, "store-changed"), mirror, connections=args.connections,
+                           chunk_size=chunk_size, retries=0)
+        state.fail_after = len(archive) // 2
+        report("中断（第一次）", *timed_fetch(store, spec))
+        state.fail_after = None
+        state.version += 1
+        report("文件更改后重新下载", *timed_fetch(store, spec))
+
+        # 服务器不支持 Range
+        state.ranges = False
+        store = ModelStore(os.path.join(tmp, "store-stream"), mirror, connections=args.connections)
+        report("不支持Range（流式）", *timed_fetch(store, spec))
+        state.ranges = True
+
+        # 校验失败
+        bad_spec = ModelSpec("bench-model-bad", spec.filename, spec.files, sha256="0" * 64)
+        store = ModelStore(os.path.join(tmp, "store-bad"), mirror, connections=args.connections,
+                           chunk_size=chunk_size)
+        seconds, paths, error = timed_fetch(store, bad_spec)
+        report("sha256不匹配", seconds, paths, error[:40] + "...")
+        assert store.lookup(bad_spec) is None
+
+        # 已缓存
+        store = ModelStore(os.path.join(tmp, f"store-{args.connections}"), mirror)
+        times = []
+        for _ in range(100):
+            start = time.perf_counter()
+            store.ensure(spec)
+            times.append(time.perf_counter() - start)
+        print(f"{'已缓存 ensure()':<22}{np.median(times) * 1000:>9.3f}ms{state.served / 1024 / 1024:>10.1f}  "
+              f"objects/{sha256[:12]}...")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
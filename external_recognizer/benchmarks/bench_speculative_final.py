@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+#
+# Copyright (c)  2025  Xiaomi Corporation
+
+"""
+比较 SenseVoice 识别循环有无推测性最终解码（speculative_final）时的最终结果延迟和CPU占用。
+
+用 simulate-streaming-sense-voice.py 的识别主循环（run_recognition）按实时速度处理同一段音频两次：
+  - sync：加 --no-speculative-final，VAD关闭句子后同步解码
+  - speculative：尾部静音开始时在后台解码，句子关闭时直接采用
+
+最终结果延迟 = 输出最终结果（on_endpoint）的时间 - 句子结束位置的采集时间戳，
+包含VAD的 min_silence_duration 和最终解码的耗时；进程CPU时间（包括推理线程）除以音频时长为实时CPU占用。
+不指定 --wav 时使用 soak-test.py 的合成音频。
+
+"最终结果提前约一次解码的时间"是要用真实 SenseVoice 模型验证的目标，目前还没有测过：
+在替身识别器上测得的数字（合成音频上推测解码大多被丢弃）不能代表真实模型的解码耗时和丢弃率。
+
+需要 sherpa_onnx 和模型文件，识别脚本的其他参数放在 -- 之后：
+
+python benchmarks/bench_speculative_final.py
+python benchmarks/bench_speculative_final.py --wav meeting.wav --seconds 120 -- --num-threads 2
+"""
+import argparse
+import importlib.util
+import os
+import queue
+import sys
+import threading
+import time
+
+import numpy as np
+
+script_dir = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, script_dir)
+
+script_path = os.path.join(script_dir, "simulate-streaming-sense-voice.py")
+
+
+def get_args():
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--wav", type=str, default="", help="测试音频（16位WAV）；不指定时使用合成音频")
+    parser.add_argument("--seconds", type=float, default=60, help="每种模式送入的音频时长")
+    parser.add_argument("script_args", nargs=argparse.REMAINDER, help="-- 之后为识别脚本的参数")
+    return parser.parse_args()
+
+
+def load_module(path, name):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class LatencyPrinter:
+    """不输出识别结果，记录每句最终结果相对句子结束的延迟"""
+    def __init__(self):
+        self.prev_result = ""
+        self.latencies = []
+
+    def do_print(self, result):
+        if result:
+            self.prev_result = result
+
+    def on_endpoint(self, start=None, end=None):
+        if end is not None:
+            self.latencies.append(time.time() - end)
+
+
+def run(module, soak_test, script_args, recognizer, audio, seconds):
+    samples_queue = queue.Queue()
+    printer = LatencyPrinter()
+    stop_event = threading.Event()
+    thread = threading.Thread(target=module.run_recognition,
+                              args=(script_args, recognizer, samples_queue, printer, stop_event))
+    cpu_start = time.process_time()
+    thread.start()
+    soak_test.feed_audio(samples_queue, audio, seconds, 1.0, threading.Event(), [0.0])
+    while not samples_queue.empty():
+        time.sleep(0.05)
+    time.sleep(0.5)
+    cpu = time.process_time() - cpu_start
+    stop_event.set()
+    thread.join()
+    return printer.latencies, cpu, module.speculation
+
+
+def main():
+    args = get_args()
+    script_argv = args.script_args[1:] if args.script_args[:1] == ["--"] else args.script_args
+    module = load_module(script_path, "bench_sense_voice")
+    soak_test = load_module(os.path.join(script_dir, "soak-test.py"), "bench_soak_test")
+
+    sys.argv = [script_path] + script_argv
+    script_args = module.get_args()
+    module.prepare_models(script_args)
+    recognizer = module.load_recognizer(script_args)
+    audio = soak_test.read_wav(args.wav) if args.wav else soak_test.synthetic_audio(min(args.seconds, 60))
+
+    print(f"音频 {args.seconds:.0f} s，推理线程数 {script_args.num_threads}")
+    print(f"{'模式':<13}{'句子数':>6}{'延迟p50(ms)':>13}{'延迟p95(ms)':>13}{'实时CPU占用':>12}")
+    summaries = []
+    for name, speculative in [("sync", False), ("speculative", True)]:
+        script_args.no_speculative_final = not speculative
+        latencies, cpu, speculation = run(module, soak_test, script_args, recognizer, audio, args.seconds)
+        latencies = np.array(latencies) * 1000
+        p50, p95 = (np.percentile(latencies, [50, 95]) if len(latencies) else (0, 0))
+        print(f"{name:<13}{len(latencies):>6}{p50:>13.0f}{p95:>13.0f}{cpu / args.seconds * 100:>11.1f}%")
+        if speculation:
+            summaries.append(speculation.stats.format_summary())
+    for summary in summaries:
+        print(summary)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+#
+# Copyright (c)  2025  Xiaomi Corporation
+
+"""
+测量录音子进程的启动、停止和重启耗时。
+
+用模拟的音频后端代替 pyaudiowpatch（每个设备按真实时间每 50 ms 产生一个数据包），
+以 spawn 方式启动 start_recording 子进程（与Windows相同），报告：
+  - 启动：冷启动，Process.start() 到收到第一个音频块
+  - 停止：cleanup_recording_process() 的耗时，以及子进程是否被强制终止
+  - 重启间隔：开始停止到新的子进程输出第一个音频块。与识别脚本相同，新的子进程以 start_event 预热启动
+    （脚本中在加载模型期间完成解释器启动和导入），停止旧的子进程之后才让它打开设备
+
+场景：
+  - active：两个持续有数据的设备
+  - silent-loopback：其中一个是没有声音播放的loopback设备，系统不会送来任何数据
+  - unread：停止前识别进程已经不再读取队列（例如识别线程卡在解码中）
+  - single：一个设备，单设备直通
+
+检查项（不满足时断言失败）：
+  - 每个场景的最长停止耗时在 --stop-budget-ms 之内，且子进程没有被强制终止
+  - single 场景的最长重启间隔在 --restart-budget-ms 之内
+两个设备时第一个音频块要经过混音器的处理延迟（3 个时间槽，150 ms），重启间隔不可能低于这个值，
+只报告不检查。
+
+Usage:
+
+python benchmarks/bench_stop_latency.py
+python benchmarks/bench_stop_latency.py --repeats 10
+"""
+import argparse
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+
+script_dir = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, script_dir)
+
+from fake_pyaudio import install_fake_backend
+
+
+def get_args():
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=5, help="每个场景重复的次数")
+    parser.add_argument("--stop-budget-ms", type=float, default=100, help="停止耗时的上限（毫秒）")
+    parser.add_argument("--restart-budget-ms", type=float, default=100, help="单设备重启间隔的上限（毫秒）")
+    return parser.parse_args()
+
+
+def recording_child(device_indices, silent_devices, output_queue, stop_event, start_event):
+    """子进程入口：安装模拟后端后运行 start_recording"""
+    install_fake_backend(silent_devices)
+    from audio_capture import start_recording
+    start_recording(device_indices, output_queue, stop_event, sample_format="int16", start_event=start_event)
+
+
+def spawn_child(ctx, device_indices, silent_devices):
+    """以预热方式启动子进程（与识别脚本相同），返回 (process, output_queue, stop_event, start_event)"""
+    output_queue = ctx.Queue()
+    stop_event = ctx.Event()
+    start_event = ctx.Event()
+    process = ctx.Process(target=recording_child,
+                          args=(device_indices, silent_devices, output_queue, stop_event, start_event))
+    process.start()
+    return process, output_queue, stop_event, start_event
+
+
+def wait_first_chunk(output_queue, process):
+    while process.is_alive():
+        try:
+            output_queue.get(timeout=0.1)
+            return time.perf_counter()
+        except Exception:
+            continue
+    raise RuntimeError("录音子进程意外退出")
+
+
+def stop_child(process, output_queue, stop_event):
+    from audio_capture import cleanup_recording_process
+    start = time.perf_counter()
+    cleanup_recording_process(stop_event, process, output_queue)
+    return time.perf_counter() - start, process.exitcode
+
+
+def run_scenario(ctx, name, repeats):
+    silent_devices = [1] if name == "silent-loopback" else []
+    device_indices = [0] if name == "single" else [0, 1]
+    starts, stops, gaps, killed = [], [], [], 0
+
+    start = time.perf_counter()
+    process, output_queue, stop_event, start_event = spawn_child(ctx, device_indices, silent_devices)
+    start_event.set()
+    starts.append(wait_first_chunk(output_queue, process) - start)
+    for _ in range(repeats):
+        # 新的子进程在旧的运行期间预热（识别脚本中对应加载模型的时间）
+        standby = spawn_child(ctx, device_indices, silent_devices)
+
+        # 运行一段时间；unread 场景下这段时间不读取队列，让数据积压在管道中
+        if name == "unread":
+            time.sleep(2.0)
+        else:
+            deadline = time.perf_counter() + 1.0
+            while time.perf_counter() < deadline:
+                try:
+                    output_queue.get(timeout=0.1)
+                except Exception:
+                    pass
+
+        stop_start = time.perf_counter()
+        stop_seconds, exitcode = stop_child(process, output_queue, stop_event)
+        stops.append(stop_seconds)
+        if exitcode is None or exitcode < 0:
+            killed += 1
+
+        process, output_queue, stop_event, start_event = standby
+        start_event.set()
+        gaps.append(wait_first_chunk(output_queue, process) - stop_start)
+
+    stop_child(process, output_queue, stop_event)
+    return starts, stops, gaps, killed
+
+
+def main():
+    args = get_args()
+    install_fake_backend()
+    ctx = multiprocessing.get_context("spawn")
+
+    print(f"{'场景':<18}{'启动(ms)':>10}{'停止p50(ms)':>13}{'停止max(ms)':>13}{'重启间隔(ms)':>14}{'强制终止':>10}")
+    for name in ["active", "silent-loopback", "unread", "single"]:
+        starts, stops, gaps, killed = run_scenario(ctx, name, args.repeats)
+        print(f"{name:<18}{statistics.median(starts) * 1000:>10.0f}{statistics.median(stops) * 1000:>13.0f}"
+              f"{max(stops) * 1000:>13.0f}{statistics.median(gaps) * 1000:>14.0f}{killed:>7}/{len(stops)}")
+        assert killed == 0, f"{name}: {killed}/{len(stops)} 次停止时子进程被强制终止"
+        assert max(stops) * 1000 <= args.stop_budget_ms, \
+            f"{name}: 最长停止耗时 {max(stops) * 1000:.0f} ms 超过 {args.stop_budget_ms:g} ms"
+        if name == "single":
+            assert max(gaps) * 1000 <= args.restart_budget_ms, \
+                f"{name}: 最长重启间隔 {max(gaps) * 1000:.0f} ms 超过 {args.restart_budget_ms:g} ms"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+#
+# Copyright (c)  2025  Xiaomi Corporation
+
+"""
+测量识别历史记录的写入和查询耗时。
+
+  - 写入：每条记录的 append() 耗时（识别线程实际承担的部分）和 fsync 次数，
+    比较成组提交和在识别线程中每条记录 fsync 一次的做法
+  - 查询：生成若干天的历史记录（每 --sentence-interval 秒一句），
+    查询最近一小时/一天和全部记录的耗时
+  - 恢复：模拟写了一半的记录后重新打开的耗时
+
+Usage:
+
+python benchmarks/bench_transcript_history.py
+python benchmarks/bench_transcript_history.py --days 7 --dir /tmp/history-bench
+"""
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+script_dir = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, script_dir)
+
+import transcript_history
+from transcript_history import TranscriptHistory, HistoryReader, segment_paths
+
+fsync_calls = 0
+_fsync = os.fsync
+
+
+def counting_fsync(fd):
+    global fsync_calls
+    fsync_calls += 1
+    _fsync(fd)
+
+
+transcript_history.os.fsync = counting_fsync
+
+
+def get_args():
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--days", type=float, default=3, help="生成的历史记录天数")
+    parser.add_argument("--sentence-interval", type=float, default=4.0, help="每句的平均间隔（秒）")
+    parser.add_argument("--appends", type=int, default=500, help="写入计时的记录数")
+    parser.add_argument("--dir", type=str, default="", help="测试目录，不指定时使用临时目录（结束后删除）")
+    return parser.parse_args()
+
+
+text = "今天的会议主要讨论下一季度的产品规划和人员安排"
+
+
+def time_appends(directory, count, sync_each):
+    global fsync_calls
+    fsync_calls = 0
+    history = TranscriptHistory(directory)
+    times = []
+    now = time.time()
+    for i in range(count):
+        start = time.perf_counter()
+        history.append(now + i, now + i + 2.5, text, "1: Microphone")
+        if sync_each:
+            # 对照：写入后立即在调用线程中提交
+            os.fsync(history._log.fileno())
+            os.fsync(history._idx.fileno())
+        times.append(time.perf_counter() - start)
+    close_start = time.perf_counter()
+    history.close()
+    total = sum(times) + time.perf_counter() - close_start
+    return statistics.median(times), max(times), total, fsync_calls
+
+
+def fill(directory, days, interval):
+    history = TranscriptHistory(directory, commit_records=10000, commit_interval=60)
+    end = time.time()
+    t = end - days * 86400
+    count = 0
+    while t < end:
+        history.append(t, t + interval * 0.6, text, "1: Microphone")
+        t += interval
+        count += 1
+    history.close()
+    return end, count
+
+
+def time_query(reader, start, end, repeats=5):
+    times = []
+    count = 0
+    for _ in range(repeats):
+        t = time.perf_counter()
+        count = sum(1 for _ in reader.query(start, end))
+        times.append(time.perf_counter() - t)
+    return statistics.median(times), count
+
+
+def main():
+    args = get_args()
+    base = args.dir or tempfile.mkdtemp(prefix="history-bench-")
+    try:
+        print(f"{'写入方式':<18}{'append p50(us)':>16}{'append max(ms)':>16}{'总耗时(ms)':>12}{'fsync次数':>10}")
+        for name, sync_each in [("group-commit", False), ("fsync-per-record", True)]:
+            directory = os.path.join(base, name)
+            p50, worst, total, fsyncs = time_appends(directory, args.appends, sync_each)
+            print(f"{name:<18}{p50 * 1e6:>16.1f}{worst * 1000:>16.2f}{total * 1000:>12.1f}{fsyncs:>10}")
+
+        directory = os.path.join(base, "days")
+        start = time.perf_counter()
+        end, count = fill(directory, args.days, args.sentence_interval)
+        fill_seconds = time.perf_counter() - start
+        reader = HistoryReader(directory)
+        stats = reader.stats()
+        print(f"\n{args.days:g} 天 {count} 条记录，{stats['segments']} 个日志段，"
+              f"{stats['bytes'] / 1024 / 1024:.1f} MB，写入 {fill_seconds:.2f} s")
+
+        print(f"{'查询范围':<12}{'耗时(ms)':>12}{'记录数':>10}")
+        for name, seconds in [("最近1小时", 3600), ("最近1天", 86400), ("全部", None)]:
+            elapsed, hits = time_query(reader, end - seconds if seconds else None, None)
+            print(f"{name:<12}{elapsed * 1000:>12.2f}{hits:>10}")
+
+        # 在最后一个日志段末尾追加半条记录，重新打开时截断
+        _, log_path, _ = segment_paths(directory)[-1]
+        with open(log_path, "ab") as f:
+            f.write(b"\x40\x00\x00\x00\x00\x00")
+        start = time.perf_counter()
+        TranscriptHistory(directory).close()
+        print(f"\n恢复写了一半的记录: {(time.perf_counter() - start) * 1000:.1f} ms，"
+              f"记录数 {HistoryReader(directory).stats()['records']}")
+    finally:
+        if not args.dir:
+            shutil.rmtree(base, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
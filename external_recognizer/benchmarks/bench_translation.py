@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+#
+# Copyright (c)  2025  Xiaomi Corporation
+
+"""
+测量翻译阶段对识别线程的影响。
+
+用 echo 后端模拟翻译服务（每次请求 --request-delay 秒，每个句子再加 --per-text-delay 秒），
+按 --interval 的间隔提交句子，其中 --repeat-rate 比例的句子是重复的常用语。比较：
+
+  - inline：在 on_endpoint 之后直接调用后端翻译（识别线程等待翻译完成）
+  - async：Translator，识别线程只调用 submit()
+
+报告识别线程每句被占用的时间、从句子结束到译文输出的延迟、请求数、缓存命中和丢弃数。
+
+Usage:
+
+python benchmarks/bench_translation.py
+python benchmarks/bench_translation.py --interval 0.02 --sentences 500 --max-in-flight 4
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+
+import numpy as np
+
+script_dir = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, script_dir)
+
+from translation import EchoBackend, Translator
+
+
+def get_args():
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--sentences", type=int, default=200, help="提交的句子数")
+    parser.add_argument("--interval", type=float, default=0.05, help="句子之间的间隔（秒）")
+    parser.add_argument("--repeat-rate", type=float, default=0.3, help="重复常用语的比例")
+    parser.add_argument("--request-delay", type=float, default=0.3, help="模拟的每次请求耗时（秒）")
+    parser.add_argument("--per-text-delay", type=float, default=0.02, help="模拟的每个句子增加的耗时（秒）")
+    parser.add_argument("--max-batch", type=int, default=8)
+    parser.add_argument("--max-in-flight", type=int, default=2)
+    parser.add_argument("--max-pending", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+def make_sentences(rng, count, repeat_rate):
+    common = ["好的", "谢谢大家", "下一页", "有没有问题", "我们继续"]
+    return [rng.choice(common) if rng.random() < repeat_rate else f"第{i}句话的识别结果" for i in range(count)]
+
+
+def run_inline(args, sentences):
+    backend = EchoBackend(args.request_delay, args.per_text_delay)
+    blocked = []
+    latencies = []
+    start = time.perf_counter()
+    for i, text in enumerate(sentences):
+        # 句子在预定的时间结束；识别线程被翻译占用时，后面的句子只能推迟处理
+        due = start + i * args.interval
+        delay = due - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        t = time.perf_counter()
+        backend.translate_batch([text], "auto", "en")
+        blocked.append(time.perf_counter() - t)
+        latencies.append(time.perf_counter() - due)
+    return blocked, latencies, backend.requests, 0, 0, len(sentences)
+
+
+def run_async(args, sentences):
+    backend = EchoBackend(args.request_delay, args.per_text_delay)
+    submitted = {}
+    latencies = []
+    done = threading.Event()
+    lock = threading.Lock()
+
+    def emit(text, translated):
+        with lock:
+            latencies.append(time.perf_counter() - submitted[text].pop(0))
+            if len(latencies) + translator.stats.dropped >= len(sentences):
+                done.set()
+
+    translator = Translator(backend, emit, max_batch=args.max_batch, max_in_flight=args.max_in_flight,
+                            max_pending=args.max_pending)
+    blocked = []
+    start = time.perf_counter()
+    for i, text in enumerate(sentences):
+        due = start + i * args.interval
+        delay = due - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        with lock:
+            submitted.setdefault(text, []).append(due)
+        t = time.perf_counter()
+        translator.submit(text)
+        blocked.append(time.perf_counter() - t)
+    done.wait(timeout=60)
+    translator.close(wait=True)
+    stats = translator.stats
+    return blocked, latencies, stats.requests, stats.cached, stats.dropped, stats.max_in_flight
+
+
+def main():
+    args = get_args()
+    rng = random.Random(args.seed)
+    sentences = make_sentences(rng, args.sentences, args.repeat_rate)
+    print(f"{args.sentences} 句，间隔 {args.interval * 1000:.0f} ms，模拟请求耗时 {args.request_delay * 1000:.0f} ms"
+          f" + {args.per_text_delay * 1000:.0f} ms/句")
+    print(f"{'方式':<8}{'占用p50(ms)':>12}{'占用max(ms)':>12}{'译文延迟p50(ms)':>16}{'译文延迟p95(ms)':>16}"
+          f"{'请求数':>8}{'缓存命中':>9}{'丢弃':>6}{'最多同时':>9}")
+    for name, run in [("inline", run_inline), ("async", run_async)]:
+        blocked, latencies, requests, cached, dropped, in_flight = run(args, sentences)
+        blocked = np.array(blocked) * 1000
+        latencies = np.array(latencies) * 1000
+        print(f"{name:<8}{statistics.median(blocked):>12.3f}{blocked.max():>12.3f}"
+              f"{np.percentile(latencies, 50):>16.0f}{np.percentile(latencies, 95):>16.0f}"
+              f"{requests:>8}{cached:>9}{dropped:>6}{in_flight if name == 'async' else 1:>9}")
+
+
+if __name__ == "__main__":
+    main()
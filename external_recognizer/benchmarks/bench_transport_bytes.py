@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+#
+# Copyright (c)  2025  Xiaomi Corporation
+
+"""
+测量录音进程通过 multiprocessing.Queue 发送给识别进程的数据量（字节/秒）。
+
+模拟一个 48 kHz 双声道设备和一个 16 kHz 单声道设备，经过与 start_recording
+相同的解码、重采样和混音流程，比较float32和int16格式序列化后每秒的传输字节数。
+
+以前的链路有两行：
+  - legacy：按原来 common_audio_utils.start_recording 的代码实际运行（float32读取、np.mean转单声道、
+    scipy.signal.resample、np.mean混音），结果的dtype取决于安装的scipy版本；没有安装scipy时跳过
+  - legacy(float64)：计算值，把float32的混音结果转换为float64，对应旧版本scipy的resample返回float64的情况
+
+Usage:
+
+python benchmarks/bench_transport_bytes.py
+"""
+import os
+import sys
+
+script_dir = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, script_dir)
+
+import numpy as np
+from multiprocessing.reduction import ForkingPickler
+
+from audio_mixer import (
+    samples_time, FORMAT_FLOAT32, FORMAT_INT16,
+    decode_packet, TimestampMixer
+)
+
+SECONDS = 10
+
+
+def make_packets(sample_format, rng):
+    """生成两个设备在每个时间槽的原始字节"""
+    def encode(samples):
+        if sample_format == FORMAT_INT16:
+            return np.int16(samples * 32767).tobytes()
+        return samples.astype(np.float32).tobytes()
+
+    slots = []
+    for _ in range(int(SECONDS / samples_time)):
+        stereo_48k = rng.uniform(-0.5, 0.5, int(48000 * samples_time) * 2)
+        mono_16k = rng.uniform(-0.5, 0.5, int(16000 * samples_time))
+        slots.append((encode(stereo_48k), encode(mono_16k)))
+    return slots
+
+
+def mix(slots, sample_format):
+    mixer = TimestampMixer([0, 1], sample_format=sample_format)
+    queues = {0: [], 1: []}
+    outputs = []
+    for k, (data_48k, data_16k) in enumerate(slots):
+        timestamp = k * samples_time
+        queues[0].append((timestamp, decode_packet(data_48k, sample_format, 2), 48000))
+        queues[1].append((timestamp, decode_packet(data_16k, sample_format, 1), 16000))
+        while True:
+            mixed, _ = mixer.step(timestamp + 1, lambda idx: queues[idx].pop(0) if queues[idx] else None)
+            if mixed is None:
+                break
+            outputs.append(mixed)
+    return outputs
+
+
+def legacy_mix(slots):
+    """原来的重采样和混音代码（修改前的 start_recording），输入为float32数据包"""
+    from scipy import signal
+    outputs = []
+    for data_48k, data_16k in slots:
+        stereo = np.frombuffer(data_48k, dtype=np.float32).reshape(-1, 2)
+        resampled_samples = [
+            signal.resample(np.copy(np.mean(stereo, axis=1)), int(len(stereo) * 16000 / 48000)),
+            np.copy(np.frombuffer(data_16k, dtype=np.float32)),
+        ]
+        min_length = min(len(s) for s in resampled_samples)
+        outputs.append(np.mean([s[:min_length] for s in resampled_samples], axis=0))
+    return outputs
+
+
+def bytes_per_second(outputs):
+    return sum(len(ForkingPickler.dumps(o)) for o in outputs) / SECONDS
+
+
+def main():
+    rng = np.random.default_rng(0)
+
+    float32_packets = make_packets(FORMAT_FLOAT32, rng)
+    float32_outputs = mix(float32_packets, FORMAT_FLOAT32)
+    int16_outputs = mix(make_packets(FORMAT_INT16, rng), FORMAT_INT16)
+
+    rows = []
+    try:
+        import scipy
+        rows.append(("legacy", legacy_mix(float32_packets), f"实测，scipy {scipy.__version__}"))
+    except ImportError:
+        print("没有安装scipy，跳过实测的 legacy", file=sys.stderr)
+    # 旧版本scipy的resample对float32输入返回float64，np.mean混音后以float64放入队列
+    rows.append(("legacy(float64)", [o.astype(np.float64) for o in float32_outputs], "计算值"))
+    rows += [("float32", float32_outputs, "实测"), ("int16", int16_outputs, "实测")]
+
+    print(f"{'格式':<18}{'dtype':<10}{'字节/秒':>12}  来源")
+    for name, outputs, source in rows:
+        print(f"{name:<18}{str(outputs[0].dtype):<10}{bytes_per_second(outputs):>12.0f}  {source}")
+
+
+if __name__ == "__main__":
+    main()
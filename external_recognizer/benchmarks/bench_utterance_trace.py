@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+#
+# Copyright (c)  2025  Xiaomi Corporation
+
+"""
+测量时间线追踪（utterance_trace）的开销，并检查两个进程的事件能否关联。
+
+  - 每个数据包的追踪开销：录音进程中 CaptureTracer 的 capture / queue wait / mix / ipc put 四个事件，
+    识别进程中 UtteranceTracer 的 received 和3个VAD窗口事件，相对于一个数据包的时长（50 ms）
+  - 端到端：用模拟的音频后端（每个设备每 50 ms 一个数据包）以 spawn 方式启动 start_recording 子进程，
+    本进程模拟识别主循环（每个数据包3个VAD窗口，每 --utterance-packets 个数据包一句话），
+    结束后读取生成的JSON，统计各类事件数、跨进程配对的数据包和句子，以及 ipc（放入队列到取出）的延迟
+
+Usage:
+
+python benchmarks/bench_utterance_trace.py
+python benchmarks/bench_utterance_trace.py --seconds 30 --devices 3
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter
+
+script_dir = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, script_dir)
+
+from audio_mixer import samples_time
+from fake_pyaudio import install_fake_backend
+from utterance_trace import CaptureTracer, UtteranceTracer
+
+
+def get_args():
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=10, help="端到端运行的时长")
+    parser.add_argument("--devices", type=int, default=2, help="模拟的采集设备数")
+    parser.add_argument("--utterance-packets", type=int, default=40, help="每句话的数据包数")
+    return parser.parse_args()
+
+
+def recording_child(device_indices, output_queue, stop_event, trace_queue):
+    """子进程入口：安装模拟后端后运行 start_recording"""
+    install_fake_backend(num_inputs=len(device_indices))
+    from audio_capture import start_recording
+    start_recording(device_indices, output_queue, stop_event, sample_format="int16", trace_queue=trace_queue)
+
+
+class NullQueue:
+    def put(self, item):
+        pass
+
+
+def per_packet_cost(devices, packets=20000):
+    """每个数据包的追踪开销（微秒），分别为录音进程和识别进程"""
+    capture = CaptureTracer(NullQueue())
+    start = time.perf_counter()
+    for i in range(packets):
+        timestamp = i * samples_time
+        for device_idx in range(devices):
+            capture.packet_captured(device_idx, timestamp, time.perf_counter())
+        for device_idx in range(devices):
+            capture.packet_fetched(device_idx, timestamp)
+        capture.mixed(timestamp, time.perf_counter(), devices)
+        capture.sent(timestamp, time.perf_counter())
+        capture.maybe_flush()
+    capture_cost = (time.perf_counter() - start) / packets
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tracer = UtteranceTracer(os.path.join(tmp, "trace.json"))
+        start = time.perf_counter()
+        for i in range(packets):
+            iteration_start = time.perf_counter()
+            tracer.received(i * samples_time, iteration_start)
+            for _ in range(3):
+                tracer.span("vad window", time.perf_counter())
+            tracer.span("process", iteration_start)
+        recognizer_cost = (time.perf_counter() - start) / packets
+        tracer.close()
+    return capture_cost * 1e6, recognizer_cost * 1e6
+
+
+def run_end_to_end(args, path):
+    ctx = multiprocessing.get_context("spawn")
+    output_queue, trace_queue, stop_event = ctx.Queue(), ctx.Queue(), ctx.Event()
+    process = ctx.Process(target=recording_child,
+                          args=(list(range(args.devices)), output_queue, stop_event, trace_queue))
+    process.start()
+    tracer = UtteranceTracer(path, trace_queue)
+
+    packets = 0
+    first_timestamp = None
+    deadline = None
+    while deadline is None or time.perf_counter() < deadline:
+        try:
+            timestamp, samples = output_queue.get(timeout=0.5)
+        except Exception:
+            if not process.is_alive():
+                raise RuntimeError("录音子进程意外退出")
+            continue
+        if deadline is None:
+            deadline = time.perf_counter() + args.seconds
+        iteration_start = time.perf_counter()
+        tracer.received(timestamp, iteration_start)
+        for _ in range(3):
+            tracer.span("vad window", time.perf_counter())
+        packets += 1
+        if first_timestamp is None:
+            first_timestamp = timestamp
+            tracer.begin_utterance()
+        if packets % args.utterance_packets == 0:
+            decode_start = time.perf_counter()
+            time.sleep(0.005)
+            tracer.span("final decode", decode_start)
+            tracer.end_utterance(f"第 {packets // args.utterance_packets} 句", first_timestamp)
+            first_timestamp = None
+        tracer.span("process", iteration_start)
+
+    from audio_capture import cleanup_recording_process
+    cleanup_recording_process(stop_event, process, output_queue)
+    tracer.close()
+    return packets
+
+
+def main():
+    args = get_args()
+    install_fake_backend(num_inputs=args.devices)
+
+    capture_us, recognizer_us = per_packet_cost(args.devices)
+    budget_us = samples_time * 1e6
+    print(f"每个数据包的追踪开销（{args.devices} 个设备）：录音进程 {capture_us:.1f} us，识别进程 {recognizer_us:.1f} us，"
+          f"合计占数据包时长的 {(capture_us + recognizer_us) / budget_us * 100:.2f}%")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "trace.json")
+        packets = run_end_to_end(args, path)
+        size = os.path.getsize(path)
+        with open(path, encoding="utf-8") as f:
+            events = json.load(f)
+
+    names = Counter(event["name"] for event in events if event["ph"] == "X")
+    ipc = [event["dur"] / 1000 for event in events if event["ph"] == "X" and event["name"] == "ipc"]
+    flows = Counter(event["cat"] for event in events if event["ph"] == "f")
+    utterances = sum(1 for event in events if event["ph"] == "e")
+    print(f"端到端 {args.seconds:g} s：识别进程收到 {packets} 个数据包，时间线 {len(events)} 个事件，"
+          f"{size / 1024 / args.seconds:.1f} KB/s")
+    print("事件数：" + "，".join(f"{name} {count}" for name, count in sorted(names.items())))
+    print(f"跨进程配对：数据包 {flows['packet']}/{packets}，句子 {flows['utterance']}/{utterances}")
+    if ipc:
+        ipc.sort()
+        print(f"ipc延迟(ms)：p50 {statistics.median(ipc):.2f}，p95 {ipc[int(len(ipc) * 0.95)]:.2f}，max {ipc[-1]:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+#
+# Copyright (c)  2025  Xiaomi Corporation
+
+"""
+测量 SenseVoice 识别循环送入VAD的Python开销，并检查不同的送入方式是否得到相同的分句。
+
+音频按 50 ms 一块送入，每次处理 --batch 块（1 为实时运行；积压时一次取出多块），三种方式：
+  - per-window：原来的循环，每个窗口切片、送入、检查 is_speech_detected
+  - batched：当前的循环，在紧凑的循环中逐个送入所有完整窗口，每批只检查一次开始状态
+  - single-call：所有完整窗口一次送入。sherpa_onnx 的VAD对一次调用中的窗口结果取或，
+    并按调用末尾的位置计算句子的开始/结束，分句位置会偏移，仅作为C++侧耗时的下限参考
+
+报告每秒音频的耗时（包括VAD模型推理）、相对 single-call 多出的Python开销，
+以及分句（开始位置、长度）是否与 per-window 完全一致。不指定 --wav 时使用 soak-test.py 的合成音频。
+
+需要 sherpa_onnx 和 silero_vad.onnx：
+
+python benchmarks/bench_vad_feeding.py
+python benchmarks/bench_vad_feeding.py --batch 10 --wav meeting.wav -- --silero-vad-model ./silero_vad.onnx
+"""
+import argparse
+import importlib.util
+import os
+import sys
+import time
+
+import numpy as np
+
+script_dir = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, script_dir)
+
+from audio_mixer import sample_rate, samples_time
+
+script_path = os.path.join(script_dir, "simulate-streaming-sense-voice.py")
+
+
+def get_args():
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--wav", type=str, default="", help="测试音频（16位WAV）；不指定时使用合成音频")
+    parser.add_argument("--seconds", type=float, default=120, help="音频时长")
+    parser.add_argument("--batch", type=int, default=1, help="每次处理的音频块数")
+    parser.add_argument("--repeats", type=int, default=3, help="每种方式重复的次数，取最快的一次")
+    parser.add_argument("script_args", nargs=argparse.REMAINDER, help="-- 之后为识别脚本的参数")
+    return parser.parse_args()
+
+
+def load_module(path, name):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def feed_per_window(vad, buffer, offset, window_size, started):
+    while offset + window_size < len(buffer):
+        vad.accept_waveform(buffer[offset : offset + window_size])
+        if not started and vad.is_speech_detected():
+            started = True
+        offset += window_size
+    return offset, started
+
+
+def feed_batched(vad, buffer, offset, window_size, started):
+    num_windows = max(len(buffer) - offset - 1, 0) // window_size
+    if num_windows:
+        end = offset + num_windows * window_size
+        accept_waveform = vad.accept_waveform
+        for window_offset in range(offset, end, window_size):
+            accept_waveform(buffer[window_offset : window_offset + window_size])
+        if not started and vad.is_speech_detected():
+            started = True
+        offset = end
+    return offset, started
+
+
+def feed_single_call(vad, buffer, offset, window_size, started):
+    num_windows = max(len(buffer) - offset - 1, 0) // window_size
+    if num_windows:
+        end = offset + num_windows * window_size
+        vad.accept_waveform(buffer[offset:end])
+        if not started and vad.is_speech_detected():
+            started = True
+        offset = end
+    return offset, started
+
+
+def run(sherpa_onnx, config, audio, batch, feed):
+    """与识别循环相同的缓冲区管理，返回 (耗时, 分句列表, 每批的开始状态)"""
+    vad = sherpa_onnx.VoiceActivityDetector(config, buffer_size_in_seconds=100)
+    window_size = config.silero_vad.window_size
+    chunk = int(sample_rate * samples_time) * batch
+    buffer = np.zeros(0, dtype=np.float32)
+    buffer_start = offset = vad_samples = vad_shift = 0
+    started = False
+    segments, states = [], []
+    elapsed = 0.0
+    for position in range(0, len(audio) - chunk + 1, chunk):
+        buffer = np.concatenate([buffer, audio[position:position + chunk]])
+        vad_shift = buffer_start + offset - vad_samples
+        start = time.perf_counter()
+        new_offset, started = feed(vad, buffer, offset, window_size, started)
+        elapsed += time.perf_counter() - start
+        vad_samples += new_offset - offset
+        offset = new_offset
+
+        if not started and len(buffer) > 10 * window_size:
+            offset -= len(buffer) - 10 * window_size
+            buffer_start += len(buffer) - 10 * window_size
+            buffer = buffer[-10 * window_size:]
+        while not vad.empty():
+            segments.append((vad.front.start + vad_shift, len(vad.front.samples)))
+            vad.pop()
+            buffer = np.zeros(0, dtype=np.float32)
+            buffer_start = position + chunk
+            offset = 0
+            started = False
+        # 每批处理结束（句子已取出）时的开始状态
+        states.append(started)
+    return elapsed, segments, states
+
+
+def main():
+    args = get_args()
+    script_argv = args.script_args[1:] if args.script_args[:1] == ["--"] else args.script_args
+    module = load_module(script_path, "bench_sense_voice")
+    soak_test = load_module(os.path.join(script_dir, "soak-test.py"), "bench_soak_test")
+
+    sys.argv = [script_path] + script_argv
+    script_args = module.get_args()
+    module.prepare_models(script_args)
+    config = module.create_vad_config(script_args)
+    audio = soak_test.read_wav(args.wav) if args.wav else soak_test.synthetic_audio(args.seconds)
+    audio = module.to_float32_samples(audio)[:int(args.seconds * sample_rate)]
+    audio_seconds = len(audio) / sample_rate
+
+    results = {}
+    for name, feed in [("per-window", feed_per_window), ("batched", feed_batched),
+                       ("single-call", feed_single_call)]:
+        runs = [run(module.sherpa_onnx, config, audio, args.batch, feed) for _ in range(args.repeats)]
+        results[name] = min(runs, key=lambda r: r[0])
+
+    floor = results["single-call"][0]
+    _, reference_segments, reference_states = results["per-window"]
+    print(f"音频 {audio_seconds:.0f} s，每次处理 {args.batch} 块（{args.batch * samples_time * 1000:.0f} ms），"
+          f"VAD窗口 {config.silero_vad.window_size} 个采样")
+    print(f"{'方式':<13}{'耗时(ms/音频秒)':>16}{'Python开销(ms/音频秒)':>22}{'分句数':>8}  与 per-window 比较")
+    for name, (elapsed, segments, states) in results.items():
+        same = segments == reference_segments and states == reference_states
+        print(f"{name:<13}{elapsed / audio_seconds * 1000:>16.3f}{(elapsed - floor) / audio_seconds * 1000:>22.3f}"
+              f"{len(segments):>8}  {'分句和开始状态一致' if same else '分句或开始状态不同'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+#
+# Copyright (c)  2025  Xiaomi Corporation
+
+"""
+比较唤醒词门控（wake_gate.WakeGate）和一直识别的CPU占用。
+
+用识别脚本的识别主循环（run_recognition）处理同一段音频两次：
+  - always-on：音频直接送入识别器
+  - gated：音频先经过关键词检测，检测到唤醒词后才送入识别器
+
+音频按 --speed 倍实时速度送入（识别主循环的临时结果按真实时间间隔解码，默认按实时速度），
+进程CPU时间（包括推理线程）除以音频时长即为实时运行时的CPU占用；空闲CPU = 100% - CPU占用 / 核心数。
+不指定 --wav 时使用 soak-test.py 的合成音频（其中没有唤醒词，门控一直关闭）。
+
+需要 sherpa_onnx 和模型文件，识别脚本的参数（包括 --wake-keywords 和 --kws-* 模型）放在 -- 之后：
+
+python benchmarks/bench_wake_gate.py --script sense-voice -- --wake-keywords keywords.txt \\
+    --kws-encoder kws/encoder.onnx --kws-decoder kws/decoder.onnx --kws-joiner kws/joiner.onnx \\
+    --kws-tokens kws/tokens.txt
+python benchmarks/bench_wake_gate.py --script zipformer --wav meeting.wav -- --wake-keywords keywords.txt ...
+"""
+import argparse
+import importlib.util
+import os
+import queue
+import sys
+import threading
+import time
+
+script_dir = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, script_dir)
+
+from wake_gate import WakeGate, create_keyword_spotter
+
+scripts = {
+    "sense-voice": os.path.join(script_dir, "simulate-streaming-sense-voice.py"),
+    "zipformer": os.path.join(script_dir, "streaming-with-endpoint-detection.py"),
+}
+
+
+def get_args():
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--script", type=str, default="sense-voice", choices=sorted(scripts.keys()))
+    parser.add_argument("--wav", type=str, default="", help="测试音频（16位WAV）；不指定时使用合成音频")
+    parser.add_argument("--seconds", type=float, default=60, help="每种模式送入的音频时长")
+    parser.add_argument("--speed", type=float, default=1.0, help="送入音频的速度（实时速度的倍数）")
+    parser.add_argument("script_args", nargs=argparse.REMAINDER, help="-- 之后为识别脚本的参数")
+    return parser.parse_args()
+
+
+def load_module(path, name):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class CountingPrinter:
+    """不输出识别结果，只统计句子数；有门控时通知识别结果的变化"""
+    def __init__(self, gate=None):
+        self.gate = gate
+        self.prev_result = ""
+        self.sentences = 0
+
+    def do_print(self, result):
+        if result and result != self.prev_result:
+            self.prev_result = result
+            if self.gate:
+                self.gate.notify_activity()
+
+    def on_endpoint(self, start=None, end=None):
+        self.sentences += 1
+
+
+def run(module, soak_test, script_args, recognizer, audio, seconds, speed, spotter=None):
+    samples_queue = queue.Queue()
+    gate = WakeGate(samples_queue, spotter, script_args.wake_pre_roll, script_args.wake_timeout) if spotter else None
+    printer = CountingPrinter(gate)
+    stop_event = threading.Event()
+    thread = threading.Thread(target=module.run_recognition,
+                              args=(script_args, recognizer, gate or samples_queue, printer, stop_event))
+    feed_stop = threading.Event()
+    feeder = threading.Thread(target=soak_test.feed_audio,
+                              args=(samples_queue, audio, seconds, speed, feed_stop, [0.0]))
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    thread.start()
+    feeder.start()
+    feeder.join()
+    while not samples_queue.empty() or (gate and gate.ready):
+        time.sleep(0.05)
+    # 等待最后取出的音频处理完（主循环随后阻塞在队列上，不再占用CPU）
+    time.sleep(0.5)
+    wall, cpu = time.perf_counter() - wall_start - 0.5, time.process_time() - cpu_start
+    stop_event.set()
+    thread.join()
+    if gate:
+        gate.close()
+    return wall, cpu, printer.sentences, gate
+
+
+def main():
+    args = get_args()
+    script_argv = args.script_args[1:] if args.script_args[:1] == ["--"] else args.script_args
+    module = load_module(scripts[args.script], f"bench_{args.script.replace('-', '_')}")
+    soak_test = load_module(os.path.join(script_dir, "soak-test.py"), "bench_soak_test")
+
+    sys.argv = [scripts[args.script]] + script_argv
+    script_args = module.get_args()
+    if not script_args.wake_keywords:
+        print("需要在 -- 之后指定 --wake-keywords 和 --kws-* 模型", file=sys.stderr)
+        sys.exit(1)
+    recognizer = module.load_recognizer(script_args)
+    spotter = create_keyword_spotter(module.sherpa_onnx, script_args)
+    audio = soak_test.read_wav(args.wav) if args.wav else soak_test.synthetic_audio(min(args.seconds, 60))
+    audio_seconds = args.seconds
+    cores = os.cpu_count() or 1
+
+    print(f"{args.script}，音频 {audio_seconds:.0f} s，{cores} 核，推理线程数 {script_args.num_threads}")
+    print(f"{'模式':<11}{'处理耗时(s)':>12}{'CPU时间(s)':>12}{'实时CPU占用':>12}{'空闲CPU':>9}{'句子数':>8}  门控")
+    for name, mode_spotter in [("always-on", None), ("gated", spotter)]:
+        wall, cpu, sentences, gate = run(module, soak_test, script_args, recognizer, audio, args.seconds, args.speed,
+                                         mode_spotter)
+        usage = cpu / audio_seconds * 100
+        summary = gate.stats.format_summary() if gate else ""
+        print(f"{name:<11}{wall:>12.2f}{cpu:>12.2f}{usage:>11.1f}%{100 - usage / cores:>8.1f}%{sentences:>8}  {summary}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+#
+# Copyright (c)  2025  Xiaomi Corporation
+
+"""
+基准测试使用的模拟音频后端，代替 pyaudiowpatch。
+
+模拟 MME 和 WASAPI 两个主机API下的输入设备，以及 WASAPI 的 loopback 设备；
+每个设备按真实时间每 frames_per_buffer 个采样产生一个全零的数据包。
+必须在导入 audio_capture 之前调用 install_fake_backend()。
+"""
+import sys
+import threading
+import time
+import types
+
+
+class FakeStream:
+    """模拟的输入流：支持阻塞读取和回调两种方式，silent 设备永远不产生数据"""
+    def __init__(self, rate, channels, frames_per_buffer, silent, stream_callback=None, **kwargs):
+        self.frames_per_buffer = frames_per_buffer
+        self.interval = frames_per_buffer / rate
+        self.data = b"\0\0" * frames_per_buffer * channels
+        self.silent = silent
+        self.callback = stream_callback
+        self.closed = threading.Event()
+        self.next_time = time.time() + self.interval
+        self.thread = None
+        if stream_callback:
+            self.thread = threading.Thread(target=self._run_callback, daemon=True)
+            self.thread.start()
+
+    def _wait_next(self):
+        """等待下一个数据包的时间，流被关闭时返回 False"""
+        if self.silent:
+            self.closed.wait()
+            return False
+        delay = self.next_time - time.time()
+        self.next_time += self.interval
+        return not self.closed.wait(max(delay, 0))
+
+    def _run_callback(self):
+        while self._wait_next():
+            _, flag = self.callback(self.data, self.frames_per_buffer, {}, 0)
+            if flag != FakePyAudio.paContinue:
+                break
+
+    def read(self, num_frames, exception_on_overflow=True):
+        if self.silent:
+            # 没有声音播放时，loopback设备的阻塞读取在关闭流之后也不会返回
+            threading.Event().wait()
+        if not self._wait_next():
+            raise OSError("Stream closed")
+        return self.data
+
+    def stop_stream(self):
+        self.closed.set()
+
+    def close(self):
+        self.closed.set()
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join()
+
+
+class FakePyAudio:
+    paInt16 = 8
+    paFloat32 = 1
+    paContinue = 0
+    paComplete = 1
+    paMME = 2
+    paWASAPI = 13
+
+    silent_devices = set()
+    # 每个主机API下的设备数；MME和WASAPI各有相同的麦克风和扬声器，WASAPI的每个扬声器另有一个loopback设备
+    num_inputs = 2
+    num_outputs = 2
+    info_calls = 0
+
+    host_apis = [{"index": 0, "type": paMME, "name": "MME"},
+                 {"index": 1, "type": paWASAPI, "name": "Windows WASAPI"}]
+
+    def __init__(self):
+        self.devices = []
+        for host_api in self.host_apis:
+            for k in range(self.num_inputs):
+                self._add(f"Microphone {k}", host_api["index"], 2, 0)
+            for k in range(self.num_outputs):
+                self._add(f"Speakers {k}", host_api["index"], 0, 2)
+        for k in range(self.num_outputs):
+            self._add(f"Speakers {k} [Loopback]", 1, 2, 0, loopback=True)
+
+    def _add(self, name, host_api, inputs, outputs, loopback=False):
+        self.devices.append({"index": len(self.devices), "name": name, "hostApi": host_api,
+                             "defaultSampleRate": 48000.0, "maxInputChannels": inputs,
+                             "maxOutputChannels": outputs, "isLoopbackDevice": loopback})
+
+    def get_device_count(self):
+        return len(self.devices)
+
+    def get_device_info_by_index(self, idx):
+        FakePyAudio.info_calls += 1
+        if not 0 <= idx < len(self.devices):
+            raise IOError("Invalid device index")
+        return dict(self.devices[idx])
+
+    def get_host_api_count(self):
+        return len(self.host_apis)
+
+    def get_host_api_info_by_index(self, idx):
+        return dict(self.host_apis[idx], defaultOutputDevice=self.num_inputs + len(self.devices) // 2 * idx)
+
+    def get_host_api_info_by_type(self, api_type):
+        return next(self.get_host_api_info_by_index(h["index"]) for h in self.host_apis if h["type"] == api_type)
+
+    def get_default_input_device_info(self):
+        return self.get_device_info_by_index(0)
+
+    def get_loopback_device_info_generator(self):
+        for idx in range(len(self.devices)):
+            info = self.get_device_info_by_index(idx)
+            if info["isLoopbackDevice"]:
+                yield info
+
+    def open(self, rate, channels, input_device_index, frames_per_buffer, **kwargs):
+        return FakeStream(rate, channels, frames_per_buffer, input_device_index in self.silent_devices, **kwargs)
+
+    def terminate(self):
+        pass
+
+
+def install_fake_backend(silent_devices=(), num_inputs=2, num_outputs=2):
+    """用模拟后端代替 pyaudiowpatch，必须在导入 audio_capture 之前调用"""
+    fake = types.ModuleType("pyaudiowpatch")
+    fake.PyAudio = FakePyAudio
+    for name in ("paInt16", "paFloat32", "paContinue", "paComplete", "paMME", "paWASAPI"):
+        setattr(fake, name, getattr(FakePyAudio, name))
+    FakePyAudio.silent_devices = set(silent_devices)
+    FakePyAudio.num_inputs = num_inputs
+    FakePyAudio.num_outputs = num_outputs
+    sys.modules["pyaudiowpatch"] = fake
+    return fake
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+#
+# Copyright (c)  2025  Xiaomi Corporation
+
+"""
+采集轨迹（capture trace）的紧凑二进制格式。
+
+录音时把每个设备读到的原始数据包连同采集时间戳写入轨迹文件，
+之后可以用 replay-capture-trace.py 在虚拟时间下把轨迹重新送入混音器。
+
+文件格式（小端）：
+    文件头:   MAGIC(8字节)
+    设备记录: type=1 (u8), device_idx (u16), native_rate (u32), channels (u16),
+              sample_format (u8), name_len (u16), name (utf-8)
+    数据包:   type=2 (u8), device_idx (u16), timestamp (f64, 未取整的time.time()),
+              nbytes (u32), data (设备读到的原始字节)
+"""
+
+import struct
+import threading
+
+MAGIC = b"TMSTRC01"
+
+RECORD_DEVICE = 1
+RECORD_PACKET = 2
+
+_DEVICE_HEADER = struct.Struct("<BHIHBH")
+_PACKET_HEADER = struct.Struct("<BHdI")
+
+
+class TraceDevice:
+    def __init__(self, device_idx, native_rate, channels, sample_format, name=""):
+        self.device_idx = device_idx
+        self.native_rate = native_rate
+        self.channels = channels
+        self.sample_format = sample_format
+        self.name = name
+
+
+class TraceWriter:
+    """线程安全的轨迹写入器，多个采集线程可以同时写入"""
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "wb", buffering=1024 * 1024)
+        self._lock = threading.Lock()
+        self._file.write(MAGIC)
+
+    def write_device(self, device_idx, native_rate, channels, sample_format, name=""):
+        name_bytes = name.encode("utf-8")
+        with self._lock:
+            self._file.write(_DEVICE_HEADER.pack(
+                RECORD_DEVICE, device_idx, native_rate, channels, sample_format, len(name_bytes)
+            ))
+            self._file.write(name_bytes)
+
+    def write_packet(self, device_idx, timestamp, data):
+        with self._lock:
+            self._file.write(_PACKET_HEADER.pack(RECORD_PACKET, device_idx, timestamp, len(data)))
+            self._file.write(data)
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+
+def read_trace(path):
+    """
+    读取轨迹文件
+
+    Returns:
+        (devices, packets): devices 为 {device_idx: TraceDevice}，
+        packets 为按文件顺序排列的 (device_idx, timestamp, data) 列表
+    """
+    devices = {}
+    packets = []
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} 不是有效的采集轨迹文件")
+
+        while True:
+            record_type = f.read(1)
+            if not record_type:
+                break
+
+            if record_type[0] == RECORD_DEVICE:
+                header = record_type + f.read(_DEVICE_HEADER.size - 1)
+                if len(header) < _DEVICE_HEADER.size:
+                    break  # 录制被中断，忽略不完整的记录
+                _, device_idx, native_rate, channels, sample_format, name_len = _DEVICE_HEADER.unpack(header)
+                name = f.read(name_len).decode("utf-8", errors="replace")
+                devices[device_idx] = TraceDevice(device_idx, native_rate, channels, sample_format, name)
+            elif record_type[0] == RECORD_PACKET:
+                header = record_type + f.read(_PACKET_HEADER.size - 1)
+                if len(header) < _PACKET_HEADER.size:
+                    break
+                _, device_idx, timestamp, nbytes = _PACKET_HEADER.unpack(header)
+                data = f.read(nbytes)
+                if len(data) < nbytes:
+                    break
+                packets.append((device_idx, timestamp, data))
+            else:
+                raise ValueError(f"{path} 中存在未知的记录类型: {record_type[0]}")
+
+    return devices, packets
@@ -5,48 +5,48 @@
 """
 Common utilities for audio recording and device management.
 Shared by simulate-streaming.py and simulate-streaming-sense-voice-microphone.py
+
+The capture code itself lives in audio_capture.py so that the recording
+child process does not import sherpa_onnx or tkinter.
 """
 
 import sys
 import threading
 import time
-import queue
 from pathlib import Path
 import os
-import tkinter as tk
-import wave
 
 try:
     import pyaudiowpatch as pyaudio
     import sherpa_onnx
-    from scipy import signal
     import numpy as np
 except ImportError:
     print("正在安装需要的python包:\n", file=sys.stderr)
-    print("尝试执行：  pip install PyAudioWPatch sherpa_onnx==1.12.19 scipy\n", file=sys.stderr)
-    ret = os.system(f"{sys.executable} -m pip install PyAudioWPatch sherpa_onnx==1.12.19 scipy")
+    print("尝试执行：  pip install PyAudioWPatch sherpa_onnx==1.12.19\n", file=sys.stderr)
+    ret = os.system(f"{sys.executable} -m pip install PyAudioWPatch sherpa_onnx==1.12.19")
     if ret == 0:
         import pyaudiowpatch as pyaudio
         import sherpa_onnx
-        from scipy import signal
         import numpy as np
     else:
         print("安装python包失败!!", file=sys.stderr)
         sys.exit(-1)
 
-DEBUG = False
+# 采集相关的函数位于轻量的 audio_capture 模块中，这里重新导出以保持兼容
+from audio_mixer import sample_rate
+from audio_capture import start_recording, get_audio_devices, cleanup_recording_process
+from device_profiles import DeviceProfiles, describe_device, resolve_devices
+from keyword_alert import ALERT_PREFIX
+from translation import format_translation
 
 # Global variables
 killed = False
 recording_process = None
-sample_rate = 16000  # Please don't change it
 audio_stream = None
 p = None
 samples_queue = None
 stop_event = None
 
-samples_time = 0.05 # 0.05s
-
 def assert_file_exists(filename: str):
     """Assert that a file exists, with helpful error message."""
     assert Path(filename).is_file(), (
@@ -56,284 +56,132 @@ def assert_file_exists(filename: str):
     )
 
 
-def start_recording(device_indices, output_queue, stop_event, mix_mode="average", debug_save_audio=""):
-    """
-    支持多设备录音，使用设备原生采样率，然后重采样到目标采样率并混音
-    使用基于时间戳的队列同步机制
-    在独立进程中运行，通过output_queue发送音频数据，通过stop_event接收停止信号
-
-    Args:
-        device_indices: 设备索引列表
-        output_queue: 输出队列
-        stop_event: 停止事件
-        mix_mode: 混音模式，"average"=平均混音，"add"=加法混音
-        debug_save_audio: 调试模式，保存混音后的音频到指定的WAV文件路径
-    """
-    if not device_indices:
-        print("没有选择任何设备！", file=sys.stderr)
-        return
-
-    p = pyaudio.PyAudio()
-
-    # 调试模式：创建WAV文件用于保存混音结果
-    debug_wav_file = None
-    if debug_save_audio:
-        try:
-            debug_wav_file = wave.open(debug_save_audio, 'wb')
-            debug_wav_file.setnchannels(1)  # 单声道
-            debug_wav_file.setsampwidth(2)  # 16位
-            debug_wav_file.setframerate(sample_rate)
-            print(f"调试模式：混音音频将保存到 {debug_save_audio}", file=sys.stderr)
-        except Exception as e:
-            print(f"无法创建调试音频文件 {debug_save_audio}: {e}", file=sys.stderr)
-            debug_wav_file = None
-
-    # 为每个设备创建队列和流
-    device_queues = {}  # 存储每个设备的数据队列
-    device_streams = {}
-    device_threads = {}
-    device_info_map = {}
-
-    def round_timestamp(ts):
-        """将时间戳四舍五入到最近的samples_time"""
-        return round(ts / samples_time) * samples_time
-
-    def device_capture_thread(device_idx, native_rate, channels):
-        """每个设备的采集线程 - 带时间戳放入队列"""
-        samples_per_read = int(samples_time * native_rate)
-
-        try:
-            while not stop_event.is_set():
-                # 读取音频数据
-                data = device_streams[device_idx].read(samples_per_read, exception_on_overflow=False)
-
-                # 获取当前时间戳并四舍五入到最近的samples_time
-                timestamp = round_timestamp(time.time())
-
-                # 转换为numpy数组
-                samples = np.frombuffer(data, dtype=np.float32)
-
-                # 如果是多声道，转换为单声道
-                if channels > 1:
-                    samples = samples.reshape(-1, channels)
-                    samples = np.mean(samples, axis=1)
-
-                samples = np.copy(samples)
-
-                # 放入队列，带时间戳
-                try:
-                    device_queues[device_idx].put((timestamp, samples, native_rate), block=False)
-                except queue.Full:
-                    # 队列满了，丢弃最旧的数据
-                    try:
-                        device_queues[device_idx].get_nowait()
-                        device_queues[device_idx].put((timestamp, samples, native_rate), block=False)
-                    except:
-                        pass
-
-        except Exception as e:
-            if not stop_event.is_set():
-                print(f"设备 {device_idx} 采集出错: {e}", file=sys.stderr)
-
-    # 为每个设备创建流和线程
-    try:
-        for device_idx in device_indices:
-            device_info = p.get_device_info_by_index(device_idx)
-            device_info_map[device_idx] = device_info
-
-            native_rate = int(device_info['defaultSampleRate'])
-            channels = device_info['maxInputChannels']
-            if channels == 0:  # loopback设备
-                channels = device_info['maxOutputChannels']
-
-            samples_per_read = int(samples_time * native_rate)
-
-            # 创建音频流
-            stream = p.open(
-                format=pyaudio.paFloat32,
-                channels=channels,
-                rate=native_rate,
-                input=True,
-                input_device_index=device_idx,
-                frames_per_buffer=samples_per_read
-            )
-
-            device_streams[device_idx] = stream
-            # 创建队列，最多保存10个数据包
-            device_queues[device_idx] = queue.Queue(maxsize=10)
-
-            # 启动采集线程
-            thread = threading.Thread(
-                target=device_capture_thread,
-                args=(device_idx, native_rate, channels)
-            )
-            thread.start()
-            device_threads[device_idx] = thread
-
-            print(f"设备 {device_idx} ({device_info['name']}) 已启动，采样率: {native_rate} Hz", file=sys.stderr)
-
-        # 混音线程：基于时间戳同步处理
-        last_processed_timestamp = -1  # 已处理的最新时间戳
-        device_pending_data = {}  # 每个设备已获取但未处理的数据槽位
-        PROCESSING_DELAY = 3 * samples_time  # 处理延迟：3倍samples_time
-
-        while not stop_event.is_set():
-            current_time = time.time()
-
-            # Phase 1: 从队列中获取数据到pending槽位
-            for device_idx in device_indices:
-                # 如果该设备还没有pending数据，尝试从队列获取
-                if device_idx not in device_pending_data:
-                    try:
-                        packet = device_queues[device_idx].get_nowait()
-                        device_pending_data[device_idx] = packet
-                    except queue.Empty:
-                        pass  # 该设备暂时没有新数据
-
-            # Phase 2: 检查pending数据是否可以处理
-            # 找到所有设备中最早的时间戳
-            pending_timestamps = []
-            for device_idx in device_indices:
-                if device_idx in device_pending_data:
-                    timestamp, _, _ = device_pending_data[device_idx]
-                    pending_timestamps.append(timestamp)
-
-            if not pending_timestamps:
-                # 没有任何pending数据，短暂休眠后继续
-                time.sleep(0.01)
-                continue
-
-            # 使用最早的时间戳作为目标处理时间戳
-            target_timestamp = min(pending_timestamps)
-
-            # 检查是否应该丢弃（时间戳过旧）
-            if target_timestamp <= last_processed_timestamp:
-                # 丢弃所有该时间戳的数据
-                for device_idx in list(device_pending_data.keys()):
-                    timestamp, _, _ = device_pending_data[device_idx]
-                    if timestamp == target_timestamp:
-                        del device_pending_data[device_idx]
-                        msg = f"丢弃过旧数据包: 设备 {device_idx}, 时间戳 {timestamp:.3f}"
-                        if DEBUG:
-                            print(msg, file=sys.stderr)
-                continue
-
-            # 检查是否已经足够旧（达到处理延迟）
-            age = current_time - target_timestamp
-            if age < PROCESSING_DELAY:
-                # 还不够旧，等待
-                wait_time = PROCESSING_DELAY - age
-                time.sleep(min(wait_time, 0.01))  # 最多等待10ms
-                continue
-
-            # Phase 3: 处理该时间戳的数据
-            # 收集所有该时间戳的设备数据
-            device_data_ready = {}
-            for device_idx in device_indices:
-                if device_idx in device_pending_data:
-                    timestamp, samples, native_rate = device_pending_data[device_idx]
-                    if timestamp == target_timestamp:
-                        device_data_ready[device_idx] = (samples, native_rate)
-                        # 从pending中移除
-                        del device_pending_data[device_idx]
-
-            # 检查是否所有设备都有该时间戳的数据
-            if len(device_data_ready) < len(device_indices):
-                msg = f"时间戳 {target_timestamp:.3f}: {len(device_data_ready)}/{len(device_indices)} 设备就绪"
-                if DEBUG:
-                    print(msg, file=sys.stderr)
-
-            if not device_data_ready:
-                continue  # 没有数据可处理
-
-            # Phase 4: 重采样和混音
-            resampled_samples = []
-            for device_idx in device_indices:
-                if device_idx not in device_data_ready:
-                    continue  # 跳过没有数据的设备
-
-                samples, native_rate = device_data_ready[device_idx]
-
-                # 重采样到目标采样率
-                if native_rate != sample_rate:
-                    num_samples = int(len(samples) * sample_rate / native_rate)
-                    resampled = signal.resample(samples, num_samples)
-                else:
-                    resampled = samples
-
-                resampled_samples.append(resampled)
-
-            # 混音：根据mix_mode选择混音算法
-            if resampled_samples:
-                if len(resampled_samples) == 1:
-                    mixed = resampled_samples[0]
-                else:
-                    # 找到最短的长度，避免长度不匹配
-                    max_length = max(len(s) for s in resampled_samples)
-                    min_length = min(len(s) for s in resampled_samples)
-                    if max_length != min_length:
-                        print(f"长度不匹配：{min_length} - {max_length}", file=sys.stderr)
-                    trimmed_samples = [s[:min_length] for s in resampled_samples]
-
-                    # 根据混音模式选择算法
-                    if mix_mode == "add":
-                        mixed = np.sum(trimmed_samples, axis=0)
-                    else:  # average
-                        mixed = np.mean(trimmed_samples, axis=0)
-
-                # 调试模式：保存混音结果到WAV文件
-                if debug_wav_file:
-                    try:
-                        # 将float32转换为int16
-                        audio_int16 = np.int16(mixed * 32767)
-                        debug_wav_file.writeframes(audio_int16.tobytes())
-                    except Exception as e:
-                        print(f"写入调试音频文件出错: {e}", file=sys.stderr)
-
-                output_queue.put(mixed)
-
-                # 更新已处理的时间戳
-                last_processed_timestamp = target_timestamp
-
-    finally:
-        # 清理资源
-        for stream in device_streams.values():
-            if stream:
-                stream.stop_stream()
-                stream.close()
-
-        for thread in device_threads.values():
-            if thread and thread.is_alive():
-                thread.join(timeout=2.0)
-
-        if p:
-            p.terminate()
-
-        # 关闭调试音频文件
-        if debug_wav_file:
-            try:
-                debug_wav_file.close()
-                print(f"调试音频已保存到 {debug_save_audio}", file=sys.stderr)
-            except Exception as e:
-                print(f"关闭调试音频文件出错: {e}", file=sys.stderr)
-
-
 class MyPrinter:
     """Simple printer that avoids duplicate output."""
-    def __init__(self):
+    def __init__(self, history=None, source="", alerter=None, translator=None, gate=None):
+        """
+        Args:
+            history: 可选的 TranscriptHistory，句子结束时把最终结果写入历史记录
+            source: 写入历史记录的来源设备
+            alerter: 可选的 KeywordAlerter，临时结果中出现关键词时输出提醒
+            translator: 可选的 Translator，句子结束时提交翻译，译文由其后台线程通过 print_control 输出
+            gate: 可选的 WakeGate，识别结果有变化时推迟回到唤醒词检测
+        """
         self.prev_result = ""
+        self.sentence = ""
+        self.history = history
+        self.source = source
+        self.alerter = alerter
+        self.translator = translator
+        self.gate = gate
+        # 译文在翻译线程中输出，与识别结果的输出互斥，避免两行交错
+        self.lock = threading.Lock()
+
+    def print_control(self, line):
+        """输出一行控制消息（以 \\x1e 开头，见 keyword_alert.py）"""
+        with self.lock:
+            print(line, end='\n', flush=True)
+
+    def print_translation(self, text, translated):
+        """Translator 的输出回调"""
+        self.print_control(format_translation(text, translated))
 
     def do_print(self, result):
+        if result:
+            self.sentence = result
         if result and self.prev_result != result:
             self.prev_result = result
-            print(result, end='\n', flush=True)
+            with self.lock:
+                print(result, end='\n', flush=True)
+            if self.gate:
+                self.gate.notify_activity()
+            if self.alerter:
+                for keyword in self.alerter.feed(result):
+                    self.print_control(ALERT_PREFIX + keyword)
+
+    def on_endpoint(self, start=None, end=None):
+        """
+        Args:
+            start: 句子开始的采集时间戳，写入历史记录
+            end: 句子结束的采集时间戳
+        """
+        with self.lock:
+            print("\n", end="", flush=True)
+        if self.translator and self.sentence:
+            self.translator.submit(self.sentence)
+        if self.history and self.sentence:
+            now = time.time()
+            self.history.append(start or now, end or now, self.sentence, self.source)
+        self.sentence = ""
+        if self.alerter:
+            self.alerter.reset()
+
+
+def choose_input_devices(p_audio, args):
+    """
+    确定要采集的设备序号
+
+    优先使用命令行 --device 指定的设备（负数与旧版本相同，表示不指定设备）；否则按名称解析保存的设备配置 --profile；
+    配置不存在或其中的设备找不到时，列出所有设备并弹出选择框，选择结果保存到该配置中。
+    取消选择时本次使用默认输入设备，不保存配置，下次启动仍会弹出选择框。
+
+    Args:
+        p_audio: PyAudio 实例
+        args: 命令行参数，需要包含 device、profile、device_profiles、save_profile
+
+    Returns:
+        list: 设备序号列表；没有任何输入设备时为空列表
+    """
+    start = time.perf_counter()
+    profiles = DeviceProfiles(args.device_profiles)
+
+    explicit_devices = [idx for idx in args.device or [] if idx >= 0]
+    if explicit_devices:
+        selected_device_indices = explicit_devices
+        if args.save_profile:
+            profiles.store(args.profile, [describe_device(p_audio, idx) for idx in selected_device_indices])
+            print(f"已保存设备配置 {args.profile}", file=sys.stderr)
+        return selected_device_indices
+
+    descriptors = profiles.get(args.profile)
+    if descriptors:
+        hints = [d.get("index") for d in descriptors]
+        selected_device_indices = resolve_devices(p_audio, descriptors)
+        if selected_device_indices:
+            if selected_device_indices != hints:
+                profiles.store(args.profile, descriptors)  # 更新变化了的设备序号
+            print(f"使用设备配置 {args.profile}，解析耗时 {(time.perf_counter() - start) * 1000:.1f} ms",
+                  file=sys.stderr)
+            return selected_device_indices
+        print(f"设备配置 {args.profile} 中有设备未找到，请重新选择", file=sys.stderr)
+
+    # 获取所有设备信息
+    devices = get_audio_devices(p_audio)
+    if not devices:
+        return []
+
+    print("可用设备:", file=sys.stderr)
+    for idx, device in devices:
+        print(f"  {idx}: {device['name']} (输入通道: {device['maxInputChannels']}, 输出通道: {device['maxOutputChannels']})", file=sys.stderr)
+
+    # 弹出选择框
+    selected_device_indices = select_input_device(devices, p_audio)
+    if not selected_device_indices:
+        # 如果没有选择设备，使用默认输入设备，但不保存到配置
+        default_info = p_audio.get_default_input_device_info()
+        print("未选择设备，使用默认输入设备", file=sys.stderr)
+        return [default_info['index']]
 
-    def on_endpoint(self):
-        print("\n", end="", flush=True)
+    profiles.store(args.profile, [describe_device(p_audio, idx) for idx in selected_device_indices])
+    print(f"设备选择已保存到配置 {args.profile}，下次启动将直接使用", file=sys.stderr)
+    return selected_device_indices
 
 
 def select_input_device(devices, p_audio):
     """弹出tkinter窗口让用户选择输入设备或loopback设备（支持多选）"""
+    # tkinter 只在需要弹出选择框时才导入
+    import tkinter as tk
+
     # 过滤有输入通道的设备（普通输入设备）
     input_devices = [(i, d) for i, d in devices if d['maxInputChannels'] > 0 and not d.get('isLoopbackDevice', False)]
 
@@ -492,51 +340,3 @@ def select_input_device(devices, p_audio):
     root.mainloop()
 
     return selected_devices[0] if selected_devices[0] else []
-
-
-def get_audio_devices(p_audio):
-    """
-    获取所有音频设备信息（仅MME主机API）
-
-    Returns:
-        list: 设备信息列表，每个元素为 (index, device_info) 元组
-    """
-    device_count = p_audio.get_device_count()
-
-    if device_count == 0:
-        return []
-
-    # 设备太多，仅显示一部分
-    host_api = 0
-    for i in range(p_audio.get_host_api_count()):
-        host_api_info = p_audio.get_host_api_info_by_index(i)
-        if "MME" in host_api_info['name']:
-            host_api = i
-
-    # 获取所有设备信息
-    devices = []
-    for i in range(device_count):
-        device_info = p_audio.get_device_info_by_index(i)
-        if device_info['hostApi'] == host_api:
-            devices.append((i, device_info))
-
-    return devices
-
-
-def cleanup_recording_process(stop_event, recording_process):
-    """
-    清理录音进程的辅助函数
-
-    Args:
-        stop_event: multiprocessing.Event 停止事件
-        recording_process: multiprocessing.Process 录音进程
-    """
-    # 通知录音子进程停止
-    if stop_event:
-        stop_event.set()
-    # 等待录音子进程结束
-    if recording_process and recording_process.is_alive():
-        recording_process.join(timeout=3.0)
-        if recording_process.is_alive():
-            recording_process.terminate()
-            recording_process.join()
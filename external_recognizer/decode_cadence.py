@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+#
+# Copyright (c)  2025  Xiaomi Corporation
+
+"""
+流式识别循环的解码节奏控制。
+
+每收到一个音频块就执行 is_ready/decode_stream、is_endpoint、get_result 的开销较大。
+这里累积 N 个音频块后才解码一次；adaptive 模式根据解码耗时占音频时长的比例（实时率）
+和队列积压自动调整 N：CPU紧张时降低解码频率，空闲时恢复到每块都解码。
+"""
+
+
+class DecodeCadence:
+    def __init__(self, decode_every=1, adaptive=False, max_decode_every=8,
+                 high_load=0.5, low_load=0.2, window=20):
+        """
+        Args:
+            decode_every: 每累积多少个音频块解码一次（adaptive 模式下为初始值和下限）
+            adaptive: 是否根据CPU压力自动调整
+            max_decode_every: adaptive 模式下的上限
+            high_load: 实时率超过该值或队列出现积压时降低解码频率
+            low_load: 实时率低于该值且没有积压时提高解码频率
+            window: 每统计多少次解码调整一次
+        """
+        self.min_decode_every = max(1, decode_every)
+        self.decode_every = self.min_decode_every
+        self.adaptive = adaptive
+        self.max_decode_every = max(max_decode_every, self.min_decode_every)
+        self.high_load = high_load
+        self.low_load = low_load
+        self.window = window
+
+        self.pending_chunks = 0
+        self.decode_seconds = 0.0
+        self.audio_seconds = 0.0
+        self.max_backlog = 0
+        self.decodes = 0
+
+    def add_chunk(self):
+        """收到一个音频块，返回是否应该在这一轮解码"""
+        self.pending_chunks += 1
+        return self.pending_chunks >= self.decode_every
+
+    def on_decoded(self, decode_seconds, audio_seconds, backlog=0):
+        """
+        一轮解码完成后调用
+
+        Args:
+            decode_seconds: 本轮解码耗时
+            audio_seconds: 本轮解码覆盖的音频时长
+            backlog: 当前输入队列中尚未处理的音频块数
+        """
+        self.pending_chunks = 0
+        if not self.adaptive:
+            return
+
+        self.decode_seconds += decode_seconds
+        self.audio_seconds += audio_seconds
+        self.max_backlog = max(self.max_backlog, backlog)
+        self.decodes += 1
+        if self.decodes < self.window:
+            return
+
+        load = self.decode_seconds / self.audio_seconds if self.audio_seconds > 0 else 0.0
+        if (load > self.high_load or self.max_backlog > 1) and self.decode_every < self.max_decode_every:
+            self.decode_every += 1
+        elif load < self.low_load and self.max_backlog == 0 and self.decode_every > self.min_decode_every:
+            self.decode_every -= 1
+
+        self.decode_seconds = 0.0
+        self.audio_seconds = 0.0
+        self.max_backlog = 0
+        self.decodes = 0
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+#
+# Copyright (c)  2025  Xiaomi Corporation
+
+"""
+保存的输入设备配置（device profile）。
+
+按设备名称、主机API和是否为loopback设备记录选择的设备，而不是记录设备序号：
+设备插拔或系统更新后序号会变化，名称不会。每个设备同时记录上次解析到的序号，
+启动时先按该序号直接验证，只有不匹配时才遍历一次所有设备；都找不到时返回 None，
+由调用方弹出设备选择框。
+"""
+
+import json
+import os
+import sys
+
+script_dir = os.path.dirname(os.path.realpath(__file__))
+default_profiles_path = os.path.join(script_dir, "device_profiles.json")
+
+
+def describe_device(p_audio, device_idx, host_api_names=None):
+    """设备的稳定描述：名称、主机API名称、是否为loopback设备，以及当前序号"""
+    info = p_audio.get_device_info_by_index(device_idx)
+    return {
+        "name": info["name"],
+        "host_api": host_api_name(p_audio, info["hostApi"], host_api_names),
+        "loopback": bool(info.get("isLoopbackDevice", False)),
+        "index": device_idx,
+    }
+
+
+def host_api_name(p_audio, host_api, cache=None):
+    if cache is not None and host_api in cache:
+        return cache[host_api]
+    name = p_audio.get_host_api_info_by_index(host_api)["name"]
+    if cache is not None:
+        cache[host_api] = name
+    return name
+
+
+def matches(p_audio, info, descriptor, host_api_names):
+    return (info["name"] == descriptor["name"]
+            and bool(info.get("isLoopbackDevice", False)) == descriptor["loopback"]
+            and host_api_name(p_audio, info["hostApi"], host_api_names) == descriptor["host_api"])
+
+
+def resolve_devices(p_audio, descriptors):
+    """
+    把设备描述解析为当前的设备序号
+
+    Returns:
+        list: 设备序号列表（会更新描述中的 index）；有任何一个设备找不到时返回 None
+    """
+    host_api_names = {}
+    device_count = p_audio.get_device_count()
+    indices = []
+    unresolved = []  # 序号不匹配的设备在 descriptors 中的位置
+    for pos, descriptor in enumerate(descriptors):
+        hint = descriptor.get("index", -1)
+        if 0 <= hint < device_count and matches(p_audio, p_audio.get_device_info_by_index(hint), descriptor,
+                                                host_api_names):
+            indices.append(hint)
+        else:
+            indices.append(None)
+            unresolved.append(pos)
+
+    if unresolved:
+        # 序号已变化，遍历一次所有设备按名称查找
+        taken = {idx for idx in indices if idx is not None}
+        for idx in range(device_count):
+            if not unresolved:
+                break
+            if idx in taken:
+                continue
+            info = p_audio.get_device_info_by_index(idx)
+            for pos in unresolved:
+                if matches(p_audio, info, descriptors[pos], host_api_names):
+                    descriptors[pos]["index"] = idx
+                    indices[pos] = idx
+                    unresolved.remove(pos)
+                    break
+
+    if unresolved:
+        return None
+    return indices
+
+
+class DeviceProfiles:
+    """磁盘上的设备配置（JSON），{配置名称: [设备描述]}"""
+    def __init__(self, path=default_profiles_path):
+        self.path = path
+        self.profiles = {}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self.profiles = json.load(f)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"无法读取设备配置 {path}: {e}", file=sys.stderr)
+
+    def get(self, name):
+        return self.profiles.get(name)
+
+    def store(self, name, descriptors):
+        self.profiles[name] = descriptors
+        try:
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.profiles, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"无法保存设备配置 {self.path}: {e}", file=sys.stderr)
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+#
+# Copyright (c)  2025  Xiaomi Corporation
+
+"""
+关键词提醒：把关键词列表编译为 Aho–Corasick 自动机，在临时结果中增量查找。
+
+临时结果每次更新通常只是在末尾追加或改写几个字，KeywordAlerter 记录上一次结果中
+每个位置的自动机状态，只从与上一次结果的公共前缀之后开始扫描；
+每个关键词在一句话中只提醒一次。
+
+提醒通过标准输出发送给 CommandRecognizer，格式为以 \\x1e 开头的一行：
+
+    \\x1ekeyword\\t<关键词>\\n
+
+这一行不是识别结果，不影响临时结果和句子的换行约定。
+"""
+
+from collections import deque
+
+ALERT_PREFIX = "\x1ekeyword\t"
+
+
+def load_keywords(path):
+    """读取关键词文件：每行一个，或用逗号分隔（与设置中的敏感词格式相同）"""
+    with open(path, "r", encoding="utf-8") as f:
+        content = f.read()
+    keywords = []
+    for line in content.splitlines():
+        for term in line.replace("，", ",").split(","):
+            term = term.strip()
+            if term:
+                keywords.append(term)
+    return keywords
+
+
+class AhoCorasick:
+    """多模式串匹配自动机，状态 0 为根"""
+    def __init__(self, terms):
+        self.terms = list(dict.fromkeys(terms))
+        self.goto = [{}]
+        self.fail = [0]
+        self.outputs = [()]
+
+        for term_id, term in enumerate(self.terms):
+            state = 0
+            for ch in term:
+                next_state = self.goto[state].get(ch)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][ch] = next_state
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.outputs.append(())
+                state = next_state
+            self.outputs[state] += (term_id,)
+
+        # 按层次遍历计算失败指针，并把失败链上的输出合并到每个状态
+        pending = deque(self.goto[0].values())
+        while pending:
+            state = pending.popleft()
+            for ch, next_state in self.goto[state].items():
+                pending.append(next_state)
+                fallback = self.fail[state]
+                while fallback and ch not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(ch, 0)
+                self.fail[next_state] = target if target != next_state else 0
+                self.outputs[next_state] += self.outputs[self.fail[next_state]]
+
+    def step(self, state, ch):
+        goto = self.goto
+        while True:
+            next_state = goto[state].get(ch)
+            if next_state is not None:
+                return next_state
+            if state == 0:
+                return 0
+            state = self.fail[state]
+
+
+class KeywordAlerter:
+    """对同一句话的临时结果增量查找关键词"""
+    def __init__(self, terms):
+        """
+        Args:
+            terms: 关键词列表，英文不区分大小写
+        """
+        self.automaton = AhoCorasick([term.casefold() for term in terms])
+        self.original = {}
+        for term in terms:
+            self.original.setdefault(term.casefold(), term)
+        self.reset()
+
+    def reset(self):
+        """开始新的句子"""
+        self.text = ""
+        self.states = [0]  # states[i] 是扫描 text[:i] 之后的状态
+        self.reported = set()
+
+    def common_prefix(self, text):
+        old = self.text
+        if text.startswith(old):
+            return len(old)
+        # 二分查找公共前缀的长度，切片比较在C中进行
+        low, high = 0, min(len(old), len(text))
+        while low < high:
+            mid = (low + high + 1) // 2
+            if old[:mid] == text[:mid]:
+                low = mid
+            else:
+                high = mid - 1
+        return low
+
+    def feed(self, text):
+        """
+        送入当前的临时结果
+
+        Returns:
+            list: 本句中第一次出现的关键词
+        """
+        text = text.casefold()
+        keep = self.common_prefix(text)
+        del self.states[keep + 1:]
+        state = self.states[keep]
+
+        hits = []
+        automaton = self.automaton
+        outputs = automaton.outputs
+        for ch in text[keep:]:
+            state = automaton.step(state, ch)
+            self.states.append(state)
+            for term_id in outputs[state]:
+                if term_id not in self.reported:
+                    self.reported.add(term_id)
+                    hits.append(self.original[automaton.terms[term_id]])
+        self.text = text
+        return hits
@@ -0,0 +1,431 @@
+#!/usr/bin/env python3
+#
+# Copyright (c)  2025  Xiaomi Corporation
+
+"""
+模型的下载、校验和缓存。
+
+  - 从可配置的镜像下载：服务器支持 Range 时把文件分块，用多个连接并行下载，
+    已完成的分块和服务器返回的 ETag / Last-Modified 记录在 .part.json 中，中断后再次启动只下载剩余的分块；
+    续传的请求带 If-Range，服务器上的文件已更改时丢弃已下载的分块，下次重新下载；
+    不支持 Range 时退回单连接顺序下载
+  - 校验sha256：使用目录中固定的值、refs 中记录的首次下载的值，或镜像上的 <文件>.sha256；
+    都没有时记录首次下载的值并给出提示，之后重新下载（例如 objects 被删除）必须与其一致
+  - .tar.bz2 以流的方式边读边解压（tarfile 的 "r|bz2" 模式），同时计算sha256，
+    不生成解压后的 .tar 临时文件；顺序下载时直接从HTTP响应解压，压缩包不落盘
+  - 校验通过的模型按压缩包的sha256存放在内容寻址的目录 objects/<sha256>/ 中，
+    refs/<模型名>.json 记录模型名对应的sha256；再次启动时只检查文件是否存在，不联网、不重新计算哈希
+
+目录结构：
+
+    <store>/objects/<sha256>/...        解压后的模型文件
+    <store>/refs/<模型名>.json           {"url", "sha256"}
+    <store>/downloads/<文件名>.part      下载中的文件，.part.json 为已完成的分块和 ETag / Last-Modified
+"""
+
+import hashlib
+import http.client
+import json
+import os
+import shutil
+import sys
+import tarfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+script_dir = os.path.dirname(os.path.realpath(__file__))
+default_store_path = os.path.join(script_dir, "model-store")
+default_mirror = "https://github.com/k2-fsa/sherpa-onnx/releases/download/asr-models"
+
+USER_AGENT = "TMSpeech-model-manager"
+READ_SIZE = 256 * 1024
+
+
+class ModelDownloadError(RuntimeError):
+    pass
+
+
+class ModelSpec:
+    """
+    一个可下载的模型
+
+    Args:
+        name: 模型名，也是 refs 中的文件名
+        filename: 镜像上的文件名，以 .tar.bz2 结尾的会被解压
+        files: 模型文件的用途 -> 解压后的相对路径
+        sha256: 可选，压缩包（或单个文件）的sha256
+    """
+    def __init__(self, name, filename, files, sha256=None):
+        self.name = name
+        self.filename = filename
+        self.files = files
+        self.sha256 = sha256
+
+    @property
+    def is_archive(self):
+        return self.filename.endswith(".tar.bz2")
+
+
+# 上游发布页没有提供校验和，这里的 sha256 需要在下载并核对后填入；在此之前使用 refs 中首次下载记录的值，
+# 镜像提供 .sha256 文件时使用镜像的值
+MODELS = {spec.name: spec for spec in [
+    ModelSpec("silero-vad", "silero_vad.onnx", {"model": "silero_vad.onnx"}),
+    ModelSpec("sense-voice-int8-2025-09-09", "sherpa-onnx-sense-voice-zh-en-ja-ko-yue-int8-2025-09-09.tar.bz2", {
+        "model": "sherpa-onnx-sense-voice-zh-en-ja-ko-yue-int8-2025-09-09/model.int8.onnx",
+        "tokens": "sherpa-onnx-sense-voice-zh-en-ja-ko-yue-int8-2025-09-09/tokens.txt",
+    }),
+    ModelSpec("zipformer-bilingual-zh-en-2023-02-20",
+              "sherpa-onnx-streaming-zipformer-bilingual-zh-en-2023-02-20.tar.bz2", {
+        "encoder": "sherpa-onnx-streaming-zipformer-bilingual-zh-en-2023-02-20/encoder-epoch-99-avg-1.onnx",
+        "decoder": "sherpa-onnx-streaming-zipformer-bilingual-zh-en-2023-02-20/decoder-epoch-99-avg-1.onnx",
+        "joiner": "sherpa-onnx-streaming-zipformer-bilingual-zh-en-2023-02-20/joiner-epoch-99-avg-1.onnx",
+        "tokens": "sherpa-onnx-streaming-zipformer-bilingual-zh-en-2023-02-20/tokens.txt",
+    }),
+]}
+
+
+class HashingReader:
+    """读取时计算sha256的文件包装，供 tarfile 流式解压时同时校验"""
+    def __init__(self, f):
+        self.f = f
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def read(self, size=-1):
+        data = self.f.read(size)
+        self.sha256.update(data)
+        self.size += len(data)
+        return data
+
+    def drain(self):
+        """读完剩余的数据（tar 结尾的填充块），使哈希覆盖整个文件"""
+        while self.read(READ_SIZE):
+            pass
+
+
+def extract_tar_stream(reader, target_dir):
+    """按顺序读取并解压 tar.bz2，不需要随机访问，也不生成临时的 .tar 文件"""
+    with tarfile.open(fileobj=reader, mode="r|bz2") as tar:
+        if hasattr(tarfile, "data_filter"):
+            # 拒绝绝对路径、.. 和指向目录外的链接
+            tar.extractall(target_dir, filter="data")
+        else:
+            tar.extractall(target_dir)
+    reader.drain()
+
+
+def write_json(path, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def read_json(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class DownloadProgress:
+    """多个下载线程共用的进度，每秒最多输出一次"""
+    def __init__(self, label, total, done=0):
+        self.label = label
+        self.total = total
+        self.done = done
+        self.resumed = done
+        self.start = time.perf_counter()
+        self.last_print = 0.0
+        self.lock = threading.Lock()
+
+    def add(self, n):
+        with self.lock:
+            self.done += n
+
+    def report(self, final=False):
+        now = time.perf_counter()
+        if not final and now - self.last_print < 1:
+            return
+        self.last_print = now
+        speed = (self.done - self.resumed) / max(now - self.start, 1e-9) / 1024 / 1024
+        percent = f"{self.done * 100 / self.total:.0f}%" if self.total else f"{self.done / 1024 / 1024:.1f} MB"
+        print(f"下载 {self.label}: {percent}，{speed:.1f} MB/s", file=sys.stderr)
+
+
+class ModelStore:
+    """
+    内容寻址的模型缓存
+
+    Args:
+        root: 缓存目录
+        mirror: 镜像地址，模型的下载地址为 <mirror>/<filename>
+        connections: 并行下载的连接数
+        chunk_size: 分块大小（字节），中断后以分块为单位续传
+        retries: 每个分块的重试次数
+        timeout: 每个请求的超时（秒）
+    """
+    def __init__(self, root=default_store_path, mirror=default_mirror, connections=4, chunk_size=4 * 1024 * 1024,
+                 retries=3, timeout=30):
+        self.root = root
+        self.mirror = mirror.rstrip("/")
+        self.connections = connections
+        self.chunk_size = chunk_size
+        self.retries = retries
+        self.timeout = timeout
+
+    def url(self, spec):
+        return f"{self.mirror}/{spec.filename}"
+
+    def object_dir(self, sha256):
+        return os.path.join(self.root, "objects", sha256)
+
+    def ref_path(self, spec):
+        return os.path.join(self.root, "refs", spec.name + ".json")
+
+    def lookup(self, spec):
+        """
+        已缓存时返回模型文件的路径（用途 -> 绝对路径），否则返回 None；不联网，不计算哈希
+        """
+        sha256 = spec.sha256
+        if not sha256:
+            ref = read_json(self.ref_path(spec))
+            sha256 = ref and ref.get("sha256")
+        if not sha256:
+            return None
+        directory = self.object_dir(sha256)
+        paths = {key: os.path.join(directory, *relative.split("/")) for key, relative in spec.files.items()}
+        if all(os.path.isfile(path) for path in paths.values()):
+            return paths
+        return None
+
+    def ensure(self, spec):
+        """返回模型文件的路径，没有缓存时下载、校验并解压"""
+        paths = self.lookup(spec)
+        if paths:
+            return paths
+        self.fetch(spec)
+        paths = self.lookup(spec)
+        if not paths:
+            raise ModelDownloadError(f"{spec.filename} 中没有需要的文件: {list(spec.files.values())}")
+        return paths
+
+    def fetch(self, spec):
+        """下载、校验并放入缓存，返回sha256"""
+        url = self.url(spec)
+        ref = read_json(self.ref_path(spec))
+        pinned = ref.get("sha256") if ref and ref.get("url") == url else None
+        expected = spec.sha256 or pinned or self._mirror_checksum(url)
+        for name in ("objects", "refs", "downloads"):
+            os.makedirs(os.path.join(self.root, name), exist_ok=True)
+
+        staging = os.path.join(self.root, "objects", f".staging-{spec.name}-{os.getpid()}")
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        part_path = os.path.join(self.root, "downloads", spec.filename + ".part")
+        try:
+            size, ranged, validator = self._probe(url)
+            if ranged and size:
+                self._download_ranged(url, part_path, size, spec.filename, validator)
+                try:
+                    with open(part_path, "rb") as f:
+                        sha256 = self._install(HashingReader(f), spec, staging)
+                except ModelDownloadError:
+                    # 已下载的文件无法解压，丢弃，下次重新下载
+                    self._remove_part(part_path)
+                    raise
+            else:
+                try:
+                    response = self._open(url)
+                except urllib.error.URLError as e:
+                    raise ModelDownloadError(f"无法下载 {url}: {e}")
+                with response:
+                    sha256 = self._install(HashingReader(response), spec, staging)
+
+            if expected and sha256 != expected:
+                # 下载的数据有误，丢弃已下载的文件，下次重新下载
+                self._remove_part(part_path)
+                raise ModelDownloadError(f"{spec.filename} 校验失败: 期望 {expected}，实际 {sha256}")
+            if not expected:
+                print(f"{spec.filename} 没有可用的校验和，记录首次下载的sha256: {sha256}", file=sys.stderr)
+
+            target = self.object_dir(sha256)
+            if os.path.isdir(target):
+                shutil.rmtree(staging)  # 其他进程已经放入了同样的内容
+            else:
+                os.replace(staging, target)
+            write_json(self.ref_path(spec), {"url": url, "sha256": sha256})
+            self._remove_part(part_path)
+            print(f"{spec.name} 已缓存到 {target}", file=sys.stderr)
+            return sha256
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+    def _install(self, reader, spec, staging):
+        """从 reader 读取压缩包（或单个文件）放入 staging 目录，返回sha256"""
+        if spec.is_archive:
+            try:
+                extract_tar_stream(reader, staging)
+            except (tarfile.TarError, EOFError, OSError) as e:
+                raise ModelDownloadError(f"解压 {spec.filename} 失败: {e}")
+        else:
+            with open(os.path.join(staging, spec.filename), "wb") as f:
+                while True:
+                    data = reader.read(READ_SIZE)
+                    if not data:
+                        break
+                    f.write(data)
+        return reader.sha256.hexdigest()
+
+    def _open(self, url, headers=None):
+        request = urllib.request.Request(url, headers={"User-Agent": USER_AGENT, **(headers or {})})
+        return urllib.request.urlopen(request, timeout=self.timeout)
+
+    def _mirror_checksum(self, url):
+        """镜像上的 <文件>.sha256（sha256sum 的输出格式），没有时返回 None"""
+        try:
+            with self._open(url + ".sha256") as response:
+                value = response.read(1024).decode("ascii", "replace").split()
+        except (urllib.error.URLError, OSError):
+            return None
+        if value and len(value[0]) == 64:
+            return value[0].lower()
+        return None
+
+    def _probe(self, url):
+        """
+        请求第一个字节，判断服务器是否支持 Range（重定向后HEAD会变成GET，所以不用HEAD）
+
+        Returns:
+            (文件大小, 是否支持Range, 用于 If-Range 的强 ETag 或 Last-Modified，没有时为 None)
+        """
+        try:
+            with self._open(url, {"Range": "bytes=0-0"}) as response:
+                etag = response.headers.get("ETag")
+                # If-Range 只能使用强 ETag，弱 ETag（W/"..."）时改用 Last-Modified
+                validator = etag if etag and not etag.startswith("W/") else response.headers.get("Last-Modified")
+                content_range = response.headers.get("Content-Range", "")
+                if response.status == 206 and "/" in content_range:
+                    total = content_range.rsplit("/", 1)[1]
+                    if total.isdigit():
+                        return int(total), True, validator
+                return int(response.headers.get("Content-Length") or 0), False, validator
+        except urllib.error.URLError as e:
+            raise ModelDownloadError(f"无法下载 {url}: {e}")
+
+    def _download_ranged(self, url, part_path, size, label, validator=None):
+        """
+        分块并行下载到 part_path，已完成的分块和 validator（ETag / Last-Modified）记录在 part_path.json 中，
+        可以续传。validator 与记录的不同时重新下载；每个分块的请求带 If-Range，
+        下载过程中服务器上的文件发生变化时，服务器返回整个文件（HTTP 200），此时丢弃已下载的分块
+        """
+        state_path = part_path + ".json"
+        state = read_json(state_path)
+        if not (state and state.get("url") == url and state.get("size") == size
+                and state.get("chunk_size") == self.chunk_size and state.get("validator") == validator
+                and os.path.isfile(part_path) and os.path.getsize(part_path) == size):
+            state = {"url": url, "size": size, "chunk_size": self.chunk_size, "validator": validator, "done": []}
+            with open(part_path, "wb") as f:
+                f.truncate(size)
+            write_json(state_path, state)
+
+        chunks = [(start, min(start + self.chunk_size, size) - 1) for start in range(0, size, self.chunk_size)]
+        done = set(state["done"])
+        remaining = [(index, start, end) for index, (start, end) in enumerate(chunks) if index not in done]
+        progress = DownloadProgress(label, size, sum(end - start + 1 for index, (start, end) in enumerate(chunks)
+                                                     if index in done))
+        if done:
+            print(f"继续下载 {label}：已完成 {len(done)}/{len(chunks)} 个分块", file=sys.stderr)
+
+        lock = threading.Lock()
+        changed = threading.Event()
+        headers = {"If-Range": validator} if validator else {}
+
+        def download_chunk(index, start, end):
+            for attempt in range(self.retries + 1):
+                written = 0
+                try:
+                    with self._open(url, {"Range": f"bytes={start}-{end}", **headers}) as response:
+                        if response.status == 200 and validator:
+                            changed.set()
+                            raise ModelDownloadError(f"{label} 在服务器上已更改，已下载的分块作废，请重新下载")
+                        if response.status != 206:
+                            raise ModelDownloadError(f"服务器没有按 Range 返回数据: HTTP {response.status}")
+                        with open(part_path, "r+b") as f:
+                            f.seek(start)
+                            while True:
+                                data = response.read(min(READ_SIZE, end + 1 - start - written))
+                                if not data:
+                                    break
+                                f.write(data)
+                                written += len(data)
+                                progress.add(len(data))
+                    if written != end - start + 1:
+                        raise ModelDownloadError(f"分块 {index} 不完整: {written}/{end - start + 1} 字节")
+                    with lock:
+                        state["done"].append(index)
+                        write_json(state_path, state)
+                    return
+                except (urllib.error.URLError, http.client.HTTPException, OSError, ModelDownloadError) as e:
+                    progress.add(-written)
+                    if changed.is_set():
+                        raise
+                    if attempt == self.retries:
+                        raise ModelDownloadError(f"下载 {label} 的分块 {index} 失败: {e}")
+                    time.sleep(min(2 ** attempt, 10))
+
+        with ThreadPoolExecutor(self.connections) as executor:
+            futures = {executor.submit(download_chunk, *chunk) for chunk in remaining}
+            try:
+                while futures:
+                    finished, futures = wait(futures, timeout=1, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        future.result()
+                    progress.report()
+            except BaseException:
+                # 出错或被中断时不再开始新的分块，已完成的分块下次继续使用
+                for future in futures:
+                    future.cancel()
+                if changed.is_set():
+                    executor.shutdown(wait=True)
+                    self._remove_part(part_path)
+                raise
+        progress.report(final=True)
+
+    def _remove_part(self, part_path):
+        for path in (part_path, part_path + ".json"):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def resolve_model_paths(args, bindings, store, download=True):
+    """
+    把参数中不存在的默认模型路径替换为缓存中的路径
+
+    Args:
+        args: 命令行参数
+        bindings: [(参数名, 默认路径, 模型名, 模型文件的用途)]，只处理值等于默认路径且文件不存在的参数；
+            用户显式指定的路径不会被替换
+        store: ModelStore
+        download: 没有缓存时是否下载，False 时只提示下载地址
+    """
+    for attr, default_path, model_name, key in bindings:
+        path = getattr(args, attr)
+        if os.path.exists(path) or path != default_path:
+            continue
+        spec = MODELS[model_name]
+        paths = store.lookup(spec)
+        if not paths and not download:
+            print(f"请下载文件到：{path}", file=sys.stderr)
+            print(f"下载链接：{store.url(spec)}", file=sys.stderr)
+            continue
+        if not paths:
+            print(f"{path} 不存在，正在从 {store.mirror} 下载 {spec.filename}", file=sys.stderr)
+            paths = store.ensure(spec)
+        setattr(args, attr, paths[key])
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+#
+# Copyright (c)  2025  Xiaomi Corporation
+
+"""
+在虚拟时间下回放采集轨迹，按与 start_recording 相同的路径处理原始数据包，
+报告输出延迟、丢弃和补齐的采样数，以及输出与参考音频的差异。
+
+与录音时一样，轨迹中只有一个设备时走单设备直通（不经过混音器），有多个设备时经过混音器。
+录音时用了 --debug-save-audio 则单设备也经过混音器，回放这样的轨迹时加 --force-mixer。
+轨迹中没有记录运行中增删设备的时刻，录音期间增删过设备的轨迹按多设备整段经过混音器回放。
+
+录制轨迹：
+
+python simulate-streaming-sense-voice.py --device 3 --record-trace capture.trace
+
+回放：
+
+python replay-capture-trace.py capture.trace --save-output mixed.wav
+python replay-capture-trace.py capture.trace --reference mixed.wav
+"""
+import argparse
+import json
+import queue
+import sys
+import os
+import wave
+
+script_path = os.path.realpath(__file__)
+script_dir = os.path.dirname(script_path)
+sys.path.insert(0, script_dir)
+
+import numpy as np
+
+from audio_mixer import (
+    sample_rate, samples_time, FORMAT_FLOAT32, FORMAT_INT16,
+    round_timestamp, to_format, decode_packet, resample_to_target, put_drop_oldest, to_float32_samples, MixerStats,
+    TimestampMixer
+)
+from capture_trace import read_trace
+
+
+def get_args():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+
+    parser.add_argument(
+        "trace",
+        type=str,
+        help="采集轨迹文件路径（由 --record-trace 录制）",
+    )
+
+    parser.add_argument(
+        "--mix-mode",
+        type=str,
+        default="average",
+        choices=["average", "add"],
+        help="多设备混音模式：average=平均混音，add=加法混音",
+    )
+
+    parser.add_argument(
+        "--processing-delay",
+        type=float,
+        default=3 * samples_time,
+        help="混音器的处理延迟（秒）",
+    )
+
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=10,
+        help="每个设备队列最多保存的数据包数，与采集进程保持一致",
+    )
+
+    parser.add_argument(
+        "--force-mixer",
+        action="store_true",
+        help="轨迹中只有一个设备时也经过混音器（录音时使用了 --debug-save-audio 的情况）",
+    )
+
+    parser.add_argument(
+        "--save-output",
+        type=str,
+        default="",
+        help="把回放得到的混音结果保存为16位WAV文件",
+    )
+
+    parser.add_argument(
+        "--reference",
+        type=str,
+        default="",
+        help="参考WAV文件（例如 --debug-save-audio 保存的音频，或之前回放保存的结果），用于比较混音输出",
+    )
+
+    parser.add_argument(
+        "--json",
+        action="store_true",
+        help="以JSON格式输出报告",
+    )
+
+    return parser.parse_args()
+
+
+def trace_sample_format(devices):
+    # 同一次录音中所有设备使用相同的采样格式
+    return FORMAT_INT16 if all(d.sample_format == FORMAT_INT16 for d in devices.values()) else FORMAT_FLOAT32
+
+
+def replay_direct(devices, packets):
+    """
+    按单设备直通回放：与 start_recording 的 forward_direct 相同，每个数据包在采集回调中直接输出，
+    同一时间槽的第二个数据包被丢弃
+
+    Returns:
+        (output, stats, queue_drops)
+    """
+    packets = sorted(packets, key=lambda packet: packet[1])
+    sample_format = trace_sample_format(devices)
+    stats = MixerStats()
+    outputs = []
+    last_timestamp = -1
+    for device_idx, capture_time, data in packets:
+        device = devices[device_idx]
+        samples = resample_to_target(decode_packet(data, device.sample_format, device.channels),
+                                     device.native_rate, sample_format)
+        timestamp = round_timestamp(capture_time)
+        if timestamp <= last_timestamp:
+            stats.dropped_packets += 1
+            stats.dropped_samples += len(samples)
+            continue
+        last_timestamp = timestamp
+        outputs.append(to_float32_samples(samples))
+        stats.output_slots += 1
+        stats.output_samples += len(samples)
+        stats.latencies.append(capture_time - timestamp)
+
+    output = np.concatenate(outputs) if outputs else np.zeros(0, dtype=np.float32)
+    return output, stats, {idx: 0 for idx in devices}
+
+
+def replay(devices, packets, mix_mode="average", processing_delay=3 * samples_time, queue_size=10):
+    """
+    在虚拟时间下经过混音器回放数据包
+
+    每个数据包在其采集时间戳时刻进入设备队列；混音器按 step() 返回的休眠时间推进虚拟时钟，
+    不计算处理耗时，因此同一轨迹每次回放的结果完全一致。
+
+    Returns:
+        (mixed, stats, queue_drops)
+    """
+    packets = sorted(packets, key=lambda packet: packet[1])
+    device_indices = sorted(devices.keys())
+    device_queues = {idx: queue.Queue(maxsize=queue_size) for idx in device_indices}
+    queue_drops = {idx: 0 for idx in device_indices}
+    sample_format = trace_sample_format(devices)
+    mixer = TimestampMixer(device_indices, mix_mode, processing_delay, sample_format=sample_format)
+
+    def fetch_packet(device_idx):
+        try:
+            return device_queues[device_idx].get_nowait()
+        except queue.Empty:
+            return None
+
+    outputs = []
+    next_packet = 0
+    now = packets[0][1] if packets else 0.0
+    while True:
+        # 把采集时间已到的数据包放入对应设备的队列
+        while next_packet < len(packets) and packets[next_packet][1] <= now:
+            device_idx, capture_time, data = packets[next_packet]
+            device = devices[device_idx]
+            # 与 start_recording 相同，入队前转换为单声道并重采样到16kHz
+            samples = resample_to_target(decode_packet(data, device.sample_format, device.channels),
+                                         device.native_rate, sample_format)
+            if put_drop_oldest(device_queues[device_idx], (round_timestamp(capture_time), samples, sample_rate)):
+                queue_drops[device_idx] += 1
+            next_packet += 1
+
+        mixed, sleep_time = mixer.step(now, fetch_packet)
+        if mixed is not None:
+            outputs.append(to_float32_samples(mixed))
+            continue
+
+        if (next_packet >= len(packets) and not mixer.has_pending()
+                and all(q.empty() for q in device_queues.values())):
+            break
+
+        # 防止极小的休眠时间因浮点精度无法推进虚拟时钟
+        now = max(now + sleep_time, np.nextafter(now, np.inf))
+
+    mixed = np.concatenate(outputs) if outputs else np.zeros(0, dtype=np.float32)
+    return mixed, mixer.stats, queue_drops
+
+
+def read_wav(path):
+    with wave.open(path, "rb") as f:
+        assert f.getsampwidth() == 2, f"{path} 不是16位WAV文件"
+        assert f.getframerate() == sample_rate, f"{path} 的采样率不是 {sample_rate} Hz"
+        data = np.frombuffer(f.readframes(f.getnframes()), dtype=np.int16)
+        channels = f.getnchannels()
+    # 与识别进程相同的int16转换，回放结果与实时识别的输入逐采样一致
+    samples = to_float32_samples(data)
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1, dtype=np.float32)
+    return samples
+
+
+def write_wav(path, samples):
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        # read_wav 的逆变换：int16 链路上的采样保存后再读回，与保存前逐采样一致
+        f.writeframes(to_format(samples * 32768, FORMAT_INT16).tobytes())
+
+
+def compare(mixed, reference):
+    """比较混音输出与参考音频，按较短的长度对齐"""
+    length = min(len(mixed), len(reference))
+    diff = mixed[:length] - reference[:length]
+    signal_power = float(np.mean(reference[:length] ** 2)) if length else 0.0
+    noise_power = float(np.mean(diff ** 2)) if length else 0.0
+    if noise_power == 0:
+        snr_db = float("inf")
+    elif signal_power == 0:
+        snr_db = float("-inf")
+    else:
+        snr_db = 10 * np.log10(signal_power / noise_power)
+    return {
+        "output_samples": len(mixed),
+        "reference_samples": len(reference),
+        "compared_samples": length,
+        "rms_diff": float(np.sqrt(noise_power)),
+        "max_abs_diff": float(np.max(np.abs(diff))) if length else 0.0,
+        "snr_db": float(snr_db),
+    }
+
+
+def main():
+    sys.stdout.reconfigure(encoding='utf-8')
+    args = get_args()
+
+    devices, packets = read_trace(args.trace)
+    if not packets:
+        print(f"{args.trace} 中没有任何数据包", file=sys.stderr)
+        sys.exit(1)
+
+    direct = len(devices) == 1 and not args.force_mixer
+    if direct:
+        mixed, stats, queue_drops = replay_direct(devices, packets)
+    else:
+        mixed, stats, queue_drops = replay(devices, packets, args.mix_mode, args.processing_delay, args.queue_size)
+    latencies = np.array(stats.latencies) * 1000
+
+    report = {
+        "devices": {str(idx): {"name": d.name, "native_rate": d.native_rate, "channels": d.channels}
+                    for idx, d in devices.items()},
+        "path": "direct" if direct else "mixer",
+        "packets": len(packets),
+        "duration_seconds": packets[-1][1] - packets[0][1] if len(packets) > 1 else 0.0,
+        "output_slots": stats.output_slots,
+        "output_samples": stats.output_samples,
+        "latency_ms": {
+            "p50": float(np.percentile(latencies, 50)) if len(latencies) else 0.0,
+            "p90": float(np.percentile(latencies, 90)) if len(latencies) else 0.0,
+            "p99": float(np.percentile(latencies, 99)) if len(latencies) else 0.0,
+            "max": float(np.max(latencies)) if len(latencies) else 0.0,
+        },
+        "dropped_packets": stats.dropped_packets,
+        "dropped_samples": stats.dropped_samples,
+        "queue_dropped_packets": {str(idx): n for idx, n in queue_drops.items()},
+        "filled_samples": stats.filled_samples,
+        "partial_slots": stats.partial_slots,
+        "length_mismatches": stats.length_mismatches,
+    }
+
+    if args.reference:
+        report["reference"] = compare(mixed, read_wav(args.reference))
+
+    if args.save_output:
+        write_wav(args.save_output, mixed)
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return
+
+    print(f"数据包: {report['packets']}，时长: {report['duration_seconds']:.2f} 秒，"
+          f"{'单设备直通' if direct else '经过混音器'}")
+    for idx, d in report["devices"].items():
+        print(f"  设备 {idx} ({d['name']})：{d['native_rate']} Hz，{d['channels']} 声道")
+    print(f"输出: {stats.output_slots} 个时间槽，{stats.output_samples} 个采样")
+    latency = report["latency_ms"]
+    print(f"输出延迟(ms): p50={latency['p50']:.1f} p90={latency['p90']:.1f} "
+          f"p99={latency['p99']:.1f} max={latency['max']:.1f}")
+    print(f"丢弃: {stats.dropped_packets} 个过旧数据包，共 {stats.dropped_samples} 个采样；"
+          f"设备队列溢出: {report['queue_dropped_packets']}")
+    print(f"补齐: {stats.partial_slots} 个时间槽设备未全部就绪，共 {stats.filled_samples} 个采样；"
+          f"长度不匹配: {stats.length_mismatches} 次")
+    if "reference" in report:
+        ref = report["reference"]
+        print(f"与参考音频比较: 输出 {ref['output_samples']} / 参考 {ref['reference_samples']} 个采样，"
+              f"RMS差={ref['rms_diff']:.6f} 最大差={ref['max_abs_diff']:.6f} SNR={ref['snr_db']:.1f} dB")
+
+
+if __name__ == "__main__":
+    main()
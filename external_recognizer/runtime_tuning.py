@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+#
+# Copyright (c)  2025  Xiaomi Corporation
+
+"""
+实时链路的运行时调优：CPU绑定、线程预算和GC控制。
+
+  - 录音子进程（采集回调和混音线程）与识别进程（VAD和推理线程）可以绑定到不同的CPU核心，
+    推理线程不会抢占采集线程所在的核心
+  - VAD和推理共用一个线程总数预算
+  - 模型加载完成后 gc.freeze()，把加载期间创建的对象移出GC扫描范围，并调大GC阈值，
+    热循环中分代回收的次数更少、每次扫描的对象更少，避免GC停顿导致采集溢出
+
+本模块会在录音子进程中导入，只允许依赖标准库。
+"""
+
+import argparse
+import gc
+import os
+import sys
+import time
+
+# 热循环使用的GC阈值：numpy数组不受GC跟踪，热循环中分配的容器对象大多很快释放，
+# 第0代阈值调大后回收次数减少；第2代只在冻结之后新增的长期对象中进行
+GC_THRESHOLDS = (10000, 20, 100)
+
+
+def parse_cpu_list(value):
+    """
+    解析CPU核心列表，例如 "0"、"2-7"、"0,2,4-5"
+
+    Returns:
+        list: 排序后的核心编号，空字符串返回空列表
+    """
+    cpus = set()
+    for part in value.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            if "-" in part:
+                first, last = (int(x) for x in part.split("-", 1))
+                if first > last:
+                    raise ValueError
+                cpus.update(range(first, last + 1))
+            else:
+                cpus.add(int(part))
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"无法解析的CPU核心列表: {value}")
+    cpu_count = os.cpu_count() or 1
+    invalid = [cpu for cpu in cpus if cpu < 0 or cpu >= cpu_count]
+    if invalid:
+        raise argparse.ArgumentTypeError(f"CPU核心 {invalid} 不存在（共 {cpu_count} 个核心）")
+    return sorted(cpus)
+
+
+def set_cpu_affinity(cpus):
+    """
+    把当前进程的所有线程绑定到给定的CPU核心，之后创建的线程（PortAudio回调线程、
+    onnxruntime的推理线程）会继承绑定
+
+    Returns:
+        bool: 是否成功
+    """
+    if not cpus:
+        return False
+    try:
+        if hasattr(os, "sched_setaffinity"):
+            # Linux 的绑定是按线程的，已经存在的线程（例如队列的发送线程）需要逐个设置
+            try:
+                thread_ids = [int(tid) for tid in os.listdir("/proc/self/task")]
+            except OSError:
+                thread_ids = [0]
+            for tid in thread_ids:
+                try:
+                    os.sched_setaffinity(tid, cpus)
+                except ProcessLookupError:
+                    pass  # 线程已经退出
+            return True
+        if sys.platform == "win32":
+            import ctypes
+            kernel32 = ctypes.windll.kernel32
+            kernel32.GetCurrentProcess.restype = ctypes.c_void_p
+            mask = sum(1 << cpu for cpu in cpus)
+            if kernel32.SetProcessAffinityMask(ctypes.c_void_p(kernel32.GetCurrentProcess()),
+                                               ctypes.c_size_t(mask)):
+                return True
+            print(f"无法绑定CPU核心 {cpus}: 错误码 {ctypes.GetLastError()}", file=sys.stderr)
+            return False
+    except OSError as e:
+        print(f"无法绑定CPU核心 {cpus}: {e}", file=sys.stderr)
+        return False
+    print("当前平台不支持绑定CPU核心", file=sys.stderr)
+    return False
+
+
+def split_thread_budget(budget, vad_threads=1):
+    """
+    把线程总数预算分给VAD和推理，两者各至少1个线程，因此小于2的预算按2处理
+    （例如 --decode-cpus 只有一个核心时，VAD和推理线程共用这个核心）
+
+    Returns:
+        (VAD线程数, 推理线程数上限)，budget 为0表示不限制，推理线程数上限为 None
+    """
+    if not budget:
+        return vad_threads, None
+    budget = max(budget, 2)
+    vad_threads = max(1, min(vad_threads, budget - 1))
+    return vad_threads, max(1, budget - vad_threads)
+
+
+class GcMonitor:
+    """通过 gc.callbacks 统计每次回收的停顿时间"""
+    def __init__(self):
+        self.collections = [0, 0, 0]
+        self.total_pause = 0.0
+        self.max_pause = 0.0
+        self.start = None
+        gc.callbacks.append(self.callback)
+
+    def callback(self, phase, info):
+        if phase == "start":
+            self.start = time.perf_counter()
+        elif self.start is not None:
+            pause = time.perf_counter() - self.start
+            self.start = None
+            self.collections[info["generation"]] += 1
+            self.total_pause += pause
+            self.max_pause = max(self.max_pause, pause)
+
+    def close(self):
+        if self.callback in gc.callbacks:
+            gc.callbacks.remove(self.callback)
+
+    def format_summary(self):
+        return (f"GC: 回收 {sum(self.collections)} 次（各代 {self.collections[0]}/{self.collections[1]}/"
+                f"{self.collections[2]}），总停顿 {self.total_pause * 1000:.1f} ms，"
+                f"最长 {self.max_pause * 1000:.2f} ms")
+
+
+def tune_gc(thresholds=GC_THRESHOLDS):
+    """模型加载完成、进入热循环之前调用：回收一次后冻结现有对象，并设置热循环的GC阈值"""
+    gc.collect()
+    gc.freeze()
+    gc.set_threshold(*thresholds)
+    print(f"GC已冻结 {gc.get_freeze_count()} 个对象，阈值 {thresholds}", file=sys.stderr)
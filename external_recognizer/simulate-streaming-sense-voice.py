@@ -30,17 +30,28 @@ script_path = os.path.realpath(__file__)
 script_dir = os.path.dirname(script_path)
 sys.path.insert(0, script_dir)
 
-# Import common utilities
-from common_audio_utils import (
-    pyaudio, sherpa_onnx, np,
-    sample_rate, assert_file_exists,
-    start_recording, MyPrinter, select_input_device,
-    get_audio_devices, cleanup_recording_process
-)
-
-vad_model_url = 'https://github.com/k2-fsa/sherpa-onnx/releases/download/asr-models/silero_vad.onnx'
+# 录音子进程以spawn方式启动时会以 __mp_main__ 的身份重新导入本脚本，
+# 识别相关的依赖（sherpa_onnx、tkinter、缺少依赖时的pip安装，以及模型下载用到的 http.client/ssl 等）
+# 只在其他情况下导入，录音子进程只需要轻量的 audio_capture / audio_mixer 和 numpy
+if __name__ != "__mp_main__":
+    from common_audio_utils import (
+        pyaudio, sherpa_onnx, np,
+        assert_file_exists, MyPrinter, choose_input_devices
+    )
+    from device_profiles import default_profiles_path
+    from transcript_history import TranscriptHistory, SampleClock
+    from keyword_alert import KeywordAlerter, load_keywords
+    from translation import Translator, create_backend
+    from model_manager import ModelStore, resolve_model_paths, default_store_path, default_mirror
+    from wake_gate import WakeGate, create_keyword_spotter
+    from utterance_trace import UtteranceTracer
+    from speculative_final import SpeculativeFinal
+    from runtime_tuning import GcMonitor, parse_cpu_list, set_cpu_affinity, split_thread_budget, tune_gc
+    import autotune
+from audio_capture import start_recording, cleanup_recording_process, start_control_reader
+from audio_mixer import sample_rate, to_float32_samples
+
 vad_model_path = os.path.join(script_dir, "silero_vad.onnx")
-onnx_model_url = 'https://github.com/k2-fsa/sherpa-onnx/releases/download/asr-models/sherpa-onnx-sense-voice-zh-en-ja-ko-yue-int8-2025-09-09.tar.bz2'
 onnx_model_path = os.path.join(script_dir, "sherpa-onnx-sense-voice-zh-en-ja-ko-yue-int8-2025-09-09", "model.int8.onnx")
 tokens_txt_path = os.path.join(script_dir, "sherpa-onnx-sense-voice-zh-en-ja-ko-yue-int8-2025-09-09", "tokens.txt")
 
@@ -49,6 +60,12 @@ killed = False
 recording_process = None
 samples_queue = None
 stop_event = None
+history = None
+translator = None
+gc_monitor = None
+wake_gate = None
+tracer = None
+speculation = None
 
 
 def get_args():
@@ -59,8 +76,29 @@ def get_args():
     parser.add_argument(
         "--device",
         type=int,
-        default=-1,
-        help="输入设备的编号",
+        nargs="+",
+        default=None,
+        help="输入设备的编号，可以指定多个；不指定或为负数（如 -1）时使用 --profile 保存的设备配置或弹出选择框",
+    )
+
+    parser.add_argument(
+        "--profile",
+        type=str,
+        default="default",
+        help="设备配置的名称；配置中的设备按名称查找，找不到时弹出设备选择框并保存选择结果",
+    )
+
+    parser.add_argument(
+        "--device-profiles",
+        type=str,
+        default=default_profiles_path,
+        help="设备配置文件路径",
+    )
+
+    parser.add_argument(
+        "--save-profile",
+        action="store_true",
+        help="把 --device 指定的设备保存到 --profile 配置中",
     )
 
     parser.add_argument(
@@ -87,8 +125,96 @@ def get_args():
     parser.add_argument(
         "--num-threads",
         type=int,
-        default=2,
-        help="用于推理的线程数，默认为2",
+        default=None,
+        help="用于推理的线程数。不指定时使用自动调优缓存的结果，没有缓存时为2",
+    )
+
+    parser.add_argument(
+        "--provider",
+        type=str,
+        default=None,
+        help="推理使用的provider（cpu、cuda、coreml）。不指定时使用自动调优缓存的结果，没有缓存时为cpu",
+    )
+
+    parser.add_argument(
+        "--calibrate",
+        action="store_true",
+        help="校准模式：对不同的线程数和provider计时，把最快的配置保存到自动调优缓存后继续运行",
+    )
+
+    parser.add_argument(
+        "--calibrate-providers",
+        type=str,
+        default="cpu",
+        help="校准时尝试的provider，用逗号分隔，例如 cpu,cuda",
+    )
+
+    parser.add_argument(
+        "--autotune-cache",
+        type=str,
+        default=autotune.default_cache_path,
+        help="自动调优缓存文件路径",
+    )
+
+    parser.add_argument(
+        "--thread-budget",
+        type=int,
+        default=0,
+        help="VAD和推理共用的线程总数，VAD使用 --vad-threads 个，其余为推理线程数的上限。"
+             "0 表示指定了 --decode-cpus 时使用其核心数，否则不限制；VAD和推理各至少1个线程，小于2时按2处理",
+    )
+
+    parser.add_argument(
+        "--vad-threads",
+        type=int,
+        default=1,
+        help="VAD的推理线程数",
+    )
+
+    parser.add_argument(
+        "--capture-cpus",
+        type=parse_cpu_list,
+        default=[],
+        help="录音子进程（采集回调和混音线程）绑定的CPU核心，例如 0 或 0-1，不指定时不绑定",
+    )
+
+    parser.add_argument(
+        "--decode-cpus",
+        type=parse_cpu_list,
+        default=[],
+        help="识别进程（VAD和推理线程）绑定的CPU核心，例如 2-7，不指定时不绑定",
+    )
+
+    parser.add_argument(
+        "--no-gc-tuning",
+        action="store_true",
+        help="不在模型加载后冻结GC、调整GC阈值（用于比较GC调优的效果）",
+    )
+
+    parser.add_argument(
+        "--no-speculative-final",
+        action="store_true",
+        help="不在尾部静音开始时提前在后台解码整句，等VAD关闭句子后再同步解码（用于比较推测解码的效果）",
+    )
+
+    parser.add_argument(
+        "--model-store",
+        type=str,
+        default=default_store_path,
+        help="模型缓存目录：默认路径的模型不存在时，下载、校验并解压到这里，之后启动直接使用",
+    )
+
+    parser.add_argument(
+        "--model-mirror",
+        type=str,
+        default=default_mirror,
+        help="下载模型的镜像地址，模型的下载地址为 <镜像地址>/<文件名>",
+    )
+
+    parser.add_argument(
+        "--no-download",
+        action="store_true",
+        help="模型不存在时不自动下载，只提示下载链接",
     )
 
     parser.add_argument(
@@ -120,92 +246,159 @@ def get_args():
         help="调试模式：保存混音后的音频到指定的WAV文件路径（例如：debug_mixed.wav）",
     )
 
-    return parser.parse_args()
+    parser.add_argument(
+        "--record-trace",
+        type=str,
+        default="",
+        help="调试模式：把每个设备的原始数据包和采集时间戳录制到指定的轨迹文件，可用 replay-capture-trace.py 回放",
+    )
 
+    parser.add_argument(
+        "--utterance-trace",
+        type=str,
+        default="",
+        help="把每个数据包的采集、排队、混音、进程间传输，以及VAD、解码和每句话的时间线写入指定的JSON文件"
+        "（Chrome trace-event 格式，可用 https://ui.perfetto.dev 打开）",
+    )
 
-def try_download_model(vad_model_path, onnx_model_path):
-    if not os.path.exists(vad_model_path):
-        print(f"请下载文件到：{vad_model_path}", file=sys.stderr)
-        print(f"下载链接：{vad_model_url}", file=sys.stderr)
-    if not os.path.exists(onnx_model_path):
-        print(f"请下载并解压文件夹到：{onnx_model_path}", file=sys.stderr)
-        print(f"下载链接：{onnx_model_url}", file=sys.stderr)
+    parser.add_argument(
+        "--sample-format",
+        type=str,
+        default="float32",
+        choices=["float32", "int16"],
+        help="采集和进程间传输的采样格式：int16 每个采样2字节，float32 每个采样4字节；只在送入识别器时转换为float32",
+    )
 
-def create_recognizer(args):
-    assert_file_exists(args.sense_voice)
-    recognizer = sherpa_onnx.OfflineRecognizer.from_sense_voice(
-        model=args.sense_voice,
-        tokens=args.tokens,
-        num_threads=args.num_threads,
-        use_itn=False,
-        debug=False,
-        hr_rule_fsts=args.hr_rule_fsts,
-        hr_lexicon=args.hr_lexicon,
+    parser.add_argument(
+        "--history-dir",
+        type=str,
+        default="",
+        help="不为空时把每句的最终结果连同开始/结束时间和来源设备写入该目录的历史记录，可用 transcript-history.py 查询和导出",
     )
 
-    return recognizer
+    parser.add_argument(
+        "--keywords",
+        type=str,
+        default="",
+        help="不为空时从该文件读取关键词（每行一个或用逗号分隔），临时结果中出现关键词时通知界面，每句每个关键词只提醒一次",
+    )
 
+    parser.add_argument(
+        "--translate",
+        type=str,
+        default="",
+        help="不为空时在后台翻译每句的最终结果，译文作为单独的消息输出。可选 echo（不联网的替代后端，用于测试）或 模块名:类名 指定的自定义后端",
+    )
 
-def main():
-    sys.stdout.reconfigure(encoding='utf-8')
-    sys.stderr.reconfigure(encoding='utf-8')
-    p_temp = pyaudio.PyAudio()
+    parser.add_argument(
+        "--translate-source",
+        type=str,
+        default="auto",
+        help="翻译的源语言",
+    )
 
-    # 获取所有设备信息
-    devices = get_audio_devices(p_temp)
+    parser.add_argument(
+        "--translate-target",
+        type=str,
+        default="en",
+        help="翻译的目标语言",
+    )
 
-    if not devices:
-        print("没有任何输入设备！", file=sys.stderr)
-        p_temp.terminate()
-        sys.exit(0)
+    parser.add_argument(
+        "--wake-keywords",
+        type=str,
+        default="",
+        help="不为空时启用唤醒词门控：平时只运行关键词检测，检测到该文件中的唤醒词后才开始识别。文件格式与 sherpa-onnx 关键词检测的 keywords.txt 相同，需要同时指定 --kws-* 模型",
+    )
 
-    args = get_args()
+    parser.add_argument(
+        "--kws-encoder",
+        type=str,
+        default="",
+        help="关键词检测模型的encoder",
+    )
 
-    print("可用设备:", file=sys.stderr)
-    for idx, device in devices:
-        print(f"  {idx}: {device['name']} (输入通道: {device['maxInputChannels']}, 输出通道: {device['maxOutputChannels']})", file=sys.stderr)
-
-    # 如果命令行没有指定设备，弹出选择框
-    selected_device_indices = []
-    if args.device < 0:
-        selected_device_indices = select_input_device(devices, p_temp)
-        if not selected_device_indices:
-            # 如果没有选择设备，使用默认输入设备
-            default_info = p_temp.get_default_input_device_info()
-            selected_device_indices = [default_info['index']]
-    else:
-        selected_device_indices = [args.device]
+    parser.add_argument(
+        "--kws-decoder",
+        type=str,
+        default="",
+        help="关键词检测模型的decoder",
+    )
 
-    # 关闭临时的PyAudio实例
-    p_temp.terminate()
+    parser.add_argument(
+        "--kws-joiner",
+        type=str,
+        default="",
+        help="关键词检测模型的joiner",
+    )
 
-    # 如果你想要选择其他的输入设备，请解除下面这行的注释，并将 xxx 改为设备的序号
-    # selected_device_indices = [xxx]
-    # 注意要选设备结尾的in大于零的，比如 (2 in, 0 out) 表示两声道输入，没有输出声道，说明是录音设备。
-    # 如果想要识别系统声音，尝试启用"立体声混音"，并设置识别设备为它。
+    parser.add_argument(
+        "--kws-tokens",
+        type=str,
+        default="",
+        help="关键词检测模型的tokens.txt",
+    )
 
-    # 显示所有选中的设备
-    device_names = []
-    for idx in selected_device_indices:
-        device_name = next((d['name'] for i, d in devices if i == idx), f"设备{idx}")
-        device_names.append(f"{idx}: {device_name}")
+    parser.add_argument(
+        "--kws-threshold",
+        type=float,
+        default=0.25,
+        help="关键词检测的触发阈值，越大越难触发",
+    )
 
-    if len(selected_device_indices) == 1:
-        print(f'使用输入设备: {device_names[0]}', file=sys.stderr)
-    else:
-        print(f'使用 {len(selected_device_indices)} 个输入设备:', file=sys.stderr)
-        for name in device_names:
-            print(f'  - {name}', file=sys.stderr)
+    parser.add_argument(
+        "--kws-score",
+        type=float,
+        default=1.0,
+        help="关键词的加分，越大越容易触发",
+    )
 
-    try_download_model(args.silero_vad_model, args.silero_vad_model)
-    assert_file_exists(args.tokens)
-    assert_file_exists(args.silero_vad_model)
+    parser.add_argument(
+        "--wake-pre-roll",
+        type=float,
+        default=2.0,
+        help="唤醒时一起送入识别器的之前的音频（秒），包括唤醒词本身",
+    )
 
-    assert args.num_threads > 0, args.num_threads
+    parser.add_argument(
+        "--wake-timeout",
+        type=float,
+        default=15.0,
+        help="识别状态下这么多秒的音频没有新的识别结果时回到唤醒词检测，应大于结束句子所需的静音时长。"
+             "按识别结果是否变化计时，不是静音检测：噪声被识别出新的文字时也会继续识别",
+    )
+
+    return parser.parse_args()
 
-    print("正在启动识别器，请稍后", file=sys.stderr)
-    recognizer = create_recognizer(args)
 
+def prepare_models(args):
+    """默认路径的模型不存在时使用模型缓存，没有缓存时从镜像下载（--no-download 时只提示下载链接）"""
+    store = ModelStore(args.model_store, args.model_mirror)
+    resolve_model_paths(args, [
+        ("silero_vad_model", vad_model_path, "silero-vad", "model"),
+        ("sense_voice", onnx_model_path, "sense-voice-int8-2025-09-09", "model"),
+        ("tokens", tokens_txt_path, "sense-voice-int8-2025-09-09", "tokens"),
+    ], store, download=not args.no_download)
+
+
+def create_recognizer(args):
+    assert_file_exists(args.sense_voice)
+    recognizer = sherpa_onnx.OfflineRecognizer.from_sense_voice(
+        model=args.sense_voice,
+        tokens=args.tokens,
+        num_threads=args.num_threads,
+        provider=args.provider,
+        use_itn=False,
+        debug=False,
+        hr_rule_fsts=args.hr_rule_fsts,
+        hr_lexicon=args.hr_lexicon,
+    )
+
+    return recognizer
+
+
+def create_vad_config(args):
+    """VAD分句的配置，transcribe-files.py 也使用同样的配置"""
     config = sherpa_onnx.VadModelConfig()
     config.silero_vad.model = args.silero_vad_model
     config.silero_vad.threshold = 0.5
@@ -216,69 +409,168 @@ def main():
     # it resets the threshold to its original value.
     config.silero_vad.max_speech_duration = 8  # seconds
     config.sample_rate = sample_rate
-    force_max_speech_duration = 20  # seconds
+    config.num_threads = args.vad_threads
+    return config
 
-    window_size = config.silero_vad.window_size
 
-    vad = sherpa_onnx.VoiceActivityDetector(config, buffer_size_in_seconds=100)
+def decode_once(recognizer):
+    """自动调优时使用的代表性解码：对一段固定的5秒音频做一次完整解码"""
+    stream = recognizer.create_stream()
+    stream.accept_waveform(sample_rate, autotune.calibration_audio(sample_rate))
+    recognizer.decode_stream(stream)
 
-    print("识别已启动，请说话", file=sys.stderr)
 
-    buffer = []
+def load_recognizer(args):
+    """确定推理配置并加载SenseVoice模型"""
+    assert_file_exists(args.sense_voice)
+    args.vad_threads, max_threads = split_thread_budget(args.thread_budget or len(args.decode_cpus),
+                                                        args.vad_threads)
+    autotune.resolve_inference_config(args, [args.sense_voice], create_recognizer, decode_once,
+                                      default_num_threads=2, max_threads=max_threads)
+    assert args.num_threads > 0, args.num_threads
 
-    # 创建进程间通信的队列和停止事件
-    global samples_queue, stop_event, recording_process
-    samples_queue = multiprocessing.Queue()
-    stop_event = multiprocessing.Event()
+    return create_recognizer(args)
 
-    # 使用子进程而不是线程进行录音
-    recording_process = multiprocessing.Process(
-        target=start_recording,
-        args=(selected_device_indices, samples_queue, stop_event, args.mix_mode, args.debug_save_audio)
-    )
-    recording_process.start()
-    print(f"混音模式: {args.mix_mode}", file=sys.stderr)
 
-    # display = sherpa_onnx.Display()
-    printer = MyPrinter()
+def run_recognition(args, recognizer, samples_queue, printer, stop_event=None, tracer=None):
+    """
+    识别主循环：从 samples_queue 读取16kHz音频，用VAD分句并识别
+
+    Args:
+        args: 命令行参数
+        recognizer: load_recognizer 返回的识别器
+        samples_queue: 音频输入队列
+        printer: 输出识别结果的 MyPrinter
+        stop_event: 可选，设置后退出循环（用于测试工具）
+        tracer: 可选，utterance_trace.UtteranceTracer，记录VAD窗口、解码和每句话的时间线
+    """
+    config = create_vad_config(args)
+    force_max_speech_duration = 20  # seconds
+
+    # 尾部静音开始时在后台解码整句，VAD关闭句子时直接采用
+    global speculation
+    speculation = None if args.no_speculative_final else SpeculativeFinal(recognizer)
+
+    window_size = config.silero_vad.window_size
+
+    vad = sherpa_onnx.VoiceActivityDetector(config, buffer_size_in_seconds=100)
+
+    # 使用float32的空数组，避免与空列表拼接时被提升为float64
+    buffer = np.zeros(0, dtype=np.float32)
 
     started = False
     start_time = None
     last_update_time = None
 
+    # 采样位置与采集时间的对应关系，用于历史记录中句子的开始/结束时间：
+    # buffer_start 是 buffer[0] 在整个音频流中的位置，vad_shift 是音频流位置与VAD内部采样序号之差
+    # （清空 buffer 时不足一个窗口的剩余采样不会送入VAD，因此两者之差会变化）
+    clock = SampleClock()
+    buffer_start = 0
+    vad_samples = 0
+    vad_shift = 0
+
+    # 唤醒词门控：每次重新唤醒后从新的状态开始识别
+    gate = samples_queue if isinstance(samples_queue, WakeGate) else None
+
     offset = 0
-    while not killed:
+    while not killed and not (stop_event and stop_event.is_set()):
         try:
-            samples = samples_queue.get(timeout=0.5)  # 使用超时避免阻塞
+            timestamp, samples = samples_queue.get(timeout=0.5)  # 使用超时避免阻塞
+            iteration_start = time.perf_counter()
+            clock.add(timestamp, len(samples))
+            if tracer:
+                tracer.received(timestamp, iteration_start)
+            activated = gate is not None and gate.take_activation()
             # 获取队列中所有已有的元素
             while not samples_queue.empty():
                 try:
-                    additional_samples = samples_queue.get_nowait()
-                    samples = np.concatenate([samples, additional_samples])
+                    timestamp, additional_samples = samples_queue.get_nowait()
+                    clock.add(timestamp, len(additional_samples))
+                    if tracer:
+                        tracer.received(timestamp, iteration_start)
+                    if gate is not None and gate.take_activation():
+                        # 之前取出的是上一次唤醒剩余的音频，与保留的音频不连续
+                        activated = True
+                        samples = additional_samples
+                    else:
+                        samples = np.concatenate([samples, additional_samples])
                 except:
                     break
         except:
             continue
 
+        if activated:
+            # 重新唤醒：上一次唤醒结束时的VAD状态、缓存的音频和推测解码都已过时，未结束的句子按截断处理
+            vad.reset()
+            if speculation:
+                speculation.discard()
+            vad_samples = 0
+            if started:
+                printer.on_endpoint(clock.time_at(buffer_start), clock.time_at(buffer_start + len(buffer)))
+                if tracer:
+                    tracer.end_utterance(printer.prev_result, clock.chunk_timestamp(buffer_start))
+            buffer = np.zeros(0, dtype=np.float32)
+            buffer_start = clock.total_samples - len(samples)
+            offset = 0
+            started = False
+            start_time = None
+
+        # 音频进入识别器时统一转换为float32
+        samples = to_float32_samples(samples)
         buffer = np.concatenate([buffer, samples])
-        while offset + window_size < len(buffer):
-            vad.accept_waveform(buffer[offset : offset + window_size])
+        # 所有完整的窗口在一个紧凑的循环中逐个送入VAD。sherpa_onnx 的VAD对一次调用中的所有窗口
+        # 只做一次开始/结束判断（各窗口的结果取或），并按调用末尾的位置计算句子的开始/结束，
+        # 多个窗口合并为一次调用会使分句位置偏移，因此仍然每个窗口调用一次，循环中不做其他工作。
+        # 这一批的窗口在同一时刻处理，在批末检查 is_speech_detected 与逐窗口检查得到的开始状态和开始时间相同；
+        # 推测解码的能量判断按 (窗口数, 窗口长度) 的视图一次算出。
+        # 启用时间线追踪时仍然逐窗口记录 vad window 事件
+        num_windows = max(len(buffer) - offset - 1, 0) // window_size
+        if num_windows:
+            end = offset + num_windows * window_size
+            vad_shift = buffer_start + offset - vad_samples
+            accept_waveform = vad.accept_waveform
+            if tracer:
+                for window_offset in range(offset, end, window_size):
+                    window_start = time.perf_counter()
+                    accept_waveform(buffer[window_offset : window_offset + window_size])
+                    tracer.span("vad window", window_start)
+            else:
+                for window_offset in range(offset, end, window_size):
+                    accept_waveform(buffer[window_offset : window_offset + window_size])
+            vad_samples += num_windows * window_size
+            # 批内不知道语音从哪个窗口开始，推测解码只考虑批开始时已经检测到语音的情况
+            started_before_batch = started
             if not started and vad.is_speech_detected():
                 started = True
                 last_update_time = time.time()
                 start_time = time.time()
-            offset += window_size
+                if tracer:
+                    tracer.begin_utterance()
+            if speculation:
+                trigger = speculation.observe(buffer[offset:end].reshape(num_windows, window_size),
+                                              started_before_batch)
+                if trigger is not None:
+                    speculation_end = offset + (trigger + 1) * window_size
+                    speculation.start(buffer[:speculation_end], buffer_start + speculation_end)
+                    # 推测解码代替这一轮的临时结果解码，CPU占用与原来的解码节奏相当
+                    last_update_time = time.time()
+            offset = end
 
         if not started:
             if len(buffer) > 10 * window_size:
                 offset -= len(buffer) - 10 * window_size
+                buffer_start += len(buffer) - 10 * window_size
                 buffer = buffer[-10 * window_size :]
 
-        if started and time.time() - last_update_time > 0.2:
+        if started and time.time() - last_update_time > 0.2 and not (speculation and speculation.busy):
+            decode_start = time.perf_counter()
             stream = recognizer.create_stream()
             stream.accept_waveform(sample_rate, buffer)
             recognizer.decode_stream(stream)
             text = stream.result.text.strip()
+            if tracer:
+                tracer.span("partial decode", decode_start, seconds=round(len(buffer) / sample_rate, 2))
             if text:
                 printer.do_print(text)
                 # display.update_text(text)
@@ -288,34 +580,178 @@ def main():
 
         while not vad.empty():
             # In general, this while loop is executed only once
-            stream = recognizer.create_stream()
-            stream.accept_waveform(sample_rate, vad.front.samples)
-
+            decode_start = time.perf_counter()
+            segment_start = vad.front.start + vad_shift
+            segment_end = segment_start + len(vad.front.samples)
+
+            text = speculation.take(segment_end) if speculation else None
+            speculative = text is not None
+            if not speculative:
+                stream = recognizer.create_stream()
+                stream.accept_waveform(sample_rate, vad.front.samples)
+                recognizer.decode_stream(stream)
+                text = stream.result.text.strip()
             vad.pop()
-            recognizer.decode_stream(stream)
-
-            text = stream.result.text.strip()
+            if tracer:
+                tracer.span("final decode", decode_start, seconds=round((segment_end - segment_start) / sample_rate, 2),
+                            speculative=speculative)
 
             # display.update_text(text)
             printer.do_print(text)
 
-            buffer = []
+            buffer = np.zeros(0, dtype=np.float32)
+            buffer_start = clock.total_samples
             offset = 0
             started = False
             start_time = None
 
             # display.finalize_current_sentence()
             # display.display()
-            printer.on_endpoint()
+            printer.on_endpoint(clock.time_at(segment_start), clock.time_at(segment_end))
+            if tracer:
+                tracer.end_utterance(text, clock.chunk_timestamp(segment_start))
 
         if start_time and time.time() - start_time > force_max_speech_duration:
             print("大于强制截断时间！", file=sys.stderr)
             vad.reset()
-            buffer = []
+            if speculation:
+                speculation.discard()
+            vad_samples = 0
+            printer.on_endpoint(clock.time_at(buffer_start), clock.time_at(buffer_start + len(buffer)))
+            if tracer:
+                tracer.end_utterance(printer.prev_result, clock.chunk_timestamp(buffer_start))
+            buffer = np.zeros(0, dtype=np.float32)
+            buffer_start = clock.total_samples
             offset = 0
             started = False
             start_time = None
-            printer.on_endpoint()
+
+        if tracer:
+            tracer.span("process", iteration_start)
+
+
+def main():
+    sys.stdout.reconfigure(encoding='utf-8')
+    sys.stderr.reconfigure(encoding='utf-8')
+    args = get_args()
+    p_temp = pyaudio.PyAudio()
+
+    # 命令行指定的设备 > 保存的设备配置 > 弹出选择框
+    selected_device_indices = choose_input_devices(p_temp, args)
+
+    if not selected_device_indices:
+        print("没有任何输入设备！", file=sys.stderr)
+        p_temp.terminate()
+        sys.exit(0)
+
+    # 如果你想要选择其他的输入设备，请解除下面这行的注释，并将 xxx 改为设备的序号
+    # selected_device_indices = [xxx]
+    # 注意要选设备结尾的in大于零的，比如 (2 in, 0 out) 表示两声道输入，没有输出声道，说明是录音设备。
+    # 如果想要识别系统声音，尝试启用"立体声混音"，并设置识别设备为它。
+
+    # 显示所有选中的设备
+    device_names = []
+    for idx in selected_device_indices:
+        try:
+            device_name = p_temp.get_device_info_by_index(idx)['name']
+        except Exception:
+            device_name = f"设备{idx}"
+        device_names.append(f"{idx}: {device_name}")
+
+    # 关闭临时的PyAudio实例
+    p_temp.terminate()
+
+    if len(selected_device_indices) == 1:
+        print(f'使用输入设备: {device_names[0]}', file=sys.stderr)
+    else:
+        print(f'使用 {len(selected_device_indices)} 个输入设备:', file=sys.stderr)
+        for name in device_names:
+            print(f'  - {name}', file=sys.stderr)
+
+    # 创建进程间通信的队列和停止事件
+    global samples_queue, stop_event, recording_process, tracer
+    samples_queue = multiprocessing.Queue()
+    stop_event = multiprocessing.Event()
+    start_event = multiprocessing.Event()
+    control_queue = multiprocessing.Queue()
+    trace_queue = multiprocessing.Queue() if args.utterance_trace else None
+
+    # 使用子进程而不是线程进行录音。子进程在加载模型之前启动，解释器启动、导入和PortAudio初始化
+    # 与模型加载同时进行；start_event 置位之前不打开设备，重启脚本时首个音频块不再等待这些步骤
+    recording_process = multiprocessing.Process(
+        target=start_recording,
+        args=(selected_device_indices, samples_queue, stop_event, args.mix_mode, args.debug_save_audio, args.record_trace,
+              args.sample_format, control_queue),
+        kwargs={"capture_cpus": args.capture_cpus, "gc_tuning": not args.no_gc_tuning, "trace_queue": trace_queue,
+                "start_event": start_event}
+    )
+    recording_process.start()
+
+    try:
+        prepare_models(args)
+        assert_file_exists(args.tokens)
+        assert_file_exists(args.silero_vad_model)
+        assert_file_exists(args.sense_voice)
+
+        # 先加载模型（包括首次运行的模型校验和推理配置的自动测定），再开始录音：
+        # 否则加载期间采集的音频积压在队列中，识别器就绪后要先处理这些过时的音频，测定也会与采集争抢CPU
+        print("正在启动识别器，请稍后", file=sys.stderr)
+        recognizer = load_recognizer(args)
+        print(f"推理线程数: {args.num_threads}，VAD线程数: {args.vad_threads}", file=sys.stderr)
+    except BaseException:
+        # 加载失败或被中断时让等待中的录音子进程直接退出
+        stop_event.set()
+        raise
+    start_event.set()
+
+    if trace_queue is not None:
+        tracer = UtteranceTracer(args.utterance_trace, trace_queue)
+        print(f"时间线追踪写入 {args.utterance_trace}", file=sys.stderr)
+    print(f"混音模式: {args.mix_mode}", file=sys.stderr)
+
+    # 录音子进程启动之后再绑定本进程（子进程会继承父进程的绑定），已经创建的推理线程也一起绑定
+    if args.decode_cpus and set_cpu_affinity(args.decode_cpus):
+        print(f"识别进程绑定到CPU核心 {args.decode_cpus}", file=sys.stderr)
+
+    # 运行中可以通过标准输入增加或移除采集设备（add <设备序号> / remove <设备序号>），无需重新加载模型
+    start_control_reader(control_queue)
+
+    print("识别已启动，请说话", file=sys.stderr)
+
+    # display = sherpa_onnx.Display()
+    global history, translator
+    if args.history_dir:
+        history = TranscriptHistory(args.history_dir)
+        print(f"识别结果写入历史记录: {args.history_dir}", file=sys.stderr)
+    alerter = None
+    if args.keywords:
+        keywords = load_keywords(args.keywords)
+        alerter = KeywordAlerter(keywords)
+        print(f"关键词提醒: {len(keywords)} 个关键词", file=sys.stderr)
+    printer = MyPrinter(history, ", ".join(device_names), alerter)
+    if args.translate:
+        translator = Translator(create_backend(args.translate), printer.print_translation,
+                                source=args.translate_source, target=args.translate_target)
+        printer.translator = translator
+        print(f"翻译: {args.translate}，{args.translate_source} -> {args.translate_target}", file=sys.stderr)
+
+    # 唤醒词门控：识别主循环从门控队列读取，唤醒前识别器不做任何计算
+    global gc_monitor, wake_gate
+    input_queue = samples_queue
+    if args.wake_keywords:
+        for f in [args.wake_keywords, args.kws_encoder, args.kws_decoder, args.kws_joiner, args.kws_tokens]:
+            assert_file_exists(f)
+        wake_gate = WakeGate(samples_queue, create_keyword_spotter(sherpa_onnx, args),
+                             args.wake_pre_roll, args.wake_timeout)
+        printer.gate = wake_gate
+        input_queue = wake_gate
+        print(f"唤醒词门控: {args.wake_keywords}，等待唤醒词", file=sys.stderr)
+
+    gc_monitor = GcMonitor()
+    if not args.no_gc_tuning:
+        tune_gc()
+
+    run_recognition(args, recognizer, input_queue, printer, tracer=tracer)
 
 
 if __name__ == "__main__":
@@ -323,5 +759,20 @@ if __name__ == "__main__":
         main()
     except KeyboardInterrupt:
         killed = True
-        cleanup_recording_process(stop_event, recording_process)
+        cleanup_recording_process(stop_event, recording_process, samples_queue)
+        if history:
+            history.close()
+        if translator:
+            translator.close()
+            print(translator.stats.format_summary(), file=sys.stderr)
+        if gc_monitor:
+            print(f"识别进程 {gc_monitor.format_summary()}", file=sys.stderr)
+        if wake_gate:
+            wake_gate.close()
+            print(wake_gate.stats.format_summary(), file=sys.stderr)
+        if speculation:
+            print(speculation.stats.format_summary(), file=sys.stderr)
+        if tracer:
+            tracer.close()
+            print(f"时间线已保存到 {tracer.path}", file=sys.stderr)
         print("\n检测到 Ctrl + C. 正在退出", file=sys.stderr)
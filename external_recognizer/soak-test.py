@@ -0,0 +1,447 @@
+#!/usr/bin/env python3
+#
+# Copyright (c)  2025  Xiaomi Corporation
+
+"""
+长时间运行的浸泡测试（soak test），检查内存和延迟是否随时间漂移。
+
+用合成音频或循环播放的WAV文件，以 --speed 倍实时速度驱动识别脚本的识别主循环
+（run_recognition），模拟数小时的运行。定期采样进程RSS、tracemalloc 统计的Python内存
+及增长最多的分配位置、输入队列深度和处理延迟百分位；预热结束后，如果任何一项呈上升趋势，
+以非零状态退出。
+
+识别脚本本身的参数放在 -- 之后原样传给脚本：
+
+python soak-test.py --script sense-voice --hours 4 --speed 20 -- --num-threads 2
+python soak-test.py --script zipformer --wav test.wav --report soak.json -- --decode-every 2
+"""
+import argparse
+import importlib.util
+import json
+import os
+import queue
+import sys
+import threading
+import time
+import tracemalloc
+import wave
+from collections import deque
+
+script_path = os.path.realpath(__file__)
+script_dir = os.path.dirname(script_path)
+sys.path.insert(0, script_dir)
+
+import numpy as np
+
+from audio_mixer import sample_rate, samples_time, resample_fft
+from synthetic_audio import synthetic_audio
+
+scripts = {
+    "sense-voice": os.path.join(script_dir, "simulate-streaming-sense-voice.py"),
+    "zipformer": os.path.join(script_dir, "streaming-with-endpoint-detection.py"),
+}
+
+# 判断上升趋势时各指标允许的绝对增长量，避免在很小的数值上因噪声误报
+metric_floors = {
+    "rss_bytes": 8 * 1024 * 1024,
+    "traced_bytes": 2 * 1024 * 1024,
+    "queue_depth": 5,
+    "latency_p50_ms": 20.0,
+    "latency_p99_ms": 50.0,
+}
+
+
+def get_args():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+
+    parser.add_argument(
+        "--script",
+        type=str,
+        default="sense-voice",
+        choices=sorted(scripts.keys()),
+        help="要测试的识别脚本",
+    )
+
+    parser.add_argument(
+        "--wav",
+        type=str,
+        default="",
+        help="循环播放的WAV文件；不指定时使用合成音频",
+    )
+
+    parser.add_argument(
+        "--hours",
+        type=float,
+        default=4.0,
+        help="模拟的音频时长（小时）",
+    )
+
+    parser.add_argument(
+        "--speed",
+        type=float,
+        default=10.0,
+        help="送入音频的速度（实时速度的倍数）",
+    )
+
+    parser.add_argument(
+        "--warmup",
+        type=float,
+        default=600.0,
+        help="预热的模拟时长（秒），预热期间的采样不参与趋势判断",
+    )
+
+    parser.add_argument(
+        "--sample-interval",
+        type=float,
+        default=60.0,
+        help="每隔多少秒模拟时长采样一次指标",
+    )
+
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.1,
+        help="最后三分之一采样的中位数比前三分之一高出该比例（且超过绝对阈值）时视为上升趋势",
+    )
+
+    parser.add_argument(
+        "--top-allocators",
+        type=int,
+        default=5,
+        help="每次采样输出相对预热结束时增长最多的前N个分配位置，0表示不启用 tracemalloc",
+    )
+
+    parser.add_argument(
+        "--report",
+        type=str,
+        default="",
+        help="把所有采样和判断结果保存为JSON文件",
+    )
+
+    parser.add_argument(
+        "script_args",
+        nargs=argparse.REMAINDER,
+        help="传给识别脚本的参数（放在 -- 之后）",
+    )
+
+    return parser.parse_args()
+
+
+def rss_bytes():
+    """当前进程的常驻内存（字节），包括 onnxruntime 等原生库分配的内存"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+
+    if os.path.exists("/proc/self/statm"):
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [
+                ("cb", wintypes.DWORD),
+                ("PageFaultCount", wintypes.DWORD),
+                ("PeakWorkingSetSize", ctypes.c_size_t),
+                ("WorkingSetSize", ctypes.c_size_t),
+                ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                ("PagefileUsage", ctypes.c_size_t),
+                ("PeakPagefileUsage", ctypes.c_size_t),
+            ]
+
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        handle = ctypes.windll.kernel32.GetCurrentProcess()
+        ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb)
+        return counters.WorkingSetSize
+
+    return 0
+
+
+def load_script(name):
+    """以模块方式导入识别脚本（不执行其 main）"""
+    spec = importlib.util.spec_from_file_location(f"soak_{name.replace('-', '_')}", scripts[name])
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def read_wav(path):
+    """读取16位WAV并转换为16kHz单声道float32"""
+    with wave.open(path, "rb") as f:
+        assert f.getsampwidth() == 2, f"{path} 不是16位WAV文件"
+        data = np.frombuffer(f.readframes(f.getnframes()), dtype=np.int16)
+        channels = f.getnchannels()
+        rate = f.getframerate()
+    samples = data.reshape(-1, channels).mean(axis=1, dtype=np.float32) / 32768
+    if rate != sample_rate:
+        samples = resample_fft(samples, int(len(samples) * sample_rate / rate))
+    return samples.astype(np.float32)
+
+
+class TimedQueue:
+    """
+    在识别主循环与送入线程之间传递音频块，并测量每个音频块从送入到处理完成的延迟
+
+    主循环每次阻塞等待新的音频时，说明之前取出的音频块都已处理完毕。
+    """
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.taken = []
+        self.latencies = deque()
+        self.lock = threading.Lock()
+
+    def put(self, item):
+        self.queue.put((time.perf_counter(), item))
+
+    def _complete_taken(self):
+        now = time.perf_counter()
+        with self.lock:
+            self.latencies.extend((put_time, now - put_time) for put_time in self.taken)
+        self.taken = []
+
+    def get(self, block=True, timeout=None):
+        if block:
+            self._complete_taken()
+        put_time, item = self.queue.get(block, timeout)
+        self.taken.append(put_time)
+        return item
+
+    def get_nowait(self):
+        return self.get(block=False)
+
+    def empty(self):
+        return self.queue.empty()
+
+    def qsize(self):
+        return self.queue.qsize()
+
+    def pop_latencies(self, exclude_before=0.0):
+        """取出已完成音频块的延迟，忽略 exclude_before 之前送入的音频块"""
+        with self.lock:
+            latencies = [latency for put_time, latency in self.latencies if put_time >= exclude_before]
+            self.latencies.clear()
+        return latencies
+
+
+class CountingPrinter:
+    """不输出识别结果，只统计临时结果和句子数"""
+    def __init__(self):
+        self.partials = 0
+        self.sentences = 0
+
+    def do_print(self, result):
+        self.partials += 1
+
+    def on_endpoint(self, start=None, end=None):
+        self.sentences += 1
+
+
+def feed_audio(samples_queue, audio, total_seconds, speed, stop_event, progress):
+    """以 speed 倍实时速度循环送入音频，progress[0] 记录已送入的模拟时长"""
+    chunk = int(sample_rate * samples_time)
+    interval = samples_time / speed
+    position = 0
+    next_time = time.perf_counter()
+    # 与录音进程相同，每个音频块附带采集时间戳（按模拟时长推算）
+    feed_start = time.time()
+    while progress[0] < total_seconds and not stop_event.is_set():
+        if position + chunk > len(audio):
+            samples = np.concatenate([audio[position:], audio[:position + chunk - len(audio)]])
+        else:
+            samples = audio[position:position + chunk]
+        position = (position + chunk) % len(audio)
+
+        samples_queue.put((feed_start + progress[0], samples.copy()))
+        progress[0] += samples_time
+
+        next_time += interval
+        delay = next_time - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+
+def take_sample(simulated_seconds, wall_seconds, samples_queue, printer, baseline_snapshot, top_allocators,
+                exclude_before=0.0):
+    latencies = np.array(samples_queue.pop_latencies(exclude_before)) * 1000
+    sample = {
+        "simulated_seconds": simulated_seconds,
+        "wall_seconds": wall_seconds,
+        "rss_bytes": rss_bytes(),
+        "queue_depth": samples_queue.qsize(),
+        "latency_p50_ms": float(np.percentile(latencies, 50)) if len(latencies) else 0.0,
+        "latency_p99_ms": float(np.percentile(latencies, 99)) if len(latencies) else 0.0,
+        "chunks": len(latencies),
+        "partials": printer.partials,
+        "sentences": printer.sentences,
+    }
+    if tracemalloc.is_tracing():
+        sample["traced_bytes"] = tracemalloc.get_traced_memory()[0]
+        if baseline_snapshot is not None:
+            stats = tracemalloc.take_snapshot().compare_to(baseline_snapshot, "lineno")
+            sample["top_allocators"] = [
+                {"location": str(stat.traceback), "size_diff": stat.size_diff, "count_diff": stat.count_diff}
+                for stat in stats[:top_allocators]
+            ]
+    return sample
+
+
+def detect_trend(values, times, tolerance, floor):
+    """
+    判断一组采样是否呈上升趋势：最后三分之一的中位数比前三分之一高出 tolerance 比例
+    且超过绝对阈值 floor，同时线性回归斜率为正
+
+    Returns:
+        (rising, detail)
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) < 6:
+        return False, {"samples": int(len(values))}
+
+    third = len(values) // 3
+    first = float(np.median(values[:third]))
+    last = float(np.median(values[-third:]))
+    slope = float(np.polyfit(np.asarray(times, dtype=np.float64) / 3600, values, 1)[0])
+    rising = last - first > max(abs(first) * tolerance, floor) and slope > 0
+    return rising, {"first": first, "last": last, "slope_per_hour": slope, "samples": int(len(values))}
+
+
+def format_bytes(n):
+    return f"{n / 1024 / 1024:.1f}MB"
+
+
+def main():
+    sys.stdout.reconfigure(encoding='utf-8')
+    sys.stderr.reconfigure(encoding='utf-8')
+    args = get_args()
+
+    script_args = args.script_args
+    if script_args and script_args[0] == "--":
+        script_args = script_args[1:]
+
+    module = load_script(args.script)
+    sys.argv = [scripts[args.script]] + script_args
+    script_args = module.get_args()
+
+    print(f"正在加载识别器: {args.script}", file=sys.stderr)
+    recognizer = module.load_recognizer(script_args)
+
+    if args.wav:
+        audio = read_wav(args.wav)
+        print(f"循环播放 {args.wav}，时长 {len(audio) / sample_rate:.1f} 秒", file=sys.stderr)
+    else:
+        audio = synthetic_audio()
+
+    total_seconds = args.hours * 3600
+    samples_queue = TimedQueue()
+    printer = CountingPrinter()
+    stop_event = threading.Event()
+    progress = [0.0]
+
+    if args.top_allocators > 0:
+        tracemalloc.start()
+
+    recognition_thread = threading.Thread(
+        target=module.run_recognition,
+        args=(script_args, recognizer, samples_queue, printer, stop_event),
+        daemon=True,
+    )
+    feeder_thread = threading.Thread(
+        target=feed_audio,
+        args=(samples_queue, audio, total_seconds, args.speed, stop_event, progress),
+        daemon=True,
+    )
+    recognition_thread.start()
+    feeder_thread.start()
+    start_time = time.perf_counter()
+
+    print(f"模拟 {args.hours} 小时，速度 {args.speed}x，预计耗时 {total_seconds / args.speed / 60:.1f} 分钟",
+          file=sys.stderr)
+
+    samples = []
+    baseline_snapshot = None
+    next_sample = args.sample_interval
+    # 采样（尤其是 tracemalloc 快照）会持有GIL、暂停识别主循环，
+    # 受其影响的音频块不计入下一次采样的延迟
+    exclude_before = 0.0
+    try:
+        while feeder_thread.is_alive() or not samples_queue.empty():
+            if not recognition_thread.is_alive():
+                print("识别主循环意外退出", file=sys.stderr)
+                sys.exit(2)
+            if progress[0] < next_sample and feeder_thread.is_alive():
+                time.sleep(0.05)
+                continue
+
+            if baseline_snapshot is None and progress[0] >= args.warmup and tracemalloc.is_tracing():
+                baseline_snapshot = tracemalloc.take_snapshot()
+
+            sample_start = time.perf_counter()
+            sample = take_sample(progress[0], sample_start - start_time, samples_queue, printer,
+                                 baseline_snapshot, args.top_allocators, exclude_before)
+            sample_end = time.perf_counter()
+            exclude_before = sample_end + (sample_end - sample_start)
+            samples.append(sample)
+            print(f"[{sample['simulated_seconds'] / 3600:.2f}h] RSS={format_bytes(sample['rss_bytes'])} "
+                  f"traced={format_bytes(sample.get('traced_bytes', 0))} 队列={sample['queue_depth']} "
+                  f"延迟p50={sample['latency_p50_ms']:.1f}ms p99={sample['latency_p99_ms']:.1f}ms "
+                  f"句子={sample['sentences']}", file=sys.stderr)
+            for allocator in sample.get("top_allocators", []):
+                print(f"    {allocator['size_diff'] / 1024:+.1f}KB ({allocator['count_diff']:+d}) "
+                      f"{allocator['location']}", file=sys.stderr)
+
+            while next_sample <= progress[0]:
+                next_sample += args.sample_interval
+            if not feeder_thread.is_alive():
+                break
+    except KeyboardInterrupt:
+        print("\n检测到 Ctrl + C，根据已有采样判断", file=sys.stderr)
+    finally:
+        stop_event.set()
+
+    measured = [s for s in samples if s["simulated_seconds"] >= args.warmup]
+    times = [s["simulated_seconds"] for s in measured]
+    trends = {}
+    failed = []
+    for metric, floor in metric_floors.items():
+        if not all(metric in s for s in measured):
+            continue
+        rising, detail = detect_trend([s[metric] for s in measured], times, args.tolerance, floor)
+        trends[metric] = dict(detail, rising=rising)
+        if rising:
+            failed.append(metric)
+
+    for metric, detail in trends.items():
+        if "first" not in detail:
+            print(f"{metric}: 采样不足（{detail['samples']}），无法判断趋势", file=sys.stderr)
+            continue
+        status = "上升" if detail["rising"] else "正常"
+        print(f"{metric}: {status}，前段 {detail['first']:.1f} -> 后段 {detail['last']:.1f}，"
+              f"斜率 {detail['slope_per_hour']:.1f}/小时", file=sys.stderr)
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump({"script": args.script, "speed": args.speed, "hours": args.hours,
+                       "samples": samples, "trends": trends, "failed": failed},
+                      f, ensure_ascii=False, indent=2)
+
+    if failed:
+        print(f"浸泡测试失败，呈上升趋势的指标: {', '.join(failed)}", file=sys.stderr)
+        if "queue_depth" in failed:
+            print("输入队列持续积压，可能是 --speed 超过了识别速度", file=sys.stderr)
+        sys.exit(1)
+    print("浸泡测试通过", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
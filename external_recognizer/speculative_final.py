@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+#
+# Copyright (c)  2025  Xiaomi Corporation
+
+"""
+SenseVoice 识别循环的推测性最终解码。
+
+Silero VAD 要在语音结束后再检测到 min_silence_duration 的静音才关闭句子，之后才开始同步的最终解码。
+这里在尾部静音一开始（按窗口能量判断，sherpa_onnx 的VAD不提供逐窗口的语音概率）就在后台线程中
+解码已缓存的整句音频：
+  - 句子关闭时没有新的语音，且句子的结束位置在推测解码的音频范围内：直接采用推测结果，
+    最终结果提前约一次解码的时间
+  - 静音期间又出现语音：丢弃推测结果（正在进行的解码无法中断，其耗时计入浪费的解码时间）
+
+同一时刻最多只有一个解码在使用 recognizer：被丢弃的解码还在运行时不开始新的推测解码，
+调用方在同步解码（临时结果或最终结果）之前要等它结束（见 busy、wait_idle），
+因此解码占用的线程数不超过 --num-threads。
+
+能量判断使用 adaptive_endpoint.NoiseFloor，与 AdaptiveEndpointer 相同。
+
+"提前约一次解码的时间"目前只在 benchmarks/bench_speculative_final.py 的替身识别器上测过，
+还没有用真实的 SenseVoice 模型验证。
+"""
+
+import math
+import threading
+import time
+
+import numpy as np
+
+from adaptive_endpoint import NoiseFloor
+from audio_mixer import sample_rate
+
+
+class SpeculationStats:
+    def __init__(self):
+        self.started = 0
+        self.committed = 0
+        self.discarded = 0
+        self.missed = 0  # 句子关闭时没有可用的推测结果，走同步解码
+        self.used_seconds = 0.0  # 被采用的推测解码耗时
+        self.wasted_seconds = 0.0  # 被丢弃的推测解码耗时
+        self.saved_seconds = 0.0  # 句子关闭时推测解码已经完成的部分，即最终结果提前的时间
+
+    def format_summary(self):
+        finals = self.committed + self.missed
+        saved = self.saved_seconds / self.committed * 1000 if self.committed else 0
+        return (f"推测解码: 启动 {self.started} 次，采用 {self.committed}/{finals} 句，丢弃 {self.discarded} 次；"
+                f"最终结果平均提前 {saved:.0f} ms；额外解码 {self.wasted_seconds:.2f} s"
+                f"（采用的推测解码共 {self.used_seconds:.2f} s）")
+
+
+class SpeculativeJob:
+    """后台线程中的一次推测解码"""
+    def __init__(self, recognizer, samples, end_position):
+        self.end_position = end_position  # 解码音频在整个音频流中的结束位置
+        self.text = ""
+        self.seconds = 0.0
+        self.done = threading.Event()
+        self.thread = threading.Thread(target=self._run, args=(recognizer, samples), daemon=True)
+        self.thread.start()
+
+    def _run(self, recognizer, samples):
+        start = time.perf_counter()
+        try:
+            stream = recognizer.create_stream()
+            stream.accept_waveform(sample_rate, samples)
+            recognizer.decode_stream(stream)
+            self.text = stream.result.text.strip()
+        finally:
+            self.seconds = time.perf_counter() - start
+            self.done.set()
+
+
+class SpeculativeFinal:
+    """
+    Args:
+        recognizer: sherpa_onnx.OfflineRecognizer
+        silence_windows: 连续这么多个VAD窗口没有语音即视为尾部静音开始
+        tolerance: 句子的结束位置最多可以超出推测解码音频的采样数（VAD的窗口粒度）
+    """
+    def __init__(self, recognizer, silence_windows=1, tolerance=1024):
+        self.recognizer = recognizer
+        self.silence_windows = silence_windows
+        self.tolerance = tolerance
+        self.noise_floor = NoiseFloor()
+        self.silent_run = 0
+        self.job = None
+        self.discarded_jobs = []  # 已丢弃但还在运行的解码，完成后计入浪费的时间
+        self.stats = SpeculationStats()
+
+    @property
+    def busy(self):
+        """
+        有推测解码正在使用 recognizer（包括已丢弃但还没结束的），此时跳过临时结果的解码：
+        尚未丢弃的推测解码本身就是更新的结果，已丢弃的还在占用解码线程
+        """
+        self._collect()
+        return self.job is not None or bool(self.discarded_jobs)
+
+    def wait_idle(self):
+        """等待已丢弃的推测解码结束，调用方在同步解码之前调用"""
+        for job in self.discarded_jobs:
+            job.done.wait()
+        self._collect()
+
+    def observe(self, windows, started):
+        """
+        每批送入VAD的窗口调用一次
+
+        Args:
+            windows: 形状为 (窗口数, 窗口长度) 的float32数组
+            started: 这一批窗口之前VAD是否已检测到语音；为 False 时只跟踪静音，不开始推测解码。
+                语音开始所在的那一批中已经满足条件的静音，在下一批的第一个静音窗口开始推测解码
+
+        Returns:
+            应该在哪个窗口之后开始推测解码（窗口序号），不需要时返回 None
+        """
+        self._collect()
+        trigger = None
+        # 一次numpy调用算出所有窗口的能量，逐窗口只做标量运算
+        energies = np.einsum("ij,ij->i", windows, windows).tolist()
+        window_size = windows.shape[1]
+        for i, energy in enumerate(energies):
+            if self.noise_floor.is_speech(math.sqrt(energy / window_size) + 1e-10):
+                self.silent_run = 0
+                trigger = None
+                if self.job is not None:
+                    self.discard()
+                continue
+            self.silent_run += 1
+            if (started and self.job is None and not self.discarded_jobs
+                    and self.silent_run >= self.silence_windows and trigger is None):
+                trigger = i
+        return trigger
+
+    def start(self, samples, end_position):
+        """开始解码 samples（整句已缓存的音频），end_position 为其在音频流中的结束位置"""
+        self.job = SpeculativeJob(self.recognizer, np.copy(samples), end_position)
+        self.stats.started += 1
+
+    def take(self, segment_end):
+        """
+        VAD关闭句子时调用
+
+        Returns:
+            推测解码的结果；没有可用的推测结果时返回 None，调用方应同步解码。
+            返回 None 之前会等待所有推测解码结束，调用方可以直接使用 recognizer
+        """
+        job = self.job
+        self.job = None
+        if job is None:
+            self.stats.missed += 1
+            self.wait_idle()
+            return None
+        if segment_end > job.end_position + self.tolerance:
+            # 句子包含推测解码之后的语音
+            self.discarded_jobs.append(job)
+            self.stats.discarded += 1
+            self.stats.missed += 1
+            self.wait_idle()
+            return None
+        wait_start = time.perf_counter()
+        job.done.wait()
+        self.stats.committed += 1
+        self.stats.used_seconds += job.seconds
+        self.stats.saved_seconds += max(job.seconds - (time.perf_counter() - wait_start), 0)
+        return job.text
+
+    def discard(self):
+        """丢弃当前的推测解码（又出现语音，或句子被强制截断）"""
+        if self.job is not None:
+            self.discarded_jobs.append(self.job)
+            self.stats.discarded += 1
+            self.job = None
+
+    def _collect(self):
+        if self.discarded_jobs:
+            running = []
+            for job in self.discarded_jobs:
+                if job.done.is_set():
+                    self.stats.wasted_seconds += job.seconds
+                else:
+                    running.append(job)
+            self.discarded_jobs = running
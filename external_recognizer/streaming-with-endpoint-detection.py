@@ -18,6 +18,7 @@ python simulate-streaming.py
 import argparse
 import sys
 import multiprocessing
+import time
 from pathlib import Path
 import os
 
@@ -25,16 +26,29 @@ script_path = os.path.realpath(__file__)
 script_dir = os.path.dirname(script_path)
 sys.path.insert(0, script_dir)
 
-# Import common utilities
-from common_audio_utils import (
-    pyaudio, sherpa_onnx, np,
-    sample_rate, assert_file_exists,
-    start_recording, MyPrinter, select_input_device,
-    get_audio_devices, cleanup_recording_process
-)
+# 录音子进程以spawn方式启动时会以 __mp_main__ 的身份重新导入本脚本，
+# 识别相关的依赖（sherpa_onnx、tkinter、缺少依赖时的pip安装，以及模型下载用到的 http.client/ssl 等）
+# 只在其他情况下导入，录音子进程只需要轻量的 audio_capture / audio_mixer 和 numpy
+if __name__ != "__mp_main__":
+    from common_audio_utils import (
+        pyaudio, sherpa_onnx, np,
+        assert_file_exists, MyPrinter, choose_input_devices
+    )
+    from device_profiles import default_profiles_path
+    from adaptive_endpoint import AdaptiveEndpointer
+    from decode_cadence import DecodeCadence
+    from transcript_history import TranscriptHistory, SampleClock
+    from keyword_alert import KeywordAlerter, load_keywords
+    from translation import Translator, create_backend
+    from model_manager import ModelStore, resolve_model_paths, default_store_path, default_mirror
+    from wake_gate import WakeGate, create_keyword_spotter
+    from utterance_trace import UtteranceTracer
+    from runtime_tuning import GcMonitor, parse_cpu_list, set_cpu_affinity, tune_gc
+    import autotune
+from audio_capture import start_recording, cleanup_recording_process, start_control_reader
+from audio_mixer import sample_rate, to_float32_samples
 
 # 这里已经改了
-model_url = 'https://github.com/k2-fsa/sherpa-onnx/releases/download/asr-models/sherpa-onnx-streaming-zipformer-bilingual-zh-en-2023-02-20.tar.bz2'
 script_parent_dir = os.path.dirname(script_dir)
 model_path = os.path.join(script_parent_dir, "models")
 encoder_path = os.path.join(model_path, "encoder.onnx")
@@ -47,6 +61,13 @@ killed = False
 recording_process = None
 samples_queue = None
 stop_event = None
+endpointer = None
+history = None
+translator = None
+gc_monitor = None
+wake_gate = None
+tracer = None
+endpoint_stats_path = ""
 
 
 def get_args():
@@ -92,8 +113,8 @@ def get_args():
     parser.add_argument(
         "--provider",
         type=str,
-        default="cpu",
-        help="Valid values: cpu, cuda, coreml",
+        default=None,
+        help="Valid values: cpu, cuda, coreml. If not given, use the autotune cache, or cpu",
     )
 
     parser.add_argument(
@@ -148,8 +169,31 @@ def get_args():
     parser.add_argument(
         "--device",
         type=int,
-        default=-1,
-        help="Device index to use for recording. -1 means show device selection dialog",
+        nargs="+",
+        default=None,
+        help="Device indices to use for recording. If not given or negative (e.g. -1), use the saved --profile "
+        "or show the device selection dialog",
+    )
+
+    parser.add_argument(
+        "--profile",
+        type=str,
+        default="default",
+        help="Name of the saved device profile. Devices are matched by name; if any cannot be found, "
+        "the selection dialog is shown and the choice is saved to this profile",
+    )
+
+    parser.add_argument(
+        "--device-profiles",
+        type=str,
+        default=default_profiles_path,
+        help="Path to the device profiles file",
+    )
+
+    parser.add_argument(
+        "--save-profile",
+        action="store_true",
+        help="Save the devices given by --device to --profile",
     )
 
     parser.add_argument(
@@ -166,21 +210,255 @@ def get_args():
         help="If not empty, save mixed audio to this WAV file path for debugging",
     )
 
+    parser.add_argument(
+        "--record-trace",
+        type=str,
+        default="",
+        help="If not empty, record raw per-device packets with capture timestamps to this trace file (see replay-capture-trace.py)",
+    )
+
+    parser.add_argument(
+        "--utterance-trace",
+        type=str,
+        default="",
+        help="If not empty, write a timeline of per-packet capture, queueing, mixing and IPC plus decoding "
+        "and per-utterance spans to this JSON file (Chrome trace-event format, open with https://ui.perfetto.dev)",
+    )
+
+    parser.add_argument(
+        "--sample-format",
+        type=str,
+        default="float32",
+        choices=["float32", "int16"],
+        help="Sample format used for capture and inter-process transport. int16 uses 2 bytes per sample; samples are converted to float32 once, when they enter the recognizer",
+    )
+
+    parser.add_argument(
+        "--history-dir",
+        type=str,
+        default="",
+        help="If not empty, append every finalized sentence with its audio start/end time and source device to the transcript history in this directory. Use transcript-history.py to query and export it",
+    )
+
+    parser.add_argument(
+        "--keywords",
+        type=str,
+        default="",
+        help="If not empty, read keywords from this file (one per line or comma separated) and notify the UI when a partial result contains one. Each keyword is reported once per sentence",
+    )
+
+    parser.add_argument(
+        "--translate",
+        type=str,
+        default="",
+        help="If not empty, translate every finalized sentence in the background and output the translation as a separate message. Use echo (an offline stand-in backend for testing) or module:Class for a custom backend",
+    )
+
+    parser.add_argument(
+        "--translate-source",
+        type=str,
+        default="auto",
+        help="Source language for translation",
+    )
+
+    parser.add_argument(
+        "--translate-target",
+        type=str,
+        default="en",
+        help="Target language for translation",
+    )
+
+    parser.add_argument(
+        "--wake-keywords",
+        type=str,
+        default="",
+        help="If not empty, enable wake-word gating: only the keyword spotter runs until one of the keywords in this file (sherpa-onnx keywords.txt format) is heard. Requires the --kws-* model files",
+    )
+
+    parser.add_argument(
+        "--kws-encoder",
+        type=str,
+        default="",
+        help="Keyword spotter encoder model",
+    )
+
+    parser.add_argument(
+        "--kws-decoder",
+        type=str,
+        default="",
+        help="Keyword spotter decoder model",
+    )
+
+    parser.add_argument(
+        "--kws-joiner",
+        type=str,
+        default="",
+        help="Keyword spotter joiner model",
+    )
+
+    parser.add_argument(
+        "--kws-tokens",
+        type=str,
+        default="",
+        help="Keyword spotter tokens.txt",
+    )
+
+    parser.add_argument(
+        "--kws-threshold",
+        type=float,
+        default=0.25,
+        help="Keyword trigger threshold; larger is harder to trigger",
+    )
+
+    parser.add_argument(
+        "--kws-score",
+        type=float,
+        default=1.0,
+        help="Keyword boosting score; larger is easier to trigger",
+    )
+
+    parser.add_argument(
+        "--wake-pre-roll",
+        type=float,
+        default=2.0,
+        help="Seconds of audio before the trigger (including the wake word) passed to the recognizer",
+    )
+
+    parser.add_argument(
+        "--wake-timeout",
+        type=float,
+        default=15.0,
+        help="Return to wake-word detection after this many seconds of audio without a new result. Must be longer than the endpoint trailing silence. "
+        "This counts time since the recognition result last changed, not silence: noise that keeps producing new text keeps the recognizer active",
+    )
+
     parser.add_argument(
         "--num-threads",
         type=int,
+        default=None,
+        help="Number of threads for recognition. If not given, use the autotune cache, or 1",
+    )
+
+    parser.add_argument(
+        "--decode-every",
+        type=int,
         default=1,
-        help="Number of threads for recognition",
+        help="Accumulate this many 50 ms chunks before running the decoder",
+    )
+
+    parser.add_argument(
+        "--decode-cadence",
+        type=str,
+        default="fixed",
+        choices=["fixed", "adaptive"],
+        help="fixed: always decode every --decode-every chunks. "
+             "adaptive: decode less often (up to --max-decode-every) while decoding is slow or input backs up",
+    )
+
+    parser.add_argument(
+        "--max-decode-every",
+        type=int,
+        default=8,
+        help="Upper bound of chunks per decode in adaptive cadence mode",
+    )
+
+    parser.add_argument(
+        "--endpointing",
+        type=str,
+        default="static",
+        choices=["static", "adaptive"],
+        help="static: finalize sentences only with the recognizer's trailing-silence rules. "
+             "adaptive: also finalize early once the pause exceeds this speaker's usual "
+             "in-sentence pauses and the partial result has stopped changing",
+    )
+
+    parser.add_argument(
+        "--endpoint-stats",
+        type=str,
+        default="",
+        help="If not empty, write the endpoint latency distribution to this JSON file on exit",
+    )
+
+    parser.add_argument(
+        "--calibrate",
+        action="store_true",
+        help="Time decodes across thread counts and providers, save the fastest to the autotune cache, then run",
+    )
+
+    parser.add_argument(
+        "--calibrate-providers",
+        type=str,
+        default="cpu",
+        help="Comma separated providers to try when calibrating, e.g. cpu,cuda",
+    )
+
+    parser.add_argument(
+        "--autotune-cache",
+        type=str,
+        default=autotune.default_cache_path,
+        help="Path to the autotune cache file",
+    )
+
+    parser.add_argument(
+        "--model-store",
+        type=str,
+        default=default_store_path,
+        help="Model cache. Missing default models are downloaded, verified and extracted here once",
+    )
+
+    parser.add_argument(
+        "--model-mirror",
+        type=str,
+        default=default_mirror,
+        help="Mirror to download models from; the URL is <mirror>/<archive name>",
+    )
+
+    parser.add_argument(
+        "--no-download",
+        action="store_true",
+        help="Do not download missing models, only print where to get them",
+    )
+
+    parser.add_argument(
+        "--thread-budget",
+        type=int,
+        default=0,
+        help="Upper bound of recognition threads. 0 means the number of --decode-cpus if given, otherwise no limit",
+    )
+
+    parser.add_argument(
+        "--capture-cpus",
+        type=parse_cpu_list,
+        default=[],
+        help="CPU cores for the recording process (capture callbacks and mixer), e.g. 0 or 0-1",
+    )
+
+    parser.add_argument(
+        "--decode-cpus",
+        type=parse_cpu_list,
+        default=[],
+        help="CPU cores for the recognition process (decoder threads), e.g. 2-7",
+    )
+
+    parser.add_argument(
+        "--no-gc-tuning",
+        action="store_true",
+        help="Do not freeze the GC and raise its thresholds after loading the model",
     )
 
     return parser.parse_args()
 
 
-def try_download_model(model_paths):
-    for p in model_paths:
-        if not os.path.exists(p):
-            print(f"请下载文件到：{p}", file=sys.stderr)
-            print(f"下载链接：{model_url}", file=sys.stderr)
+def prepare_models(args):
+    """默认路径的模型不存在时使用模型缓存，没有缓存时从镜像下载（--no-download 时只提示下载链接）"""
+    store = ModelStore(args.model_store, args.model_mirror)
+    model_name = "zipformer-bilingual-zh-en-2023-02-20"
+    resolve_model_paths(args, [
+        ("encoder", encoder_path, model_name, "encoder"),
+        ("decoder", decoder_path, model_name, "decoder"),
+        ("joiner", joiner_path, model_name, "joiner"),
+        ("tokens", tokens_txt_path, model_name, "tokens"),
+    ], store, download=not args.no_download)
 
 def create_recognizer(args):
     assert_file_exists(args.encoder)
@@ -212,39 +490,171 @@ def create_recognizer(args):
     return recognizer
 
 
+def queue_backlog(q):
+    """输入队列中等待处理的音频块数（部分平台不支持 qsize）"""
+    try:
+        return q.qsize()
+    except NotImplementedError:
+        return 0
+
+
+def decode_once(recognizer):
+    """Representative decode for autotuning: a fixed 5 s clip fed in capture-sized chunks."""
+    samples = autotune.calibration_audio(sample_rate)
+    chunk = int(sample_rate * 0.05)
+    stream = recognizer.create_stream()
+    for start in range(0, len(samples), chunk):
+        stream.accept_waveform(sample_rate, samples[start:start + chunk])
+        while recognizer.is_ready(stream):
+            recognizer.decode_stream(stream)
+    stream.input_finished()
+    while recognizer.is_ready(stream):
+        recognizer.decode_stream(stream)
+
+
+def load_recognizer(args):
+    """确定推理配置并加载流式识别模型"""
+    model_files = [args.encoder, args.decoder, args.joiner]
+    for f in model_files:
+        assert_file_exists(f)
+    autotune.resolve_inference_config(args, model_files, create_recognizer, decode_once,
+                                      default_num_threads=1,
+                                      max_threads=args.thread_budget or len(args.decode_cpus))
+    assert args.num_threads > 0, args.num_threads
+
+    return create_recognizer(args)
+
+
+def run_recognition(args, recognizer, samples_queue, printer, stop_event=None, tracer=None):
+    """
+    识别主循环：从 samples_queue 读取16kHz音频并进行流式识别
+
+    Args:
+        args: 命令行参数
+        recognizer: load_recognizer 返回的识别器
+        samples_queue: 音频输入队列
+        printer: 输出识别结果的 MyPrinter
+        stop_event: 可选，设置后退出循环（用于测试工具）
+        tracer: 可选，utterance_trace.UtteranceTracer，记录解码和每句话的时间线
+    """
+    # 统计端点延迟；adaptive 模式下还会提前结束句子
+    global endpointer, endpoint_stats_path
+    endpointer = AdaptiveEndpointer(enabled=args.endpointing == "adaptive")
+    endpoint_stats_path = args.endpoint_stats
+    sentence_count = 0
+
+    # 解码节奏：累积若干音频块后才解码一次
+    cadence = DecodeCadence(args.decode_every, args.decode_cadence == "adaptive", args.max_decode_every)
+    pending_audio_seconds = 0.0
+    text = ""
+
+    # 采样位置与采集时间的对应关系，sentence_start 是当前句子在音频流中的开始位置
+    clock = SampleClock()
+    sentence_start = 0
+
+    # 唤醒词门控：每次重新唤醒后从新的识别流开始
+    gate = samples_queue if isinstance(samples_queue, WakeGate) else None
+
+    stream = recognizer.create_stream()
+    while not killed and not (stop_event and stop_event.is_set()):
+        try:
+            timestamp, samples = samples_queue.get(timeout=0.5)  # 使用超时避免阻塞
+        except:
+            continue
+        if gate is not None and gate.take_activation():
+            # 重新唤醒：保留的音频与上一次唤醒结束时的音频不连续，不能接在原来的识别流之后
+            if text:
+                printer.on_endpoint(clock.time_at(sentence_start), clock.time_at(clock.total_samples))
+                if tracer:
+                    tracer.end_utterance(text, clock.chunk_timestamp(sentence_start))
+            recognizer.reset(stream)
+            endpointer.reset()
+            sentence_start = clock.total_samples
+            pending_audio_seconds = 0.0
+            text = ""
+        iteration_start = time.perf_counter()
+        clock.add(timestamp, len(samples))
+        if tracer:
+            tracer.received(timestamp, iteration_start)
+
+        # 将音频数据送入识别流，此时统一转换为float32
+        samples = to_float32_samples(samples)
+        stream.accept_waveform(sample_rate, samples)
+        pending_audio_seconds += len(samples) / sample_rate
+
+        is_endpoint = False
+        if cadence.add_chunk():
+            decode_start = time.perf_counter()
+
+            # 处理所有准备好的音频
+            decoded = False
+            while recognizer.is_ready(stream):
+                recognizer.decode_stream(stream)
+                decoded = True
+
+            # 没有解码新的帧时，端点状态和识别结果都不会变化
+            if decoded:
+                # 检查是否到达端点
+                is_endpoint = recognizer.is_endpoint(stream)
+
+                # 获取识别结果
+                text = recognizer.get_result(stream).strip()
+
+                # 显示结果
+                # display.update_text(result)
+                # display.display()
+                printer.do_print(text)
+                if tracer:
+                    if text and tracer.utterance is None:
+                        tracer.begin_utterance()
+                    tracer.span("final decode" if is_endpoint else "partial decode", decode_start)
+
+            cadence.on_decoded(time.perf_counter() - decode_start, pending_audio_seconds,
+                               queue_backlog(samples_queue))
+            pending_audio_seconds = 0.0
+
+        # 自适应端点：说话人已停顿且结果稳定时提前结束句子
+        early_endpoint = endpointer.update(samples, text) and not is_endpoint
+
+        # 如果到达端点，完成当前句子并重置流
+        if is_endpoint or early_endpoint:
+            if text:
+                # display.finalize_current_sentence()
+                # display.display()
+                # 句子的开始/结束时间：去掉句首和句末的静音
+                start = clock.time_at(sentence_start + int(endpointer.speech_start * sample_rate))
+                end = clock.time_at(clock.total_samples - int(endpointer.trailing_silence * sample_rate))
+                printer.on_endpoint(start, max(start, end))
+                if tracer:
+                    tracer.end_utterance(text, clock.chunk_timestamp(
+                        sentence_start + int(endpointer.speech_start * sample_rate)))
+                sentence_count += 1
+                if sentence_count % 20 == 0:
+                    print(endpointer.stats.format_summary(), file=sys.stderr)
+
+            endpointer.on_endpoint(early_endpoint)
+            recognizer.reset(stream)
+            sentence_start = clock.total_samples
+            text = ""
+
+        if tracer:
+            tracer.span("process", iteration_start)
+
+
 def main():
     sys.stdout.reconfigure(encoding='utf-8')
     sys.stderr.reconfigure(encoding='utf-8')
+    args = get_args()
     p_temp = pyaudio.PyAudio()
 
-    # 获取所有设备信息
-    devices = get_audio_devices(p_temp)
+    # 命令行指定的设备 > 保存的设备配置 > 弹出选择框
+    selected_device_indices = choose_input_devices(p_temp, args)
 
-    if not devices:
+    if not selected_device_indices:
         print("没有任何输入设备！", file=sys.stderr)
         p_temp.terminate()
         sys.exit(0)
 
-    args = get_args()
-
-    print("可用设备:", file=sys.stderr)
-    for idx, device in devices:
-        print(f"  {idx}: {device['name']} (输入通道: {device['maxInputChannels']}, 输出通道: {device['maxOutputChannels']})", file=sys.stderr)
-
-    # 如果命令行没有指定设备，弹出选择框
-    selected_device_indices = []
-    if args.device < 0:
-        selected_device_indices = select_input_device(devices, p_temp)
-        if not selected_device_indices:
-            # 如果没有选择设备，使用默认输入设备
-            default_info = p_temp.get_default_input_device_info()
-            selected_device_indices = [default_info['index']]
-    else:
-        selected_device_indices = [args.device]
-
-    # 关闭临时的PyAudio实例
-    p_temp.terminate()
-
     # 如果你想要选择其他的输入设备，请解除下面这行的注释，并将 xxx 改为设备的序号
     # selected_device_indices = [xxx]
     # 注意要选设备结尾的in大于零的，比如 (2 in, 0 out) 表示两声道输入，没有输出声道，说明是录音设备。
@@ -253,9 +663,15 @@ def main():
     # 显示所有选中的设备
     device_names = []
     for idx in selected_device_indices:
-        device_name = next((d['name'] for i, d in devices if i == idx), f"设备{idx}")
+        try:
+            device_name = p_temp.get_device_info_by_index(idx)['name']
+        except Exception:
+            device_name = f"设备{idx}"
         device_names.append(f"{idx}: {device_name}")
 
+    # 关闭临时的PyAudio实例
+    p_temp.terminate()
+
     if len(selected_device_indices) == 1:
         print(f'使用输入设备: {device_names[0]}', file=sys.stderr)
     else:
@@ -263,64 +679,87 @@ def main():
         for name in device_names:
             print(f'  - {name}', file=sys.stderr)
 
-    try_download_model([args.tokens, args.encoder, args.decoder, args.joiner])
-
-    assert args.num_threads > 0, args.num_threads
-
-    print("正在启动识别器，请稍后", file=sys.stderr)
-    recognizer = create_recognizer(args)
-
-    print("识别已启动，请说话", file=sys.stderr)
-
     # 创建进程间通信的队列和停止事件
-    global samples_queue, stop_event, recording_process
+    global samples_queue, stop_event, recording_process, tracer
     samples_queue = multiprocessing.Queue()
     stop_event = multiprocessing.Event()
+    start_event = multiprocessing.Event()
+    control_queue = multiprocessing.Queue()
+    trace_queue = multiprocessing.Queue() if args.utterance_trace else None
 
-    # 使用子进程而不是线程进行录音
+    # 使用子进程而不是线程进行录音。子进程在加载模型之前启动，解释器启动、导入和PortAudio初始化
+    # 与模型加载同时进行；start_event 置位之前不打开设备，重启脚本时首个音频块不再等待这些步骤
     recording_process = multiprocessing.Process(
         target=start_recording,
-        args=(selected_device_indices, samples_queue, stop_event, args.mix_mode, args.debug_save_audio)
+        args=(selected_device_indices, samples_queue, stop_event, args.mix_mode, args.debug_save_audio, args.record_trace,
+              args.sample_format, control_queue),
+        kwargs={"capture_cpus": args.capture_cpus, "gc_tuning": not args.no_gc_tuning, "trace_queue": trace_queue,
+                "start_event": start_event}
     )
     recording_process.start()
-    print(f"混音模式: {args.mix_mode}", file=sys.stderr)
-
-    # display = sherpa_onnx.Display()
-    printer = MyPrinter()
-
-    stream = recognizer.create_stream()
-    while not killed:
-        try:
-            samples = samples_queue.get(timeout=0.5)  # 使用超时避免阻塞
-        except:
-            continue
 
-        # 将音频数据送入识别流
-        stream.accept_waveform(sample_rate, samples)
-
-        # 处理所有准备好的音频
-        while recognizer.is_ready(stream):
-            recognizer.decode_stream(stream)
-
-        # 检查是否到达端点
-        is_endpoint = recognizer.is_endpoint(stream)
+    try:
+        prepare_models(args)
+
+        # 先加载模型（包括首次运行的模型校验和推理配置的自动测定），再开始录音：
+        # 否则加载期间采集的音频积压在队列中，识别器就绪后要先处理这些过时的音频，测定也会与采集争抢CPU
+        print("正在启动识别器，请稍后", file=sys.stderr)
+        recognizer = load_recognizer(args)
+        print(f"推理线程数: {args.num_threads}", file=sys.stderr)
+    except BaseException:
+        # 加载失败或被中断时让等待中的录音子进程直接退出
+        stop_event.set()
+        raise
+    start_event.set()
+
+    if trace_queue is not None:
+        tracer = UtteranceTracer(args.utterance_trace, trace_queue)
+        print(f"时间线追踪写入 {args.utterance_trace}", file=sys.stderr)
+    print(f"混音模式: {args.mix_mode}", file=sys.stderr)
 
-        # 获取识别结果
-        text = recognizer.get_result(stream).strip()
+    # 录音子进程启动之后再绑定本进程（子进程会继承父进程的绑定），已经创建的推理线程也一起绑定
+    if args.decode_cpus and set_cpu_affinity(args.decode_cpus):
+        print(f"识别进程绑定到CPU核心 {args.decode_cpus}", file=sys.stderr)
 
-        # 显示结果
-        # display.update_text(result)
-        # display.display()
-        printer.do_print(text)
+    # 运行中可以通过标准输入增加或移除采集设备（add <设备序号> / remove <设备序号>），无需重新加载模型
+    start_control_reader(control_queue)
 
-        # 如果到达端点，完成当前句子并重置流
-        if is_endpoint:
-            if text:
-                # display.finalize_current_sentence()
-                # display.display()
-                printer.on_endpoint()
+    print("识别已启动，请说话", file=sys.stderr)
 
-            recognizer.reset(stream)
+    # display = sherpa_onnx.Display()
+    global history, translator
+    if args.history_dir:
+        history = TranscriptHistory(args.history_dir)
+        print(f"识别结果写入历史记录: {args.history_dir}", file=sys.stderr)
+    alerter = None
+    if args.keywords:
+        keywords = load_keywords(args.keywords)
+        alerter = KeywordAlerter(keywords)
+        print(f"关键词提醒: {len(keywords)} 个关键词", file=sys.stderr)
+    printer = MyPrinter(history, ", ".join(device_names), alerter)
+    if args.translate:
+        translator = Translator(create_backend(args.translate), printer.print_translation,
+                                source=args.translate_source, target=args.translate_target)
+        printer.translator = translator
+        print(f"翻译: {args.translate}，{args.translate_source} -> {args.translate_target}", file=sys.stderr)
+
+    # 唤醒词门控：识别主循环从门控队列读取，唤醒前识别器不做任何计算
+    global gc_monitor, wake_gate
+    input_queue = samples_queue
+    if args.wake_keywords:
+        for f in [args.wake_keywords, args.kws_encoder, args.kws_decoder, args.kws_joiner, args.kws_tokens]:
+            assert_file_exists(f)
+        wake_gate = WakeGate(samples_queue, create_keyword_spotter(sherpa_onnx, args),
+                             args.wake_pre_roll, args.wake_timeout)
+        printer.gate = wake_gate
+        input_queue = wake_gate
+        print(f"唤醒词门控: {args.wake_keywords}，等待唤醒词", file=sys.stderr)
+
+    gc_monitor = GcMonitor()
+    if not args.no_gc_tuning:
+        tune_gc()
+
+    run_recognition(args, recognizer, input_queue, printer, tracer=tracer)
 
 
 if __name__ == "__main__":
@@ -328,5 +767,22 @@ if __name__ == "__main__":
         main()
     except KeyboardInterrupt:
         killed = True
-        cleanup_recording_process(stop_event, recording_process)
+        cleanup_recording_process(stop_event, recording_process, samples_queue)
+        if history:
+            history.close()
+        if translator:
+            translator.close()
+            print(translator.stats.format_summary(), file=sys.stderr)
+        if gc_monitor:
+            print(f"识别进程 {gc_monitor.format_summary()}", file=sys.stderr)
+        if wake_gate:
+            wake_gate.close()
+            print(wake_gate.stats.format_summary(), file=sys.stderr)
+        if tracer:
+            tracer.close()
+            print(f"时间线已保存到 {tracer.path}", file=sys.stderr)
         print("\n检测到 Ctrl + C. 正在退出", file=sys.stderr)
+        if endpointer:
+            print(endpointer.stats.format_summary(), file=sys.stderr)
+            if endpoint_stats_path:
+                endpointer.stats.save(endpoint_stats_path)
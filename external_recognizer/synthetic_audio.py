@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+#
+# Copyright (c)  2025  Xiaomi Corporation
+
+"""
+合成的“说话”音频，soak-test.py、各个 benchmark 和 autotune 的校准共用。
+
+带谐波和音节包络的浊音段与低噪声的停顿交替。随机噪声会让模型几乎不输出token，
+解码耗时和VAD分句都与真实语音差别很大；这里的浊音能被VAD检测为语音，模型也会输出token。
+"""
+
+import numpy as np
+
+from audio_mixer import sample_rate as default_sample_rate
+
+
+def synthetic_audio(seconds=30, seed=0, sample_rate=default_sample_rate,
+                    speech_seconds=(0.8, 4.0), pause_seconds=(0.2, 1.5)):
+    """
+    Args:
+        seconds: 至少生成的时长，最后一个停顿结束时返回，结果可能略长
+        seed: 随机种子，相同参数每次生成的音频相同
+        sample_rate: 采样率
+        speech_seconds: 浊音段时长的范围
+        pause_seconds: 停顿时长的范围
+
+    Returns:
+        float32单声道音频
+    """
+    rng = np.random.default_rng(seed)
+    segments = []
+    total = 0
+    while total < seconds * sample_rate:
+        speech_len = int(rng.uniform(*speech_seconds) * sample_rate)
+        t = np.arange(speech_len) / sample_rate
+        f0 = rng.uniform(100, 250) * (1 + 0.1 * np.sin(2 * np.pi * 0.5 * t))
+        phase = 2 * np.pi * np.cumsum(f0) / sample_rate
+        voiced = sum(np.sin(k * phase) / k for k in range(1, 8))
+        syllables = 0.5 * (1 - np.cos(2 * np.pi * rng.uniform(3, 5) * t))
+        speech = 0.1 * voiced * syllables + 0.005 * rng.standard_normal(speech_len)
+
+        silence_len = int(rng.uniform(*pause_seconds) * sample_rate)
+        silence = 0.002 * rng.standard_normal(silence_len)
+
+        segments.extend([speech, silence])
+        total += speech_len + silence_len
+    return np.concatenate(segments).astype(np.float32)
@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+#
+# Copyright (c)  2025  Xiaomi Corporation
+
+"""
+批量转写录音文件，输出SRT字幕。
+
+使用与 simulate-streaming-sense-voice.py 相同的SenseVoice模型和VAD配置：主进程用 Silero VAD
+对文件分句，句子按 --batch-size 个一组分发给进程池，每个工作进程持有自己的 OfflineRecognizer，
+用 decode_streams 批量解码；结果按句子顺序写入字幕文件。结束时报告吞吐量
+（每个CPU核心每小时能转写的音频小时数）。
+
+16位WAV文件直接读取，其他格式（mp3、m4a等）需要 PATH 中有 ffmpeg。
+
+识别脚本的参数（模型路径、--num-threads 等）放在 -- 之后原样传给 simulate-streaming-sense-voice.py：
+
+python transcribe-files.py meeting1.wav meeting2.mp3
+python transcribe-files.py recordings/*.wav --workers 4 --output-dir subtitles -- --num-threads 1
+"""
+import argparse
+import importlib.util
+import math
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+import wave
+from collections import deque
+
+script_path = os.path.realpath(__file__)
+script_dir = os.path.dirname(script_path)
+sys.path.insert(0, script_dir)
+
+import numpy as np
+
+from audio_mixer import sample_rate, resample_fft
+from transcript_history import format_srt_time
+
+sense_voice_script = os.path.join(script_dir, "simulate-streaming-sense-voice.py")
+
+# 工作进程中的识别器，由 init_worker 创建
+worker_recognizer = None
+
+# 分段重采样时每段前后附带的音频长度（秒）
+RESAMPLE_CONTEXT_SECONDS = 0.5
+
+
+def get_args():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+
+    parser.add_argument(
+        "files",
+        type=str,
+        nargs="+",
+        help="要转写的录音文件",
+    )
+
+    parser.add_argument(
+        "--output-dir",
+        type=str,
+        default="",
+        help="字幕文件的输出目录，不指定时与录音文件放在同一目录",
+    )
+
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="工作进程数，0 表示 CPU核心数 / 每个进程的推理线程数",
+    )
+
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=8,
+        help="每次 decode_streams 批量解码的句子数",
+    )
+
+    parser.add_argument(
+        "--read-seconds",
+        type=float,
+        default=30,
+        help="每次读取和送入VAD的音频长度（秒），长文件不会整个读入内存",
+    )
+
+    argv = sys.argv[1:]
+    script_argv = []
+    if "--" in argv:
+        script_argv = argv[argv.index("--") + 1:]
+        argv = argv[:argv.index("--")]
+    args = parser.parse_args(argv)
+    args.script_argv = script_argv
+    return args
+
+
+def load_sense_voice(script_argv):
+    """以模块方式导入 simulate-streaming-sense-voice.py（不执行其 main），返回 (模块, 其参数)"""
+    spec = importlib.util.spec_from_file_location("transcribe_sense_voice", sense_voice_script)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    argv = sys.argv
+    sys.argv = [sense_voice_script] + script_argv
+    try:
+        script_args = module.get_args()
+    finally:
+        sys.argv = argv
+    # 批量转写时每个工作进程使用固定的线程数，不做自动调优
+    script_args.num_threads = script_args.num_threads or 1
+    script_args.provider = script_args.provider or "cpu"
+    return module, script_args
+
+
+def init_worker(script_argv):
+    global worker_recognizer
+    module, script_args = load_sense_voice(script_argv)
+    # 主进程已经下载好模型，这里只会在模型缓存中查找
+    module.prepare_models(script_args)
+    worker_recognizer = module.create_recognizer(script_args)
+
+
+def decode_batch(segments):
+    """在工作进程中批量解码一组句子，返回识别结果列表"""
+    streams = []
+    for samples in segments:
+        stream = worker_recognizer.create_stream()
+        stream.accept_waveform(sample_rate, samples)
+        streams.append(stream)
+    worker_recognizer.decode_streams(streams)
+    return [stream.result.text.strip() for stream in streams]
+
+
+def read_wav_chunks(path, chunk_seconds):
+    """
+    逐段读取16位WAV文件，转换为16kHz单声道float32
+
+    采样率不是16kHz时，FFT重采样把每段当作周期信号，直接逐段重采样会在分段处产生不连续。
+    因此每段带上前后各 RESAMPLE_CONTEXT_SECONDS 秒的音频一起重采样，再裁掉上下文部分；
+    分段和上下文的长度取 rate / gcd(rate, 16000) 的整数倍，每段的输出长度正好是整数，各段首尾相接
+    """
+    with wave.open(path, "rb") as f:
+        channels = f.getnchannels()
+        rate = f.getframerate()
+
+        def read(frames):
+            data = np.frombuffer(f.readframes(frames), dtype=np.int16)
+            return data.reshape(-1, channels).mean(axis=1, dtype=np.float32) / 32768
+
+        if rate == sample_rate:
+            frames_per_chunk = int(rate * chunk_seconds)
+            while True:
+                samples = read(frames_per_chunk)
+                if not len(samples):
+                    break
+                yield samples
+            return
+
+        divisor = math.gcd(rate, sample_rate)
+        step, output_step = rate // divisor, sample_rate // divisor
+        frames_per_chunk = max(int(rate * chunk_seconds) // step, 1) * step
+        context = max(int(rate * RESAMPLE_CONTEXT_SECONDS) // step, 1) * step
+        previous = np.zeros(0, dtype=np.float32)
+        samples = read(frames_per_chunk)
+        while len(samples):
+            following = read(frames_per_chunk)
+            block = np.concatenate([previous, samples, following[:context]])
+            # 文件末尾不足 step 的部分补零，使整段的输出长度为整数
+            padded = -(-len(block) // step) * step
+            block = np.concatenate([block, np.zeros(padded - len(block), dtype=np.float32)])
+            resampled = resample_fft(block, padded // step * output_step)
+            begin = len(previous) // step * output_step
+            yield resampled[begin:begin + int(round(len(samples) * sample_rate / rate))].astype(np.float32)
+            previous = np.concatenate([previous, samples])[-context:]
+            samples = following
+
+
+def read_ffmpeg_chunks(path, chunk_seconds):
+    """用 ffmpeg 解码为16kHz单声道16位PCM并逐段读取"""
+    command = ["ffmpeg", "-nostdin", "-loglevel", "error", "-i", path,
+               "-f", "s16le", "-ac", "1", "-ar", str(sample_rate), "-"]
+    try:
+        process = subprocess.Popen(command, stdout=subprocess.PIPE)
+    except FileNotFoundError:
+        raise RuntimeError(f"无法读取 {path}：只支持16位WAV文件，其他格式需要安装 ffmpeg")
+    chunk_bytes = int(sample_rate * chunk_seconds) * 2
+    try:
+        while True:
+            data = process.stdout.read(chunk_bytes)
+            if not data:
+                break
+            yield np.frombuffer(data[:len(data) // 2 * 2], dtype=np.int16).astype(np.float32) / 32768
+    finally:
+        process.stdout.close()
+        if process.wait() != 0:
+            raise RuntimeError(f"ffmpeg 解码 {path} 失败")
+
+
+def read_audio_chunks(path, chunk_seconds):
+    if path.lower().endswith(".wav"):
+        with wave.open(path, "rb") as f:
+            is_pcm16 = f.getsampwidth() == 2
+        if is_pcm16:
+            return read_wav_chunks(path, chunk_seconds)
+    return read_ffmpeg_chunks(path, chunk_seconds)
+
+
+def vad_segments(sherpa_onnx, vad_config, path, chunk_seconds, stats):
+    """
+    对文件分句
+
+    Yields:
+        (开始采样位置, 句子音频)
+    """
+    vad = sherpa_onnx.VoiceActivityDetector(vad_config, buffer_size_in_seconds=100)
+    window_size = vad_config.silero_vad.window_size
+    buffer = np.zeros(0, dtype=np.float32)
+    for samples in read_audio_chunks(path, chunk_seconds):
+        stats["audio_samples"] += len(samples)
+        buffer = np.concatenate([buffer, samples])
+        num_windows = len(buffer) // window_size
+        for i in range(num_windows):
+            vad.accept_waveform(buffer[i * window_size:(i + 1) * window_size])
+            while not vad.empty():
+                yield vad.front.start, np.array(vad.front.samples, dtype=np.float32)
+                vad.pop()
+        buffer = buffer[num_windows * window_size:]
+    if len(buffer):
+        vad.accept_waveform(buffer)
+    vad.flush()
+    while not vad.empty():
+        yield vad.front.start, np.array(vad.front.samples, dtype=np.float32)
+        vad.pop()
+
+
+def batches(files, sherpa_onnx, vad_config, args, file_stats):
+    """
+    所有文件的句子，每 batch_size 个一组
+
+    Yields:
+        (文件序号, [(开始采样位置, 结束采样位置)], [句子音频])
+    """
+    for file_index, path in enumerate(files):
+        stats = file_stats[file_index]
+        spans, segments = [], []
+        try:
+            for start, samples in vad_segments(sherpa_onnx, vad_config, path, args.read_seconds, stats):
+                spans.append((start, start + len(samples)))
+                segments.append(samples)
+                if len(segments) >= args.batch_size:
+                    yield file_index, spans, segments
+                    spans, segments = [], []
+        except Exception as e:
+            print(f"{path}: {e}", file=sys.stderr)
+            stats["error"] = True
+        if segments:
+            yield file_index, spans, segments
+        # 空的一组表示文件结束
+        yield file_index, [], []
+
+
+def output_path(path, output_dir):
+    base = os.path.splitext(os.path.basename(path))[0] + ".srt"
+    return os.path.join(output_dir or os.path.dirname(os.path.abspath(path)), base)
+
+
+def main():
+    sys.stdout.reconfigure(encoding='utf-8')
+    sys.stderr.reconfigure(encoding='utf-8')
+    args = get_args()
+
+    module, script_args = load_sense_voice(args.script_argv)
+    module.prepare_models(script_args)
+    module.assert_file_exists(script_args.silero_vad_model)
+    module.assert_file_exists(script_args.sense_voice)
+    module.assert_file_exists(script_args.tokens)
+    vad_config = module.create_vad_config(script_args)
+
+    num_threads = script_args.num_threads
+    workers = args.workers or max(1, (os.cpu_count() or 1) // num_threads)
+    cores = workers * num_threads
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    print(f"{len(args.files)} 个文件，{workers} 个工作进程 x {num_threads} 个推理线程", file=sys.stderr)
+
+    file_stats = [{"audio_samples": 0, "segments": 0, "start": None, "error": False} for _ in args.files]
+    start_time = time.perf_counter()
+
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(workers, initializer=init_worker, initargs=(args.script_argv,)) as pool:
+        # 按提交顺序取回结果；最多同时提交 2 x workers 组，读取和VAD不会远远领先于解码
+        pending = deque()
+        srt = None
+        subtitle_index = 0
+        source = batches(args.files, module.sherpa_onnx, vad_config, args, file_stats)
+        exhausted = False
+        while pending or not exhausted:
+            while not exhausted and len(pending) < 2 * workers:
+                try:
+                    file_index, spans, segments = next(source)
+                except StopIteration:
+                    exhausted = True
+                    break
+                if file_stats[file_index]["start"] is None:
+                    file_stats[file_index]["start"] = time.perf_counter()
+                result = pool.apply_async(decode_batch, (segments,)) if segments else None
+                pending.append((file_index, spans, result))
+            if not pending:
+                break
+
+            file_index, spans, result = pending.popleft()
+            path = args.files[file_index]
+            stats = file_stats[file_index]
+            if srt is None and not (result is None and stats["error"]):
+                # 读取失败的文件不生成字幕文件
+                srt = open(output_path(path, args.output_dir), "w", encoding="utf-8")
+                subtitle_index = 0
+            if result is None:
+                # 文件结束
+                if srt:
+                    srt.close()
+                srt = None
+                elapsed = time.perf_counter() - stats["start"]
+                audio_seconds = stats["audio_samples"] / sample_rate
+                status = "（出错）" if stats["error"] else ""
+                print(f"{path}{status}: {audio_seconds / 60:.1f} 分钟音频，{stats['segments']} 句，"
+                      f"{elapsed:.1f} s -> {output_path(path, args.output_dir)}", file=sys.stderr)
+                continue
+
+            try:
+                texts = result.get()
+            except Exception as e:
+                # 一组解码失败只影响该文件，其他文件继续转写
+                print(f"{path}: 解码失败: {e}", file=sys.stderr)
+                stats["error"] = True
+                continue
+            stats["segments"] += len(texts)
+            for (start, end), text in zip(spans, texts):
+                if not text:
+                    continue
+                subtitle_index += 1
+                srt.write(f"{subtitle_index}\n{format_srt_time(start / sample_rate)} --> "
+                          f"{format_srt_time(end / sample_rate)}\n{text}\n\n")
+            srt.flush()
+
+    wall_seconds = time.perf_counter() - start_time
+    audio_seconds = sum(stats["audio_samples"] for stats in file_stats) / sample_rate
+    print(f"共 {audio_seconds / 3600:.2f} 小时音频，耗时 {wall_seconds:.1f} s，"
+          f"实时率 {wall_seconds / max(audio_seconds, 1e-9):.4f}", file=sys.stderr)
+    print(f"吞吐量: {audio_seconds / wall_seconds:.1f} 小时音频/小时，"
+          f"{audio_seconds / wall_seconds / cores:.1f} 小时音频/小时/核（{cores} 核）", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+#
+# Copyright (c)  2025  Xiaomi Corporation
+
+"""
+查询和导出 --history-dir 写入的识别历史记录。
+
+python transcript-history.py history --stats
+python transcript-history.py history --from "2025-06-01 09:00" --to "2025-06-01 10:00"
+python transcript-history.py history --from 2025-06-01 --format srt --output meeting.srt
+"""
+import argparse
+import datetime
+import json
+import sys
+import os
+import time
+
+script_path = os.path.realpath(__file__)
+script_dir = os.path.dirname(script_path)
+sys.path.insert(0, script_dir)
+
+from transcript_history import HistoryReader, format_srt_time
+
+
+def parse_time(value):
+    """时间参数：Unix时间戳，或 ISO 格式的本地时间（例如 2025-06-01 09:30:00）"""
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"无法解析的时间: {value}")
+
+
+def get_args():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+
+    parser.add_argument(
+        "history_dir",
+        type=str,
+        help="历史记录目录（识别脚本的 --history-dir）",
+    )
+
+    parser.add_argument(
+        "--from",
+        dest="start",
+        type=parse_time,
+        default=None,
+        help="开始时间：Unix时间戳或 ISO 格式的本地时间，不指定时不限",
+    )
+
+    parser.add_argument(
+        "--to",
+        dest="end",
+        type=parse_time,
+        default=None,
+        help="结束时间：Unix时间戳或 ISO 格式的本地时间，不指定时不限",
+    )
+
+    parser.add_argument(
+        "--format",
+        type=str,
+        default="text",
+        choices=["text", "srt", "jsonl"],
+        help="输出格式：text=带时间的纯文本，srt=字幕（时间相对于第一句），jsonl=每行一条JSON记录",
+    )
+
+    parser.add_argument(
+        "--output",
+        type=str,
+        default="",
+        help="输出文件路径，不指定时输出到标准输出",
+    )
+
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="只显示历史记录的统计信息",
+    )
+
+    return parser.parse_args()
+
+
+def format_local(timestamp):
+    return datetime.datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+
+
+def write_records(records, output_format, out):
+    count = 0
+    origin = None
+    for record in records:
+        count += 1
+        if output_format == "jsonl":
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        elif output_format == "srt":
+            if origin is None:
+                origin = record["start"]
+            out.write(f"{count}\n{format_srt_time(record['start'] - origin)} --> "
+                      f"{format_srt_time(record['end'] - origin)}\n{record['text']}\n\n")
+        else:
+            out.write(f"[{format_local(record['start'])} - {format_local(record['end'])[11:]}] "
+                      f"{record['text']}\n")
+    return count
+
+
+def main():
+    sys.stdout.reconfigure(encoding='utf-8')
+    sys.stderr.reconfigure(encoding='utf-8')
+    args = get_args()
+    reader = HistoryReader(args.history_dir)
+
+    if args.stats:
+        stats = reader.stats()
+        print(f"日志段: {stats['segments']}  记录: {stats['records']}  大小: {stats['bytes'] / 1024:.1f} KB")
+        if stats["records"]:
+            print(f"时间范围: {format_local(stats['first'])} - {format_local(stats['last'])}")
+        return
+
+    start = time.perf_counter()
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        count = write_records(reader.query(args.start, args.end), args.format, out)
+    finally:
+        if args.output:
+            out.close()
+    print(f"导出 {count} 条记录，耗时 {(time.perf_counter() - start) * 1000:.1f} ms", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+#
+# Copyright (c)  2025  Xiaomi Corporation
+
+"""
+识别结果的历史记录。
+
+每个句子的最终结果连同音频的开始/结束时间和来源设备追加写入分段的日志文件，
+每个日志段有一个定长条目的时间索引，按时间范围查询时只读取命中的记录。
+
+目录结构：
+    segment-000001.log   记录: payload_len (u32), crc32 (u32), payload (UTF-8 JSON)
+    segment-000001.idx   索引: start (f64), end (f64), offset (u64)，每条记录24字节
+
+写入时每条记录立即写入操作系统（进程崩溃不会丢失），fsync 由后台线程成组执行：
+距离上次提交超过 commit_interval 秒或累积了 commit_records 条记录时提交一次。
+fsync 不持有写入锁，日志段切换时旧的日志段也交给后台线程提交和关闭，识别线程从不等待磁盘。
+打开时会截断因断电等原因写了一半的记录，并补齐缺失的索引条目。
+
+记录按句子顺序追加，同一日志段内的开始和结束时间都是递增的，查询时在索引上二分查找。
+"""
+
+import bisect
+import glob
+import json
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from audio_mixer import sample_rate
+
+_RECORD_HEADER = struct.Struct("<II")
+_INDEX_ENTRY = struct.Struct("<ddQ")
+INDEX_DTYPE = np.dtype([("start", "<f8"), ("end", "<f8"), ("offset", "<u8")])
+
+
+def segment_paths(directory):
+    """按顺序返回所有日志段的 (序号, 日志路径, 索引路径)"""
+    segments = []
+    for log_path in glob.glob(os.path.join(directory, "segment-*.log")):
+        name = os.path.basename(log_path)
+        try:
+            number = int(name[len("segment-"):-len(".log")])
+        except ValueError:
+            continue
+        segments.append((number, log_path, log_path[:-len(".log")] + ".idx"))
+    segments.sort()
+    return segments
+
+
+def read_record(f, offset):
+    """读取 offset 处的一条记录，记录不完整或校验失败时返回 None"""
+    f.seek(offset)
+    header = f.read(_RECORD_HEADER.size)
+    if len(header) < _RECORD_HEADER.size:
+        return None
+    length, crc = _RECORD_HEADER.unpack(header)
+    payload = f.read(length)
+    if len(payload) < length or zlib.crc32(payload) != crc:
+        return None
+    return json.loads(payload.decode("utf-8"))
+
+
+def parse_record(data, offset):
+    """从内存中的日志数据解析 offset 处的一条记录，记录不完整或校验失败时返回 None"""
+    if offset + _RECORD_HEADER.size > len(data):
+        return None
+    length, crc = _RECORD_HEADER.unpack_from(data, offset)
+    payload = data[offset + _RECORD_HEADER.size:offset + _RECORD_HEADER.size + length]
+    if len(payload) < length or zlib.crc32(payload) != crc:
+        return None
+    return json.loads(bytes(payload).decode("utf-8"))
+
+
+def format_srt_time(seconds):
+    """SRT字幕的时间格式 HH:MM:SS,mmm"""
+    milliseconds = int(round(max(seconds, 0) * 1000))
+    hours, milliseconds = divmod(milliseconds, 3600 * 1000)
+    minutes, milliseconds = divmod(milliseconds, 60 * 1000)
+    seconds, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d},{milliseconds:03d}"
+
+
+class SampleClock:
+    """
+    把识别流中的采样位置换算为采集时间
+
+    录音进程为每个音频块附带时间槽的时间戳；没有声音播放时loopback设备不产生数据，
+    采样数与墙钟时间不再对应，因此按音频块记录对应关系。
+    """
+    def __init__(self, max_chunks=20 * 60 * 20):
+        self.offsets = []
+        self.timestamps = []
+        self.total_samples = 0
+        self.max_chunks = max_chunks
+
+    def add(self, timestamp, num_samples):
+        self.offsets.append(self.total_samples)
+        self.timestamps.append(timestamp)
+        self.total_samples += num_samples
+        if len(self.offsets) > 2 * self.max_chunks:
+            del self.offsets[:self.max_chunks]
+            del self.timestamps[:self.max_chunks]
+
+    def time_at(self, sample_offset):
+        if not self.offsets:
+            return time.time()
+        i = max(bisect.bisect_right(self.offsets, sample_offset) - 1, 0)
+        return self.timestamps[i] + (sample_offset - self.offsets[i]) / sample_rate
+
+    def chunk_timestamp(self, sample_offset):
+        """包含该采样的音频块的时间槽时间戳，没有记录时返回 None"""
+        if not self.offsets:
+            return None
+        return self.timestamps[max(bisect.bisect_right(self.offsets, sample_offset) - 1, 0)]
+
+
+class TranscriptHistory:
+    """只追加的历史记录写入器，可以在识别线程中直接调用 append()"""
+    def __init__(self, directory, segment_bytes=8 * 1024 * 1024, commit_interval=1.0, commit_records=32):
+        """
+        Args:
+            directory: 历史记录目录
+            segment_bytes: 日志段超过该大小后开始新的日志段
+            commit_interval: 最多间隔多少秒执行一次 fsync
+            commit_records: 累积多少条未提交的记录时立即执行 fsync
+        """
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.commit_interval = commit_interval
+        self.commit_records = commit_records
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._commit_needed = threading.Condition(self._lock)
+        self._uncommitted = 0
+        self._retired = []  # 已切换掉、等待后台线程提交并关闭的日志段文件
+        self._closed = False
+
+        segments = segment_paths(directory)
+        if segments:
+            number, log_path, idx_path = segments[-1]
+            self._recover(log_path, idx_path)
+        else:
+            number = 1
+        self._open_segment(number)
+
+        self._committer = threading.Thread(target=self._commit_loop, daemon=True)
+        self._committer.start()
+
+    def _recover(self, log_path, idx_path):
+        """截断写了一半的记录，补齐缺失的索引条目"""
+        entries = np.fromfile(idx_path, dtype=INDEX_DTYPE) if os.path.exists(idx_path) else np.zeros(0, INDEX_DTYPE)
+        with open(log_path, "rb") as f:
+            # 丢弃指向无效记录的索引条目
+            while len(entries) and read_record(f, int(entries[-1]["offset"])) is None:
+                entries = entries[:-1]
+            if len(entries):
+                f.seek(int(entries[-1]["offset"]))
+                length, _ = _RECORD_HEADER.unpack(f.read(_RECORD_HEADER.size))
+                valid_end = int(entries[-1]["offset"]) + _RECORD_HEADER.size + length
+            else:
+                valid_end = 0
+
+            # 索引之后可能还有完整的记录（写入索引之前进程退出）
+            missing = []
+            while True:
+                record = read_record(f, valid_end)
+                if record is None:
+                    break
+                missing.append((record["start"], record["end"], valid_end))
+                valid_end = f.tell()
+
+        with open(log_path, "r+b") as f:
+            f.truncate(valid_end)
+        with open(idx_path, "wb") as f:
+            f.write(entries.tobytes())
+            for entry in missing:
+                f.write(_INDEX_ENTRY.pack(*entry))
+        if missing:
+            print(f"历史记录: 补齐了 {log_path} 的 {len(missing)} 条索引", file=sys.stderr)
+
+    def _open_segment(self, number):
+        self._number = number
+        base = os.path.join(self.directory, f"segment-{number:06d}")
+        self._log = open(base + ".log", "ab")
+        self._idx = open(base + ".idx", "ab")
+
+    def append(self, start, end, text, device=""):
+        """
+        追加一条句子记录
+
+        Args:
+            start: 句子开始的采集时间（time.time() 的时间戳）
+            end: 句子结束的采集时间
+            text: 识别结果
+            device: 来源设备
+        """
+        payload = json.dumps({"start": start, "end": end, "text": text, "device": device},
+                             ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        with self._lock:
+            if self._closed:
+                return
+            if self._log.tell() >= self.segment_bytes:
+                # 旧的日志段由后台线程 fsync 并关闭
+                self._retired += [self._log, self._idx]
+                self._uncommitted = 0
+                self._open_segment(self._number + 1)
+                self._commit_needed.notify()
+
+            offset = self._log.tell()
+            self._log.write(_RECORD_HEADER.pack(len(payload), zlib.crc32(payload)))
+            self._log.write(payload)
+            self._log.flush()
+            # 索引在记录之后写入，索引中的条目总是指向完整的记录
+            self._idx.write(_INDEX_ENTRY.pack(start, end, offset))
+            self._idx.flush()
+
+            self._uncommitted += 1
+            if self._uncommitted >= self.commit_records:
+                self._commit_needed.notify()
+
+    def _take_commit_locked(self):
+        """取出需要 fsync 的文件：(当前日志段的文件, 已切换掉的文件)，之后在锁外提交"""
+        current = [self._log, self._idx] if self._uncommitted else []
+        self._uncommitted = 0
+        retired, self._retired = self._retired, []
+        return current, retired
+
+    @staticmethod
+    def _sync(current, retired):
+        for f in current + retired:
+            os.fsync(f.fileno())
+        for f in retired:
+            f.close()
+
+    def _commit_loop(self):
+        while True:
+            with self._lock:
+                if self._closed:
+                    return
+                # 提交期间（不持有锁）收到的通知会丢失，因此先检查是否已经需要提交
+                if self._uncommitted < self.commit_records and not self._retired:
+                    self._commit_needed.wait(self.commit_interval)
+                if self._closed:
+                    return
+                current, retired = self._take_commit_locked()
+            # 不持有锁，append() 可以同时写入；文件只在后台线程退出后由 close() 关闭
+            self._sync(current, retired)
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._commit_needed.notify()
+        self._committer.join()
+        current, retired = self._take_commit_locked()
+        self._sync(current, retired)
+        self._log.close()
+        self._idx.close()
+
+
+class HistoryReader:
+    """按时间范围查询历史记录"""
+    def __init__(self, directory):
+        self.directory = directory
+
+    def segments(self):
+        """每个日志段的 (日志路径, 索引条目)，索引条目为只读的内存映射，只读取访问到的页"""
+        for _, log_path, idx_path in segment_paths(self.directory):
+            if not os.path.exists(idx_path):
+                continue
+            # 写入中的索引可能以不完整的条目结尾，忽略它
+            count = os.path.getsize(idx_path) // INDEX_DTYPE.itemsize
+            if count:
+                yield log_path, np.memmap(idx_path, dtype=INDEX_DTYPE, mode="r", shape=(count,))
+
+    def query(self, start=None, end=None):
+        """
+        返回与 [start, end) 有重叠的句子记录，按时间顺序
+
+        Args:
+            start: 开始时间戳，None 表示不限
+            end: 结束时间戳，None 表示不限
+        """
+        start = -np.inf if start is None else start
+        end = np.inf if end is None else end
+        for log_path, entries in self.segments():
+            # 开始和结束时间都递增：第一条 end >= start 的记录到最后一条 start < end 的记录
+            # 是连续的一段，二分查找只读取索引中 O(log n) 个条目
+            if entries[0]["start"] >= end or entries[-1]["end"] < start:
+                continue
+            lo = int(np.searchsorted(entries["end"], start, side="left"))
+            hi = int(np.searchsorted(entries["start"], end, side="left"))
+            if lo >= hi:
+                continue
+            offsets = np.array(entries["offset"][lo:hi])
+            # 命中的记录在日志中连续，一次读出覆盖它们的字节范围
+            first = int(offsets[0])
+            with open(log_path, "rb") as f:
+                f.seek(first)
+                if hi < len(entries):
+                    data = memoryview(f.read(int(entries[hi]["offset"]) - first))
+                else:
+                    data = memoryview(f.read())
+            for offset in offsets:
+                record = parse_record(data, int(offset) - first)
+                if record is not None:
+                    yield record
+
+    def stats(self):
+        segments = list(self.segments())
+        count = sum(len(entries) for _, entries in segments)
+        size = sum(os.path.getsize(log_path) for log_path, _ in segments)
+        first = min((entries["start"].min() for _, entries in segments), default=None)
+        last = max((entries["end"].max() for _, entries in segments), default=None)
+        return {"segments": len(segments), "records": count, "bytes": size, "first": first, "last": last}
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+#
+# Copyright (c)  2025  Xiaomi Corporation
+
+"""
+句子翻译：在后台线程中翻译识别的最终结果，识别线程只负责提交，不会等待翻译。
+
+  - 后端可替换：内置的 echo 后端（不联网，用于测试和基准测试），
+    或用 "模块名:类名" 指定自定义后端，后端实现 translate_batch(texts, source, target)
+  - 重复的句子直接使用 LRU 缓存中的翻译
+  - 等待中的句子合并为一批请求，同时进行中的请求数不超过 max_in_flight
+  - 等待的句子超过 max_pending 时丢弃最早的句子，提交永远不会阻塞
+
+翻译结果通过标准输出发送，格式为以 \\x1e 开头的一行（见 keyword_alert.py）：
+
+    \\x1etranslation\\t<原文>\\t<译文>\\n
+"""
+
+import importlib
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+TRANSLATION_PREFIX = "\x1etranslation\t"
+
+
+def single_line(text):
+    return " ".join(text.replace("\t", " ").splitlines())
+
+
+def format_translation(source_text, translated_text):
+    """翻译结果的控制消息，原文和译文中的制表符和换行替换为空格"""
+    return f"{TRANSLATION_PREFIX}{single_line(source_text)}\t{single_line(translated_text)}"
+
+
+class EchoBackend:
+    """不联网的替代后端：返回带目标语言标记的原文，可以模拟请求耗时"""
+    def __init__(self, delay=0.0, per_text_delay=0.0):
+        """
+        Args:
+            delay: 每次请求的固定耗时（秒）
+            per_text_delay: 请求中每个句子增加的耗时（秒）
+        """
+        self.delay = delay
+        self.per_text_delay = per_text_delay
+        self.requests = 0
+
+    def translate_batch(self, texts, source, target):
+        self.requests += 1
+        time.sleep(self.delay + self.per_text_delay * len(texts))
+        return [f"[{target}] {text}" for text in texts]
+
+
+backends = {"echo": EchoBackend}
+
+
+def create_backend(name):
+    """按名称创建后端：内置后端的名称，或 "模块名:类名" """
+    if name in backends:
+        return backends[name]()
+    module_name, sep, class_name = name.partition(":")
+    if not sep:
+        raise ValueError(f"未知的翻译后端: {name}，可用: {', '.join(backends)}，或使用 模块名:类名")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+class LRUCache:
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = self.items.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.items.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self.items[key] = value
+        self.items.move_to_end(key)
+        if len(self.items) > self.capacity:
+            self.items.popitem(last=False)
+
+
+class TranslationStats:
+    def __init__(self):
+        self.submitted = 0
+        self.translated = 0
+        self.cached = 0
+        self.dropped = 0
+        self.failed = 0
+        self.requests = 0
+        self.max_in_flight = 0
+
+    def format_summary(self):
+        return (f"翻译: 提交 {self.submitted}，完成 {self.translated}（缓存 {self.cached}），"
+                f"丢弃 {self.dropped}，失败 {self.failed}，请求 {self.requests}，最多同时 {self.max_in_flight} 个请求")
+
+
+class Translator:
+    """异步翻译阶段，submit() 可以在识别线程中直接调用"""
+    def __init__(self, backend, emit, source="auto", target="en", cache_size=1024, max_batch=8,
+                 max_in_flight=2, max_pending=64, batch_wait=0.05):
+        """
+        Args:
+            backend: 实现 translate_batch(texts, source, target) 的后端
+            emit: 回调 emit(原文, 译文)，在后台线程中调用
+            source: 源语言
+            target: 目标语言
+            cache_size: LRU 缓存的句子数
+            max_batch: 每次请求最多包含的句子数
+            max_in_flight: 同时进行中的请求数上限
+            max_pending: 等待翻译的句子数上限，超过时丢弃最早的句子
+            batch_wait: 收到第一个句子后最多再等待多少秒凑成一批
+        """
+        self.backend = backend
+        self.emit = emit
+        self.source = source
+        self.target = target
+        self.max_batch = max_batch
+        self.max_in_flight = max_in_flight
+        self.max_pending = max_pending
+        self.batch_wait = batch_wait
+        self.cache = LRUCache(cache_size)
+        self.stats = TranslationStats()
+
+        self._lock = threading.Lock()
+        self._pending_changed = threading.Condition(self._lock)
+        self._pending = deque()
+        self._in_flight = 0
+        self._closed = False
+        self._slots = threading.Semaphore(max_in_flight)
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="translation")
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, daemon=True)
+        self._dispatcher.start()
+
+    def submit(self, text):
+        """提交一个最终结果，不等待翻译"""
+        text = text.strip()
+        if not text:
+            return
+        with self._lock:
+            if self._closed:
+                return
+            self.stats.submitted += 1
+            cached = self.cache.get(text)
+            if cached is None:
+                if len(self._pending) >= self.max_pending:
+                    self._pending.popleft()
+                    self.stats.dropped += 1
+                self._pending.append(text)
+                self._pending_changed.notify()
+                return
+            self.stats.cached += 1
+            self.stats.translated += 1
+        self.emit(text, cached)
+
+    def _take_batch(self):
+        """等待并取出一批句子，关闭时返回 None"""
+        with self._lock:
+            while not self._pending and not self._closed:
+                self._pending_changed.wait()
+            if self._closed:
+                return None
+            # 凑满一批或等待 batch_wait 秒
+            deadline = time.monotonic() + self.batch_wait
+            while len(self._pending) < self.max_batch and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._pending_changed.wait(remaining)
+            batch = []
+            while self._pending and len(batch) < self.max_batch:
+                batch.append(self._pending.popleft())
+            return batch
+
+    def _dispatch_loop(self):
+        while True:
+            # 先占用一个请求名额，等待期间新的句子继续在 _pending 中累积成更大的一批
+            self._slots.acquire()
+            batch = self._take_batch()
+            if batch is None:
+                self._slots.release()
+                return
+            with self._lock:
+                # close() 在设置 _closed 之后才关闭线程池，持有锁检查并提交，提交时线程池一定还未关闭
+                if self._closed:
+                    self._slots.release()
+                    return
+                self._in_flight += 1
+                self.stats.requests += 1
+                self.stats.max_in_flight = max(self.stats.max_in_flight, self._in_flight)
+                self._executor.submit(self._translate, batch)
+
+    def _translate(self, batch):
+        # 同一批中重复的句子，以及等待期间已被前一批翻译的句子，不再发送给后端
+        with self._lock:
+            results = {text: self.cache.items[text] for text in batch if text in self.cache.items}
+        texts = [text for text in dict.fromkeys(batch) if text not in results]
+        try:
+            if texts:
+                translations = list(self.backend.translate_batch(texts, self.source, self.target))
+                if len(translations) != len(texts):
+                    raise ValueError(f"后端返回了 {len(translations)} 条译文，请求了 {len(texts)} 句")
+                results.update(zip(texts, translations))
+        except Exception as e:
+            print(f"翻译失败: {e}", file=sys.stderr)
+            with self._lock:
+                self.stats.failed += len(batch)
+            return
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            self._slots.release()
+
+        with self._lock:
+            for text in texts:
+                self.cache.put(text, results[text])
+            self.stats.translated += len(batch)
+        for text in batch:
+            self.emit(text, results[text])
+
+    def close(self, wait=False):
+        """
+        停止翻译
+
+        Args:
+            wait: 是否等待进行中的请求完成；等待中的句子总是被丢弃
+        """
+        with self._lock:
+            self._closed = True
+            self._pending.clear()
+            self._pending_changed.notify_all()
+        self._executor.shutdown(wait=wait)
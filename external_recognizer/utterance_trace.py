@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+#
+# Copyright (c)  2025  Xiaomi Corporation
+
+"""
+逐句的时间线追踪，输出 Chrome trace-event 格式的JSON，可以用 https://ui.perfetto.dev 或 chrome://tracing 打开。
+
+录音进程（CaptureTracer）记录每个数据包的：
+    capture      采集回调中的转换、重采样和入队（每个设备一个线程）
+    queue wait   从放入设备队列到被混音线程取出
+    mix          混音器输出该时间槽的 step()
+    ipc put      放入进程间队列
+事件暂存在录音进程中，每隔 0.5 秒成批通过 trace_queue 发送给识别进程，由 UtteranceTracer 的后台线程统一写入文件。
+
+识别进程（UtteranceTracer）记录：
+    ipc          从录音进程放入队列到识别进程取出（两个进程的事件配对后生成）
+    process      识别主循环处理一批音频
+    vad window   每个VAD窗口
+    partial decode / final decode
+    utterance    每句话一个异步事件，从检测到语音到输出最终结果
+
+两个进程通过时间槽（数据包的采集时间戳 / samples_time）关联：每个数据包有一条从 ipc put 到识别进程
+process 的箭头（flow），每句话有一条从其第一个数据包的 capture 到输出最终结果的箭头，
+句子的延迟在时间线上一目了然。
+
+时间戳使用 time.perf_counter()：Windows 上为 QueryPerformanceCounter，Linux 上为 CLOCK_MONOTONIC，
+同一台机器上的不同进程可以直接比较。
+
+本模块会在录音子进程中导入，只允许依赖numpy和标准库。
+"""
+
+import json
+import queue
+import threading
+import time
+
+from audio_mixer import samples_time
+
+CAPTURE_PID = 1
+RECOGNIZER_PID = 2
+
+# trace 中的线程编号
+MIXER_TID = 1
+DEVICE_TID_BASE = 100  # 设备的采集回调线程：100 + 设备序号
+DEVICE_QUEUE_TID_BASE = 200  # 设备队列中的等待：200 + 设备序号
+RECOGNIZER_TID = 1
+IPC_TID = 2
+
+# 配对用的时间槽最多保留这么多个（约100秒），之后仍未配对的丢弃
+MAX_PENDING_SLOTS = 2000
+
+
+def slot_id(timestamp):
+    """数据包时间戳对应的时间槽编号"""
+    return round(timestamp / samples_time)
+
+
+def to_us(seconds):
+    return round(seconds * 1e6, 1)
+
+
+def span_event(name, cat, pid, tid, start, end, args=None):
+    """完整事件（ph=X），start/end 为 time.perf_counter() 的秒数"""
+    event = {"name": name, "cat": cat, "ph": "X", "ts": to_us(start), "dur": to_us(max(end - start, 0)),
+             "pid": pid, "tid": tid}
+    if args:
+        event["args"] = args
+    return event
+
+
+def thread_name_event(pid, tid, name):
+    return {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+
+
+def flow_events(cat, flow_id, start_pid, start_tid, start, end_pid, end_tid, end):
+    """从 (start_pid, start_tid, start) 所在的事件指向 (end_pid, end_tid, end) 所在事件的箭头"""
+    return [
+        {"name": cat, "cat": cat, "ph": "s", "id": flow_id, "pid": start_pid, "tid": start_tid, "ts": to_us(start)},
+        {"name": cat, "cat": cat, "ph": "f", "bp": "e", "id": flow_id, "pid": end_pid, "tid": end_tid,
+         "ts": to_us(end)},
+    ]
+
+
+class CaptureTracer:
+    """
+    录音进程中的追踪
+
+    采集回调和混音线程只向列表追加事件，由混音线程调用 maybe_flush() 成批发送，
+    不在回调中做任何I/O。
+    """
+    def __init__(self, trace_queue, flush_interval=0.5):
+        self.queue = trace_queue
+        self.flush_interval = flush_interval
+        self.events = [thread_name_event(CAPTURE_PID, MIXER_TID, "mixer")]
+        self.markers = []  # ("put", 时间槽, 时间)，由识别进程与 ("get", ...) 配对
+        self.put_times = {}  # (设备序号, 时间槽) -> 放入设备队列的时间
+        self.next_flush = time.perf_counter() + flush_interval
+
+    def device_opened(self, device_idx, name):
+        self.events.append(thread_name_event(CAPTURE_PID, DEVICE_TID_BASE + device_idx, f"capture {name}"))
+        self.events.append(thread_name_event(CAPTURE_PID, DEVICE_QUEUE_TID_BASE + device_idx, f"queue {name}"))
+
+    def packet_captured(self, device_idx, timestamp, start):
+        """采集回调结束时调用，start 为回调开始的时间"""
+        end = time.perf_counter()
+        slot = slot_id(timestamp)
+        self.events.append(span_event("capture", "capture", CAPTURE_PID, DEVICE_TID_BASE + device_idx, start, end,
+                                      {"slot": slot, "device": device_idx}))
+        self.put_times[(device_idx, slot)] = end
+
+    def packet_fetched(self, device_idx, timestamp):
+        slot = slot_id(timestamp)
+        put_time = self.put_times.pop((device_idx, slot), None)
+        if put_time is not None:
+            self.events.append(span_event("queue wait", "capture", CAPTURE_PID, DEVICE_QUEUE_TID_BASE + device_idx,
+                                          put_time, time.perf_counter(), {"slot": slot}))
+
+    def mixed(self, timestamp, start, num_devices):
+        self.events.append(span_event("mix", "mix", CAPTURE_PID, MIXER_TID, start, time.perf_counter(),
+                                      {"slot": slot_id(timestamp), "devices": num_devices}))
+
+    def sent(self, timestamp, start):
+        slot = slot_id(timestamp)
+        self.events.append(span_event("ipc put", "ipc", CAPTURE_PID, MIXER_TID, start, time.perf_counter(),
+                                      {"slot": slot}))
+        self.markers.append(("put", slot, start))
+
+    def maybe_flush(self):
+        now = time.perf_counter()
+        if now >= self.next_flush:
+            self.next_flush = now + self.flush_interval
+            self.flush()
+
+    def flush(self):
+        events, self.events = self.events, []
+        markers, self.markers = self.markers, []
+        # 被丢弃的数据包不会被取出，清理它们的入队时间。
+        # 采集回调线程同时在插入，先取快照（list() 在持有GIL时一次复制完成）再遍历
+        expired = time.perf_counter() - 10
+        for key in [key for key, put_time in list(self.put_times.items()) if put_time < expired]:
+            self.put_times.pop(key, None)
+        if events or markers:
+            try:
+                self.queue.put((events, markers))
+            except (OSError, ValueError):
+                pass
+
+
+class UtteranceTracer:
+    """
+    识别进程中的追踪，同时负责写入录音进程发来的事件
+
+    识别主循环调用 received()、span()、begin_utterance()、end_utterance()，
+    事件交给后台线程写入文件，主循环中不做I/O。
+    """
+    def __init__(self, path, trace_queue=None):
+        self.path = path
+        self.trace_queue = trace_queue
+        self.file = open(path, "w", encoding="utf-8")
+        self.file.write("[")
+        self.first_event = True
+        self.pending = queue.Queue()
+        self.utterance = None  # 当前句子的编号
+        self.next_utterance = 1
+        self.utterance_start_slot = None
+
+        # 跨进程配对的状态，只在写入线程中访问
+        self.capture_spans = {}  # 时间槽 -> (tid, 开始时间)，该时间槽第一个数据包的 capture
+        self.put_times = {}
+        self.get_times = {}
+        self.links = {}  # 时间槽 -> [(句子编号, 时间)]，等待该时间槽的 capture 事件
+        self.max_slot = 0
+
+        self.stopped = threading.Event()
+        for pid, name in [(CAPTURE_PID, "录音进程"), (RECOGNIZER_PID, "识别进程")]:
+            self._write({"name": "process_name", "ph": "M", "pid": pid, "args": {"name": name}})
+        self._write(thread_name_event(RECOGNIZER_PID, RECOGNIZER_TID, "recognition"))
+        self._write(thread_name_event(RECOGNIZER_PID, IPC_TID, "ipc"))
+        self.thread = threading.Thread(target=self._writer, daemon=True)
+        self.thread.start()
+
+    # 识别主循环调用的接口
+
+    def received(self, timestamp, when):
+        """从输入队列取出一个数据包，when 为这一批音频开始处理的时间"""
+        self.pending.put(("get", slot_id(timestamp), when))
+
+    def span(self, name, start, **args):
+        """记录从 start（time.perf_counter()）到现在的事件，自动附带当前句子的编号"""
+        if self.utterance is not None:
+            args["utterance"] = self.utterance
+        self.pending.put(("event", span_event(name, "recognizer", RECOGNIZER_PID, RECOGNIZER_TID, start,
+                                              time.perf_counter(), args)))
+
+    def begin_utterance(self):
+        self.utterance = self.next_utterance
+        self.next_utterance += 1
+        self.pending.put(("event", {"name": "utterance", "cat": "utterance", "ph": "b", "id": self.utterance,
+                                    "pid": RECOGNIZER_PID, "tid": RECOGNIZER_TID,
+                                    "ts": to_us(time.perf_counter())}))
+        return self.utterance
+
+    def end_utterance(self, text, first_timestamp=None):
+        """
+        输出最终结果时调用
+
+        Args:
+            text: 最终结果
+            first_timestamp: 句子第一个采样所在数据包的时间戳，用于关联录音进程中的 capture 事件
+        """
+        if self.utterance is None:
+            self.begin_utterance()
+        now = time.perf_counter()
+        args = {"text": text}
+        if first_timestamp is not None:
+            args["first_slot"] = slot_id(first_timestamp)
+            self.pending.put(("link", slot_id(first_timestamp), self.utterance, now))
+        self.pending.put(("event", {"name": "utterance", "cat": "utterance", "ph": "e", "id": self.utterance,
+                                    "pid": RECOGNIZER_PID, "tid": RECOGNIZER_TID, "ts": to_us(now), "args": args}))
+        self.utterance = None
+
+    def close(self):
+        self.stopped.set()
+        self.thread.join(timeout=5)
+        self.file.write("\n]\n")
+        self.file.close()
+
+    # 写入线程
+
+    def _write(self, event):
+        self.file.write(("\n" if self.first_event else ",\n") + json.dumps(event, ensure_ascii=False))
+        self.first_event = False
+
+    def _writer(self):
+        while True:
+            stopping = self.stopped.is_set()
+            try:
+                self._handle(self.pending.get(timeout=0.1))
+                while True:
+                    self._handle(self.pending.get_nowait())
+            except queue.Empty:
+                pass
+            if self.trace_queue is not None:
+                try:
+                    while True:
+                        events, markers = self.trace_queue.get_nowait()
+                        self._handle_capture(events, markers)
+                except (queue.Empty, OSError, ValueError, EOFError):
+                    pass
+            self.file.flush()
+            if stopping:
+                break
+
+    def _handle(self, item):
+        kind = item[0]
+        if kind == "event":
+            self._write(item[1])
+        elif kind == "get":
+            _, slot, when = item
+            self._track_slot(slot)
+            put_time = self.put_times.pop(slot, None)
+            if put_time is None:
+                self.get_times[slot] = when
+            else:
+                self._write_ipc(slot, put_time, when)
+        elif kind == "link":
+            _, slot, utterance, when = item
+            capture = self.capture_spans.get(slot)
+            if capture:
+                self._write_link(utterance, capture, when)
+            else:
+                self.links.setdefault(slot, []).append((utterance, when))
+
+    def _handle_capture(self, events, markers):
+        for event in events:
+            self._write(event)
+            if event.get("name") == "capture":
+                slot = event["args"]["slot"]
+                if slot not in self.capture_spans:
+                    capture = (event["tid"], event["ts"] / 1e6)
+                    self.capture_spans[slot] = capture
+                    for utterance, when in self.links.pop(slot, []):
+                        self._write_link(utterance, capture, when)
+        for _, slot, put_time in markers:
+            self._track_slot(slot)
+            get_time = self.get_times.pop(slot, None)
+            if get_time is None:
+                self.put_times[slot] = put_time
+            else:
+                self._write_ipc(slot, put_time, get_time)
+
+    def _write_ipc(self, slot, put_time, get_time):
+        self._write(span_event("ipc", "ipc", RECOGNIZER_PID, IPC_TID, put_time, get_time, {"slot": slot}))
+        for event in flow_events("packet", slot, CAPTURE_PID, MIXER_TID, put_time,
+                                 RECOGNIZER_PID, RECOGNIZER_TID, get_time):
+            self._write(event)
+
+    def _write_link(self, utterance, capture, when):
+        tid, start = capture
+        for event in flow_events("utterance", utterance, CAPTURE_PID, tid, start, RECOGNIZER_PID, RECOGNIZER_TID,
+                                 when):
+            self._write(event)
+
+    def _track_slot(self, slot):
+        """丢弃很久以前仍未配对的时间槽"""
+        if slot <= self.max_slot:
+            return
+        self.max_slot = slot
+        oldest = slot - MAX_PENDING_SLOTS
+        for table in (self.capture_spans, self.put_times, self.get_times, self.links):
+            if len(table) > MAX_PENDING_SLOTS:
+                for key in [key for key in table if key < oldest]:
+                    del table[key]
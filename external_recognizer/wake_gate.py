@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+#
+# Copyright (c)  2025  Xiaomi Corporation
+
+"""
+唤醒词门控：平时只运行轻量的关键词检测（sherpa_onnx.KeywordSpotter），检测到唤醒词后才把音频交给完整的识别器。
+
+WakeGate 包装录音进程的输出队列，识别主循环像读取普通队列一样读取它：
+
+  - 门控状态：每个音频块只送入关键词检测，同时保留最近 pre_roll 秒的音频；识别主循环阻塞在 get() 中，
+    识别器不做任何计算
+  - 检测到唤醒词后进入识别状态：先交出保留的音频（包括唤醒词本身），之后的音频原样交出。
+    保留的音频与上一次识别状态结束时的音频不连续，识别主循环每取出一个音频块后调用 take_activation()，
+    返回 True 时先重置识别流、VAD等状态，再处理这个音频块
+  - 识别状态下超过 timeout 秒的音频没有新的识别结果（MyPrinter 调用 notify_activity），回到门控状态。
+    超时按识别结果是否变化计算，不是按音频能量检测静音：噪声或音乐被识别出新的文字时也会推迟回到门控状态
+
+同时统计两种状态下的进程CPU占用（包括推理线程），结束时输出对比。
+"""
+
+import queue
+import sys
+import time
+from collections import deque
+
+from audio_mixer import sample_rate, to_float32_samples
+
+
+def create_keyword_spotter(sherpa_onnx, args):
+    """按命令行参数创建关键词检测器，args 需要包含 kws_* 和 wake_keywords"""
+    return sherpa_onnx.KeywordSpotter(
+        tokens=args.kws_tokens,
+        encoder=args.kws_encoder,
+        decoder=args.kws_decoder,
+        joiner=args.kws_joiner,
+        num_threads=1,
+        keywords_file=args.wake_keywords,
+        keywords_score=args.kws_score,
+        keywords_threshold=args.kws_threshold,
+        max_active_paths=4,
+        num_trailing_blanks=1,
+        provider="cpu",
+    )
+
+
+class GateStats:
+    """两种状态各自的时长和进程CPU时间"""
+    def __init__(self):
+        self.triggers = 0
+        self.wall = {False: 0.0, True: 0.0}
+        self.cpu = {False: 0.0, True: 0.0}
+        self.audio = {False: 0.0, True: 0.0}
+        self.since_wall = time.perf_counter()
+        self.since_cpu = time.process_time()
+
+    def switch(self, active):
+        """结束 active 状态的一段计时"""
+        now_wall, now_cpu = time.perf_counter(), time.process_time()
+        self.wall[active] += now_wall - self.since_wall
+        self.cpu[active] += now_cpu - self.since_cpu
+        self.since_wall, self.since_cpu = now_wall, now_cpu
+
+    def cpu_percent(self, active):
+        return self.cpu[active] * 100 / max(self.wall[active], 1e-9)
+
+    def format_summary(self):
+        parts = []
+        for active, name in [(False, "门控"), (True, "识别")]:
+            parts.append(f"{name}状态 {self.wall[active]:.1f} s（音频 {self.audio[active]:.1f} s），"
+                         f"CPU占用 {self.cpu_percent(active):.1f}%")
+        return f"唤醒 {self.triggers} 次；" + "；".join(parts)
+
+
+class WakeGate:
+    """
+    唤醒词门控的输入队列
+
+    Args:
+        samples_queue: 录音进程的输出队列，每项为 (采集时间戳, 音频块)
+        spotter: sherpa_onnx.KeywordSpotter
+        pre_roll: 唤醒时一起交给识别器的之前的音频（秒）
+        timeout: 识别状态下这么多秒的音频没有新的识别结果时回到门控状态（不是静音时长），
+            应大于识别器结束句子所需的静音时长
+    """
+    def __init__(self, samples_queue, spotter, pre_roll=2.0, timeout=15.0):
+        self.queue = samples_queue
+        self.spotter = spotter
+        self.stream = spotter.create_stream()
+        self.max_pre_roll = int(pre_roll * sample_rate)
+        self.timeout_samples = int(timeout * sample_rate)
+        self.active = False
+        self.activated = False  # 重新唤醒后尚未被识别主循环 take_activation() 取走
+        self.pre_roll = deque()
+        self.pre_roll_samples = 0
+        self.idle_samples = 0
+        self.ready = deque()  # 已经可以交给识别器的音频块
+        self.stats = GateStats()
+
+    def notify_activity(self):
+        """识别结果有变化，推迟回到门控状态"""
+        self.idle_samples = 0
+
+    def take_activation(self):
+        """
+        在 get() / get_nowait() 之后调用：返回刚取出的音频块是否是一次唤醒的第一个音频块
+
+        唤醒只发生在 ready 为空时的 get() / get_nowait() 中，这次调用交出的就是保留音频的第一块，
+        识别主循环应丢弃之前的识别状态（识别流、VAD、缓存的音频）再处理它
+        """
+        activated, self.activated = self.activated, False
+        return activated
+
+    def get(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.ready:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                raise queue.Empty
+            self._process(self.queue.get(timeout=remaining))
+        return self.ready.popleft()
+
+    def get_nowait(self):
+        while not self.ready:
+            self._process(self.queue.get_nowait())
+        return self.ready.popleft()
+
+    def empty(self):
+        return not self.ready and self.queue.empty()
+
+    def qsize(self):
+        return len(self.ready) + (self.queue.qsize() if self.active else 0)
+
+    def _process(self, item):
+        samples = item[1]
+        self.stats.audio[self.active] += len(samples) / sample_rate
+        if self.active:
+            self.idle_samples += len(samples)
+            if self.idle_samples < self.timeout_samples:
+                self.ready.append(item)
+                return
+            print(f"{self.timeout_samples / sample_rate:.0f} 秒没有识别结果，回到唤醒词检测", file=sys.stderr)
+            self.stats.switch(True)
+            self.active = False
+            self.spotter.reset_stream(self.stream)
+
+        # 门控状态：只做关键词检测，保留最近的音频
+        self.pre_roll.append(item)
+        self.pre_roll_samples += len(samples)
+        while self.pre_roll and self.pre_roll_samples - len(self.pre_roll[0][1]) >= self.max_pre_roll:
+            self.pre_roll_samples -= len(self.pre_roll.popleft()[1])
+
+        self.stream.accept_waveform(sample_rate, to_float32_samples(samples))
+        keyword = ""
+        while self.spotter.is_ready(self.stream):
+            self.spotter.decode_stream(self.stream)
+            keyword = self.spotter.get_result(self.stream)
+            if keyword:
+                self.spotter.reset_stream(self.stream)
+                break
+        if keyword:
+            print(f"检测到唤醒词: {keyword}，开始识别", file=sys.stderr)
+            self.stats.switch(False)
+            self.stats.triggers += 1
+            self.active = True
+            self.activated = True
+            self.idle_samples = 0
+            self.ready.extend(self.pre_roll)
+            self.pre_roll.clear()
+            self.pre_roll_samples = 0
+
+    def close(self):
+        """结束当前状态的计时"""
+        self.stats.switch(self.active)
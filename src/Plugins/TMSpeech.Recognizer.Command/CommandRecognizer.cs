@@ -3,6 +3,7 @@ using System.Diagnostics;
 using System.Text;
 using System.Text.Json;
 using TMSpeech.Core.Plugins;
+using TMSpeech.Core.Services.Notification;
 
 namespace TMSpeech.Recognizer.Command;
 
@@ -42,8 +43,22 @@ public class CommandRecognizer : IRecognizer
     private readonly object _lockObject = new();
     private StreamWriter? _logWriter;
 
+    // 以 \x1e 开头的行是控制消息而不是识别结果，例如 "\x1ekeyword\t<关键词>"
+    private const char ControlLinePrefix = '\u001e';
+    private const string KeywordAlertType = "keyword";
+
     public void clearCurrentLine() { _prevLine = _currentLine.ToString(); _currentLine.Clear(); }
 
+    private void HandleControlLine(string line)
+    {
+        var parts = line.Substring(1).Split('\t', 2);
+        if (parts.Length == 2 && parts[0] == KeywordAlertType && !string.IsNullOrEmpty(parts[1]))
+        {
+            NotificationManager.Instance.Notify($"检测到关键词：{parts[1]}", "关键词", NotificationType.Warning);
+        }
+        // 其他类型（例如 translation 译文）暂不处理，直接忽略
+    }
+
     public IPluginConfigEditor CreateConfigEditor() => new CommandRecognizerConfigEditor();
 
     public void LoadConfig(string config)
@@ -202,6 +217,9 @@ public class CommandRecognizer : IRecognizer
             Debug.WriteLine($"启动外部命令进行识别，PID: {_process.Id}");
 
             long newlineCount = 0;
+            // 控制消息单独缓存，不进入当前行，也不改变换行计数，使其对句子的换行约定完全透明
+            var controlLine = new StringBuilder();
+            var inControlLine = false;
             while (_isRunning && !_process.StandardOutput.EndOfStream)
             {
                 var ch = _process.StandardOutput.Read();
@@ -213,6 +231,25 @@ public class CommandRecognizer : IRecognizer
                     {
                         continue;
                     }
+                    else if (inControlLine)
+                    {
+                        // 控制消息：不改变临时结果，也不影响前后的换行表示句子完成
+                        if (ch == '\n')
+                        {
+                            inControlLine = false;
+                            HandleControlLine(controlLine.ToString());
+                            controlLine.Clear();
+                        }
+                        else
+                        {
+                            controlLine.Append((char)ch);
+                        }
+                    }
+                    else if (ch == ControlLinePrefix && _currentLine.Length == 0)
+                    {
+                        inControlLine = true;
+                        controlLine.Append((char)ch);
+                    }
                     else if (ch == '\n')
                     {
                         newlineCount += 1;